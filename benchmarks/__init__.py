@@ -0,0 +1,103 @@
+"""
+Helpers shared by the benchmark scripts.
+
+Every script configures Django against a throwaway SQLite file (or the one
+given by `--db`), seeds it with synthetic courses and prints its timings.
+Run them from the repository root, e.g. `python -m benchmarks.pagination`.
+"""
+import argparse
+import datetime
+import os
+import statistics
+import tempfile
+import time
+
+
+def get_parser(description, rows=100000):
+	parser = argparse.ArgumentParser(description=description)
+	parser.add_argument('--rows', type=int, default=rows,
+						help='number of courses to seed')
+	parser.add_argument('--db', default=None,
+						help='SQLite file to use (a temporary one by default)')
+	parser.add_argument('--repeat', type=int, default=20,
+						help='measurements per case')
+	return parser
+
+
+def setup(db_path=None):
+	"""
+	Configures Django for a benchmark run and migrates the database
+	"""
+	os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'course_catalogue.settings')
+	os.environ.setdefault('SECRET_KEY', 'benchmark')
+	import django
+	from django.conf import settings
+	from django.core.management import call_command
+
+	if db_path is None:
+		db_path = os.path.join(tempfile.mkdtemp(), 'benchmark.sqlite3')
+	settings.DATABASES['default']['NAME'] = db_path
+	settings.DATABASES['replica']['NAME'] = db_path
+	# DEBUG keeps every executed query in memory
+	settings.DEBUG = False
+	django.setup()
+	call_command('migrate', verbosity=0)
+	return db_path
+
+
+LEVELS = ['Intro to', 'Basics of', 'Advanced', 'Practical', 'Applied',
+			'Modern', 'Hands-on', 'Deep dive into']
+TOPICS = ['Python', 'Django', 'Databases', 'Algorithms', 'Statistics',
+			'Networking', 'Security', 'Compilers', 'Rust', 'Go', 'Kubernetes',
+			'Linux', 'Testing', 'Design', 'Physics', 'Chemistry', 'History',
+			'Economics', 'Music', 'Painting', 'Biology', 'Geometry', 'Poetry',
+			'Astronomy', 'Photography', 'Marketing', 'Accounting', 'Cooking',
+			'Robotics', 'Geography', 'Philosophy', 'Linguistics']
+
+
+def get_course_name(i):
+	return '%s %s %d' % (LEVELS[i % len(LEVELS)],
+						TOPICS[i // len(LEVELS) % len(TOPICS)], i)
+
+
+def seed_courses(count, batch_size=10000):
+	"""
+	Fills the course table up to count rows with synthetic courses
+	"""
+	from courses.models import Course
+
+	existing = Course.objects.count()
+	base = datetime.date(2000, 1, 1)
+	for offset in range(existing, count, batch_size):
+		Course.objects.bulk_create([
+			Course(name=get_course_name(i),
+					start_date=base + datetime.timedelta(days=i % 7300),
+					end_date=base + datetime.timedelta(days=i % 7300 + 30 + i % 90),
+					lectures_num=i % 40)
+			for i in range(offset, min(offset + batch_size, count))
+		])
+
+
+def measure(func, repeat=20):
+	"""
+	Calls func repeat times, returns timings in milliseconds
+	"""
+	timings = []
+	for _ in range(repeat):
+		started = time.perf_counter()
+		func()
+		timings.append((time.perf_counter() - started) * 1000)
+	return timings
+
+
+def summarize(timings):
+	return {'median_ms': round(statistics.median(timings), 3),
+			'min_ms': round(min(timings), 3),
+			'max_ms': round(max(timings), 3)}
+
+
+def report(name, timings):
+	stats = summarize(timings)
+	print('{:<40} median {median_ms:>9.3f} ms   min {min_ms:>9.3f} ms'
+			.format(name, **stats))
+	return stats
@@ -0,0 +1,52 @@
+"""
+Compares list requests of the Pure API (a page with its exact count)
+before and after moving the courses that ended before `--horizon` to the
+archive table: the default lists then read the live courses only, and
+`?include_archived=1` the union of both tables.
+
+	python -m benchmarks.archive --rows 1000000 --horizon 2019-01-01
+"""
+from benchmarks import get_parser, measure, report, seed_courses, setup
+
+QUERIES = {
+	'page': {},
+	'search': {'search': 'python'},
+	'active_on': {'active_on': '2019-06-01'},
+	'end_date': {'end_date__gte': '2019-01-01'},
+}
+
+
+def main():
+	parser = get_parser(__doc__, rows=1000000)
+	parser.add_argument('--horizon', default='2019-01-01',
+						help='courses ending before it are archived')
+	parser.add_argument('--batch-size', type=int, default=10000,
+						help='courses moved per transaction')
+	args = parser.parse_args()
+	setup(args.db)
+	seed_courses(args.rows)
+
+	from django.test import Client
+	from courses.models import ArchivedCourse, Course
+	from views.archive import archive_objects
+
+	client = Client()
+
+	def run(name, params):
+		def get():
+			response = client.get('/api-pure/v0/courses/', params)
+			assert response.status_code == 200, response.content
+		report(name, measure(get, args.repeat))
+
+	for name, params in QUERIES.items():
+		run('one table %s' % name, params)
+	moved = archive_objects(Course.objects.filter(end_date__lt=args.horizon),
+							ArchivedCourse, args.batch_size)
+	print('archived %d of %d courses' % (moved, args.rows))
+	for name, params in QUERIES.items():
+		run('live %s' % name, params)
+		run('live and archived %s' % name, dict(params, include_archived=1))
+
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,136 @@
+"""
+Compares the throughput of the Pure API list under slow clients: the async
+views served by the ASGI application on one event loop, as uvicorn runs it,
+against the sync views served by the WSGI application on a pool of worker
+threads, as a threaded WSGI server runs it. Every client takes `--delay`
+ms to read a response, which holds a WSGI worker but not the event loop.
+The sync views under ASGI are measured too, for reference.
+
+	python -m benchmarks.asgi --clients 64 --delay 50
+"""
+import asyncio
+import concurrent.futures
+import time
+
+from benchmarks import get_parser, seed_courses, setup
+from benchmarks.load import Client
+
+PATHS = {'sync': '/api-pure/v0/courses/',
+		'async': '/api-pure-async/v0/courses/'}
+
+
+def get_scope(path, query):
+	return {
+		'type': 'http',
+		'asgi': {'version': '3.0'},
+		'http_version': '1.1',
+		'method': 'GET',
+		'scheme': 'http',
+		'path': path,
+		'raw_path': path.encode(),
+		'query_string': query.encode(),
+		'root_path': '',
+		'headers': [(b'host', b'localhost')],
+		'client': ('127.0.0.1', 50000),
+		'server': ('localhost', 80),
+	}
+
+
+async def asgi_request(application, path, query, delay):
+	statuses = []
+
+	async def receive():
+		return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+	async def send(message):
+		if message['type'] == 'http.response.start':
+			statuses.append(message['status'])
+		elif message['type'] == 'http.response.body':
+			# The client reads slowly
+			await asyncio.sleep(delay)
+
+	await application(get_scope(path, query), receive, send)
+	return statuses[0]
+
+
+def run_asgi(application, path, clients, requests, delay):
+	"""
+	Sends requests from clients concurrent clients, returns the wall time
+	and the failed count
+	"""
+	async def client(number):
+		failed = 0
+		for i in range(requests):
+			status = await asgi_request(application, path,
+										'page=%d' % (i % 10 + 1), delay)
+			failed += status >= 400
+		return failed
+
+	async def main():
+		return sum(await asyncio.gather(*[client(n) for n in range(clients)]))
+
+	started = time.perf_counter()
+	failed = asyncio.run(main())
+	return time.perf_counter() - started, failed
+
+
+def run_wsgi(application, path, clients, requests, delay, workers):
+	"""
+	Serves clients * requests requests with workers threads, every one
+	blocked for delay while its client reads the response
+	"""
+	client = Client(application)
+
+	def serve(i):
+		status, _ = client.request('GET', path, {'page': i % 10 + 1})
+		time.sleep(delay)
+		return status >= 400
+
+	started = time.perf_counter()
+	with concurrent.futures.ThreadPoolExecutor(workers) as executor:
+		failed = sum(executor.map(serve, range(clients * requests)))
+	return time.perf_counter() - started, failed
+
+
+def main():
+	parser = get_parser(__doc__, rows=10000)
+	parser.add_argument('--clients', type=int, default=64,
+						help='concurrent clients')
+	parser.add_argument('--requests', type=int, default=10,
+						help='requests per client')
+	parser.add_argument('--delay', type=float, default=50,
+						help='ms a client takes to read a response')
+	parser.add_argument('--workers', type=int, default=8,
+						help='threads of the WSGI server')
+	args = parser.parse_args()
+	setup(args.db)
+	seed_courses(args.rows)
+
+	from django.core.asgi import get_asgi_application
+	from django.core.wsgi import get_wsgi_application
+	from course_catalogue.settings import PURE_REST
+
+	delay = args.delay / 1000
+	total = args.clients * args.requests
+	print('%d clients x %d requests, %.0f ms to read a response, '
+			'%d database threads' % (args.clients, args.requests, args.delay,
+									PURE_REST['ASYNC']['MAX_WORKERS']))
+	cases = [
+		('WSGI sync views, %d workers' % args.workers,
+			lambda: run_wsgi(get_wsgi_application(), PATHS['sync'],
+							args.clients, args.requests, delay, args.workers)),
+		('ASGI sync views',
+			lambda: run_asgi(get_asgi_application(), PATHS['sync'],
+							args.clients, args.requests, delay)),
+		('ASGI async views',
+			lambda: run_asgi(get_asgi_application(), PATHS['async'],
+							args.clients, args.requests, delay)),
+	]
+	for name, run in cases:
+		elapsed, failed = run()
+		print('{:<40} {:>9.1f} req/s   {:>7.2f} s   errors {}'.format(
+			name, total / elapsed, elapsed, failed))
+
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,49 @@
+"""
+Records per second of the single-object create endpoints against the bulk
+ones of both APIs.
+
+	python -m benchmarks.bulk --rows 20000
+"""
+import json
+import time
+
+from benchmarks import get_parser, setup
+
+
+def main():
+	parser = get_parser(__doc__, rows=20000)
+	parser.add_argument('--single-rows', type=int, default=1000,
+						help='records created one request at a time')
+	args = parser.parse_args()
+	setup(args.db)
+
+	from django.test import Client
+	from benchmarks import get_course_name
+
+	client = Client()
+
+	def items(count):
+		return [{'name': get_course_name(i), 'start_date': '01.01.2003',
+				'end_date': '01.02.2003', 'lectures_num': i % 40}
+				for i in range(count)]
+
+	def report(name, count, started):
+		elapsed = time.perf_counter() - started
+		print('{:<40} {:>10.0f} records/s'.format(name, count / elapsed))
+
+	for base in ('/api-pure/v0/courses/', '/api/v0/courses/'):
+		started = time.perf_counter()
+		for item in items(args.single_rows):
+			client.post(base, json.dumps(item), content_type='application/json')
+		report(base + ' single', args.single_rows, started)
+
+		started = time.perf_counter()
+		body = json.dumps(items(args.rows))
+		response = client.post(base + 'bulk/', body,
+								content_type='application/json')
+		assert response.status_code in (200, 201), response.content
+		report(base + 'bulk/', args.rows, started)
+
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,64 @@
+"""
+Compares database profiles under concurrent reads and writes: threads send
+a mix of list, detail, create and update requests to the Pure API, first
+with SQLite's defaults (rollback journal, 5 s busy timeout, a connection
+per request), then with the profile of the settings (WAL, synchronous
+NORMAL, a bigger cache, IMMEDIATE transactions waiting up to 20 s for the
+lock, persistent connections).
+
+	python -m benchmarks.database --threads 16 --writes 0.2
+"""
+from benchmarks import get_parser, seed_courses, setup
+from benchmarks.load import APIS, Client, Scenarios, run, summarize
+
+PROFILES = {
+	'defaults': {'PRAGMAS': {'journal_mode': 'DELETE', 'synchronous': 'FULL'},
+				'OPTIONS': {'timeout': 5}, 'CONN_MAX_AGE': 0},
+	'settings': {},
+}
+
+
+def main():
+	parser = get_parser(__doc__, rows=10000)
+	parser.add_argument('--requests', type=int, default=2000,
+						help='requests per profile')
+	parser.add_argument('--threads', type=int, default=16,
+						help='concurrent client threads')
+	parser.add_argument('--writes', type=float, default=0.2,
+						help='share of create and update requests')
+	args = parser.parse_args()
+	setup(args.db)
+	seed_courses(args.rows)
+
+	from django.conf import settings
+	from django.core.wsgi import get_wsgi_application
+	from django.db import connections
+	from courses.models import Course
+
+	client = Client(get_wsgi_application())
+	pks = list(Course.objects.values_list('pk', flat=True))
+	page_size = settings.REST_FRAMEWORK['PAGE_SIZE']
+	profile = dict(settings.DATABASES['default'])
+	for name, changes in PROFILES.items():
+		# Connections opened from now on get the profile
+		connections.close_all()
+		settings_dict = connections['default'].settings_dict
+		settings_dict.update(profile, **changes)
+		scenarios = Scenarios(client, 'pure', APIS['pure'], pks, page_size)
+		scenarios.create(0, None)
+
+		def mixed(i, rng):
+			if rng.random() >= args.writes:
+				read = scenarios.list if i % 2 else scenarios.detail
+				return read(i, rng)
+			write = scenarios.create if i % 2 else scenarios.update
+			return write(i, rng)
+
+		case = summarize(*run(mixed, args.requests, args.threads, 0))
+		print('{:<10} {throughput_rps:>9.1f} req/s   p50 {p50_ms:>8.3f} ms   '
+				'p99 {p99_ms:>8.3f} ms   errors {errors}'.format(name, **case))
+		Course.objects.filter(pk__in=scenarios.created).delete()
+
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,54 @@
+"""
+Streams the whole catalogue through the export endpoint and checks that
+the peak memory allocated while doing it stays under a cap.
+Exits with status 1 if the cap is exceeded.
+
+	python -m benchmarks.export --rows 1000000 --max-peak-mb 16
+"""
+import sys
+import time
+import tracemalloc
+
+from benchmarks import get_parser, seed_courses, setup
+
+
+def main():
+	parser = get_parser(__doc__, rows=1000000)
+	parser.add_argument('--max-peak-mb', type=float, default=16,
+						help='allowed peak of traced memory while exporting')
+	args = parser.parse_args()
+	setup(args.db)
+	seed_courses(args.rows)
+
+	from django.test import Client
+	client = Client()
+
+	def export(export_format):
+		url = '/api-pure/v0/courses/export/?format=' + export_format
+		size = lines = 0
+		for chunk in client.get(url).streaming_content:
+			size += len(chunk)
+			lines += chunk.count(b'\n')
+		return size, lines
+
+	failed = False
+	for export_format in ('ndjson', 'csv'):
+		started = time.perf_counter()
+		size, lines = export(export_format)
+		elapsed = time.perf_counter() - started
+		# Tracing slows everything down, so memory is measured separately
+		tracemalloc.start()
+		export(export_format)
+		peak = tracemalloc.get_traced_memory()[1] / 1024 / 1024
+		tracemalloc.stop()
+		print('{:<8} {:>9} lines {:>8.1f} MB {:>7.2f} s {:>9.0f} rows/s '
+				'peak {:>6.2f} MB'.format(export_format, lines, size / 1e6,
+										elapsed, lines / elapsed, peak))
+		failed = failed or peak > args.max_peak_mb
+	if failed:
+		print('Peak memory is over %.1f MB' % args.max_peak_mb)
+		sys.exit(1)
+
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,62 @@
+"""
+Compares the list formats on pages of 10, 100 and 1000 rows: payload size
+and encode time of the current JSON responses of both APIs (precompiled
+row encoders of the Pure API, CourseSerializer and JSONRenderer of the
+DRF API) against the columnar JSON and, if msgpack is installed,
+MessagePack layouts built from `values_list` tuples.
+
+	python -m benchmarks.formats --sizes 10 100 1000
+"""
+import gzip
+
+from benchmarks import get_parser, measure, report, seed_courses, setup
+
+
+def main():
+	parser = get_parser(__doc__, rows=1000)
+	parser.add_argument('--sizes', type=int, nargs='+', default=[10, 100, 1000],
+						help='page sizes to compare')
+	args = parser.parse_args()
+	setup(args.db)
+	seed_courses(max(args.rows, max(args.sizes)))
+
+	from rest_framework.renderers import JSONRenderer
+	from courses.models import Course
+	from courses.serializers import CourseSerializer
+	from views import json as json_views
+	from views.formats import get_response_formats, to_columns
+
+	fields = json_views.get_field_names(Course)
+	formats = get_response_formats()
+
+	for size in args.sizes:
+		queryset = Course.objects.order_by('pk')[:size]
+
+		def page(results):
+			return {'count': args.rows, 'total_pages': 1, 'results': results}
+
+		def pure_json():
+			encoder = json_views.get_row_encoder(Course, fields)
+			return json_views.get_json_backend().dumps(page(
+				encoder.encode_rows(queryset.values_list(*fields))))
+
+		def drf_json():
+			return JSONRenderer().render(page(
+				CourseSerializer(queryset, many=True).data))
+
+		cases = [('pure json', pure_json), ('drf json', drf_json)]
+		for name, response_format in formats.items():
+			def compact(response_format=response_format):
+				return response_format.dumps(to_columns(
+					page(list(queryset.values_list(*fields))), fields))
+
+			cases.append((name, compact))
+		for name, encode in cases:
+			content = encode()
+			report('%d rows %s' % (size, name), measure(encode, args.repeat))
+			print('{:<40} {:>8} bytes, {:>8} gzipped'.format(
+				'', len(content), len(gzip.compress(content))))
+
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,268 @@
+"""
+Load test of both APIs: list, filter, search, detail, create, update and
+delete requests sent by a pool of client threads to the WSGI application,
+in-process, for catalogues of every size given. Throughput and latency
+percentiles go to a JSON results file; `--compare` diffs it against the
+results of a previous run.
+
+	python -m benchmarks.load --sizes 10000 100000 1000000 --threads 8
+	python -m benchmarks.load --output new.json --compare old.json
+"""
+import concurrent.futures
+import datetime
+import io
+import json
+import platform
+import random
+import sqlite3
+import sys
+import time
+from urllib.parse import urlencode
+
+from benchmarks import get_parser, seed_courses, setup
+
+APIS = {'drf': '/api/v0/courses/', 'pure': '/api-pure/v0/courses/'}
+SCENARIOS = ['list', 'filter', 'search', 'detail', 'create', 'update',
+				'delete']
+SEARCH_TERMS = ['python', 'intro', 'advanced data', 'rob', 'history 12']
+
+
+def get_course(i):
+	start = datetime.date(2030, 1, 1) + datetime.timedelta(days=i % 365)
+	return {'name': 'Load test course %d' % i,
+			'start_date': start.isoformat(),
+			'end_date': (start + datetime.timedelta(days=30)).isoformat(),
+			'lectures_num': i % 40}
+
+
+class Client:
+	"""
+	Calls the WSGI application directly, without sockets
+	"""
+	def __init__(self, application):
+		self.application = application
+
+	def request(self, method, path, query=None, data=None):
+		body = json.dumps(data).encode() if data is not None else b''
+		environ = {
+			'REQUEST_METHOD': method,
+			'PATH_INFO': path,
+			'QUERY_STRING': urlencode(query or {}),
+			'SERVER_NAME': 'localhost',
+			'SERVER_PORT': '80',
+			'REMOTE_ADDR': '127.0.0.1',
+			'HTTP_HOST': 'localhost',
+			'CONTENT_TYPE': 'application/json',
+			'CONTENT_LENGTH': str(len(body)),
+			'wsgi.input': io.BytesIO(body),
+			'wsgi.errors': sys.stderr,
+			'wsgi.url_scheme': 'http',
+			'wsgi.version': (1, 0),
+			'wsgi.multithread': True,
+			'wsgi.multiprocess': False,
+			'wsgi.run_once': False,
+		}
+		statuses = []
+		response = self.application(
+			environ, lambda status, headers: statuses.append(status))
+		try:
+			content = b''.join(response)
+		finally:
+			if hasattr(response, 'close'):
+				response.close()
+		return int(statuses[0].split()[0]), content
+
+
+class Scenarios:
+	"""
+	Requests of every scenario for one API. Creates record the primary keys
+	they get, updates and deletes use those, so the seeded rows stay intact
+	"""
+	def __init__(self, client, api, url, pks, page_size):
+		self.client = client
+		self.api = api
+		self.url = url
+		self.pks = pks
+		self.pages = max(1, len(pks) // page_size)
+		self.created = []
+
+	def detail_url(self, pk):
+		return '%s%d/' % (self.url, pk)
+
+	def list(self, i, rng):
+		page = rng.randint(1, min(self.pages, 100))
+		return self.client.request('GET', self.url, {'page': page})
+
+	def filter(self, i, rng):
+		start = datetime.date(2000, 1, 1) + datetime.timedelta(
+			days=rng.randrange(7000))
+		end = start + datetime.timedelta(days=200)
+		return self.client.request('GET', self.url, {
+			'start_date__gte': start.isoformat(),
+			'end_date__lte': end.isoformat()})
+
+	def search(self, i, rng):
+		return self.client.request('GET', self.url,
+									{'search': rng.choice(SEARCH_TERMS)})
+
+	def detail(self, i, rng):
+		pk = rng.choice(self.pks)
+		return self.client.request('GET', self.detail_url(pk))
+
+	def create(self, i, rng):
+		status, content = self.client.request('POST', self.url,
+												data=get_course(i))
+		# 201 from DRF, 200 from the Pure API
+		if status < 300:
+			self.created.append(json.loads(content)['id'])
+		return status, content
+
+	def update(self, i, rng):
+		# The Pure API updates with POST
+		method = 'PUT' if self.api == 'drf' else 'POST'
+		pk = self.created[i % len(self.created)]
+		return self.client.request(method, self.detail_url(pk),
+									data=get_course(i + 1))
+
+	def delete(self, i, rng):
+		pk = self.created[i]
+		return self.client.request('DELETE', self.detail_url(pk))
+
+
+def percentile(ordered, fraction):
+	rank = int(round(fraction * len(ordered)))
+	return ordered[max(0, min(len(ordered), rank) - 1)]
+
+
+def run(scenario, requests, threads, seed):
+	"""
+	Sends requests calls of scenario from threads threads, returns their
+	latencies in milliseconds, the failed count and the wall time
+	"""
+	from django.db import connections
+
+	def call(i):
+		rng = random.Random(seed + i)
+		started = time.perf_counter()
+		status, _ = scenario(i, rng)
+		return (time.perf_counter() - started) * 1000, status >= 400
+
+	def close():
+		connections.close_all()
+
+	started = time.perf_counter()
+	with concurrent.futures.ThreadPoolExecutor(threads) as executor:
+		results = list(executor.map(call, range(requests)))
+		# Every thread has its own connection
+		list(executor.map(lambda _: close(), range(threads)))
+	elapsed = time.perf_counter() - started
+	return [latency for latency, _ in results], \
+		sum(failed for _, failed in results), elapsed
+
+
+def summarize(latencies, errors, elapsed):
+	ordered = sorted(latencies)
+	return {'requests': len(ordered),
+			'errors': errors,
+			'throughput_rps': round(len(ordered) / elapsed, 1),
+			'p50_ms': round(percentile(ordered, 0.50), 3),
+			'p95_ms': round(percentile(ordered, 0.95), 3),
+			'p99_ms': round(percentile(ordered, 0.99), 3),
+			'max_ms': round(ordered[-1], 3)}
+
+
+def compare(results, previous_path):
+	"""
+	Prints the change of throughput and p95 latency of every case against a
+	previous results file
+	"""
+	with open(previous_path) as f:
+		previous = {(case['rows'], case['api'], case['scenario']): case
+					for case in json.load(f)['results']}
+	print('\nAgainst %s:' % previous_path)
+	for case in results:
+		key = (case['rows'], case['api'], case['scenario'])
+		if key not in previous:
+			continue
+		old = previous[key]
+		throughput = (case['throughput_rps'] / old['throughput_rps'] - 1) * 100
+		p95 = (case['p95_ms'] / old['p95_ms'] - 1) * 100
+		print('{:>8} {:<5} {:<7} throughput {:>+7.1f} %   p95 {:>+7.1f} %'
+				.format(*key, throughput, p95))
+
+
+def main():
+	parser = get_parser(__doc__, rows=10000)
+	parser.add_argument('--sizes', type=int, nargs='+', default=None,
+						help='catalogue sizes to test (default: --rows)')
+	parser.add_argument('--requests', type=int, default=500,
+						help='requests per scenario')
+	parser.add_argument('--threads', type=int, default=8,
+						help='concurrent client threads')
+	parser.add_argument('--apis', nargs='+', choices=sorted(APIS),
+						default=sorted(APIS))
+	parser.add_argument('--scenarios', nargs='+', choices=SCENARIOS,
+						default=SCENARIOS)
+	parser.add_argument('--seed', type=int, default=0,
+						help='seed of the random pages, dates and pks')
+	parser.add_argument('--output', default='benchmark-results.json',
+						help='JSON results file')
+	parser.add_argument('--compare', metavar='RESULTS',
+						help='results file of a previous run to diff against')
+	args = parser.parse_args()
+	db_path = setup(args.db)
+
+	import django
+	from django.conf import settings
+	from django.core.wsgi import get_wsgi_application
+	from courses.models import Course
+
+	# Same page size on both APIs
+	page_size = settings.REST_FRAMEWORK['PAGE_SIZE']
+	client = Client(get_wsgi_application())
+	results = []
+	for rows in sorted(args.sizes or [args.rows]):
+		seed_courses(rows)
+		pks = list(Course.objects.values_list('pk', flat=True))
+		for api in args.apis:
+			scenarios = Scenarios(client, api, APIS[api], pks, page_size)
+			requests = args.requests
+			for name in args.scenarios:
+				if name in ('update', 'delete') and not scenarios.created:
+					# Needs the objects of the create scenario
+					continue
+				if name == 'delete':
+					requests = min(requests, len(scenarios.created))
+				latencies, errors, elapsed = run(
+					getattr(scenarios, name), requests, args.threads, args.seed)
+				case = dict(summarize(latencies, errors, elapsed), rows=rows,
+							api=api, scenario=name)
+				results.append(case)
+				print('{rows:>8} {api:<5} {scenario:<7} {throughput_rps:>9.1f} '
+						'req/s   p50 {p50_ms:>8.3f} ms   p95 {p95_ms:>8.3f} ms   '
+						'p99 {p99_ms:>8.3f} ms   errors {errors}'.format(**case))
+			# The catalogue is left as seeded for the next API
+			Course.objects.filter(pk__in=scenarios.created).delete()
+
+	output = {
+		'meta': {
+			'date': datetime.datetime.now().isoformat(timespec='seconds'),
+			'python': platform.python_version(),
+			'django': django.get_version(),
+			'sqlite': sqlite3.sqlite_version,
+			'database': db_path,
+			'threads': args.threads,
+			'requests': args.requests,
+			'seed': args.seed,
+		},
+		'results': results,
+	}
+	with open(args.output, 'w') as f:
+		json.dump(output, f, indent=2)
+	print('Results written to %s' % args.output)
+	if args.compare:
+		compare(results, args.compare)
+
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,45 @@
+"""
+Compares fetching N courses with N detail requests against one `?ids=`
+multi-get request, on both APIs, through the WSGI application in-process.
+
+	python -m benchmarks.multiget --ids 10 50 100
+"""
+import random
+
+from benchmarks import get_parser, measure, report, seed_courses, setup
+from benchmarks.load import APIS, Client
+
+
+def main():
+	parser = get_parser(__doc__)
+	parser.add_argument('--ids', type=int, nargs='+', default=[10, 50, 100],
+						help='numbers of courses to fetch')
+	args = parser.parse_args()
+	setup(args.db)
+	seed_courses(args.rows)
+
+	from django.core.wsgi import get_wsgi_application
+	from courses.models import Course
+
+	client = Client(get_wsgi_application())
+	pks = list(Course.objects.values_list('pk', flat=True))
+	rng = random.Random(0)
+	for count in args.ids:
+		ids = rng.sample(pks, count)
+		for api, url in sorted(APIS.items()):
+			def details():
+				for pk in ids:
+					assert client.request('GET', '%s%d/' % (url, pk))[0] == 200
+
+			def multi_get():
+				query = {'ids': ','.join(str(pk) for pk in ids)}
+				assert client.request('GET', url, query)[0] == 200
+
+			report('%s %d detail requests' % (api, count),
+					measure(details, args.repeat))
+			report('%s multi-get of %d' % (api, count),
+					measure(multi_get, args.repeat))
+
+
+if __name__ == '__main__':
+	main()
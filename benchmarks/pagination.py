@@ -0,0 +1,44 @@
+"""
+Compares page number and keyset (`?cursor=`) pagination on the first and
+on a deep page of both list endpoints.
+
+	python -m benchmarks.pagination --rows 1000000 --page 10000
+"""
+from benchmarks import get_parser, measure, report, seed_courses, setup
+
+
+def main():
+	parser = get_parser(__doc__, rows=1000000)
+	parser.add_argument('--page', type=int, default=10000,
+						help='deep page number to compare with the first one')
+	args = parser.parse_args()
+	setup(args.db)
+	seed_courses(args.rows)
+
+	from django.test import Client
+	from courses.models import Course
+	from course_catalogue.settings import PURE_REST
+	from views.pagination import encode_cursor
+
+	client = Client()
+	page_size = PURE_REST['PAGE_SIZE']
+	offset = (args.page - 1) * page_size
+	# The cursor of a deep page is the id of the last row of the page before
+	last_id = Course.objects.values_list('id', flat=True)[offset - 1]
+	deep_cursor = encode_cursor([last_id])
+
+	for base in ('/api-pure/v0/courses/', '/api/v0/courses/'):
+		cases = [
+			('page 1', base + '?page=1'),
+			('page %d' % args.page, base + '?page=%d' % args.page),
+			('cursor page 1', base + '?cursor='),
+			('cursor page %d' % args.page, base + '?cursor=' + deep_cursor),
+		]
+		for name, url in cases:
+			assert client.get(url).status_code == 200, url
+			report('%s %s' % (base, name),
+					measure(lambda: client.get(url), args.repeat))
+
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,52 @@
+"""
+Compares the DRF read paths on pages of 10, 100 and 1000 rows: model
+objects through CourseSerializer (the previous path) against `values_list`
+tuples through the row serializer, both rendered by JSONRenderer, with
+the precompiled row encoders of the Pure API for reference.
+
+	python -m benchmarks.rows --sizes 10 100 1000
+"""
+from benchmarks import get_parser, measure, report, seed_courses, setup
+
+
+def main():
+	parser = get_parser(__doc__, rows=1000)
+	parser.add_argument('--sizes', type=int, nargs='+', default=[10, 100, 1000],
+						help='page sizes to compare')
+	args = parser.parse_args()
+	setup(args.db)
+	seed_courses(max(args.rows, max(args.sizes)))
+
+	from rest_framework.renderers import JSONRenderer
+	from courses.models import Course
+	from courses.serializers import CourseSerializer, get_row_serializer
+	from views import json as json_views
+
+	fields = json_views.get_field_names(Course)
+	renderer = JSONRenderer()
+
+	for size in args.sizes:
+		queryset = Course.objects.order_by('pk')[:size]
+
+		def serializer():
+			return renderer.render(CourseSerializer(queryset, many=True).data)
+
+		def row_serializer():
+			rows = get_row_serializer()
+			return renderer.render(rows.to_representations(
+				queryset.values_list(*rows.sources)))
+
+		def pure():
+			encoder = json_views.get_row_encoder(Course, fields)
+			return json_views.get_json_backend().dumps(
+				encoder.encode_rows(queryset.values_list(*fields)))
+
+		assert row_serializer() == serializer()
+		report('%d rows serializer' % size, measure(serializer, args.repeat))
+		report('%d rows row serializer' % size,
+				measure(row_serializer, args.repeat))
+		report('%d rows pure row encoder' % size, measure(pure, args.repeat))
+
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,47 @@
+"""
+Compares the full-text search backend with the `icontains` lookups it
+replaced: one list page (count and first ten rows) per query.
+
+	python -m benchmarks.search --sizes 10000 100000 1000000
+"""
+from benchmarks import get_parser, measure, report, seed_courses, setup
+
+QUERIES = ['python', 'adv', 'deep dive', 'nothing matches']
+
+
+def main():
+	parser = get_parser(__doc__)
+	parser.add_argument('--sizes', type=int, nargs='+',
+						help='table sizes to measure at',
+						default=[10000, 100000, 1000000])
+	args = parser.parse_args()
+	setup(args.db)
+
+	from django.db.models import Q
+	from courses.models import Course
+	from views.search import search
+
+	def icontains(queryset, query):
+		condition = Q()
+		for term in query.split():
+			condition &= Q(name__icontains=term)
+		return queryset.filter(condition)
+
+	def run(queryset):
+		queryset.count()
+		list(queryset.values()[:10])
+
+	for size in sorted(args.sizes):
+		seed_courses(size)
+		print('--- %d rows' % size)
+		for query in QUERIES:
+			base = Course.objects.all()
+			report('icontains %r' % query,
+					measure(lambda: run(icontains(base, query)), args.repeat))
+			report('full-text %r' % query,
+					measure(lambda: run(search(base, ['name'], query)),
+							args.repeat))
+
+
+if __name__ == '__main__':
+	main()
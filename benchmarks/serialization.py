@@ -0,0 +1,65 @@
+"""
+Compares the JSON encoding of Pure API pages of 10, 100 and 1000 rows:
+model dicts through `JsonResponse` with a per-date `format` call (the
+previous encoder) against the precompiled row encoders of `views.json`
+with the standard library and, if it is installed, with orjson.
+
+	python -m benchmarks.serialization --rows 1000
+"""
+import datetime
+import json
+
+from benchmarks import get_parser, measure, report, seed_courses, setup
+
+
+def main():
+	parser = get_parser(__doc__, rows=1000)
+	parser.add_argument('--sizes', type=int, nargs='+', default=[10, 100, 1000],
+						help='page sizes to compare')
+	args = parser.parse_args()
+	setup(args.db)
+	seed_courses(max(args.rows, max(args.sizes)))
+
+	from django.core.serializers.json import DjangoJSONEncoder
+	from django.http import JsonResponse
+	from course_catalogue.settings import PURE_REST
+	from courses.models import Course
+	from views import json as json_views
+
+	class PreviousEncoder(DjangoJSONEncoder):
+		def default(self, o):
+			if isinstance(o, datetime.date):
+				return format(o, PURE_REST['DATE_FORMAT'])
+			return super().default(o)
+
+	fields = json_views.get_field_names(Course)
+	backends = ['json'] + (['orjson'] if json_views.orjson is not None else [])
+
+	for size in args.sizes:
+		queryset = Course.objects.all()[:size]
+
+		def previous():
+			return JsonResponse({'count': args.rows, 'total_pages': 1,
+								'results': list(queryset.values(*fields))},
+								encoder=PreviousEncoder).content
+
+		expected = json.loads(previous())
+		report('%d rows previous encoder' % size,
+				measure(previous, args.repeat))
+		for backend in backends:
+			PURE_REST['JSON_BACKEND'] = backend
+
+			def precompiled():
+				encoder = json_views.get_row_encoder(Course, fields)
+				return json_views.render_json({
+					'count': args.rows, 'total_pages': 1,
+					'results': encoder.encode_rows(
+						queryset.values_list(*fields))}).content
+
+			assert json.loads(precompiled()) == expected, backend
+			report('%d rows %s row encoder' % (size, backend),
+					measure(precompiled, args.repeat))
+
+
+if __name__ == '__main__':
+	main()
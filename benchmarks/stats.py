@@ -0,0 +1,63 @@
+"""
+Compares the stats endpoint, which reads the summary table kept by
+triggers, with aggregating the course table by month on every request,
+and the cost of the triggers to writes: bulk inserts with and without
+them.
+
+	python -m benchmarks.stats --rows 1000000
+"""
+from benchmarks import get_parser, measure, report, seed_courses, setup
+
+
+def main():
+	parser = get_parser(__doc__, rows=1000000)
+	parser.add_argument('--inserts', type=int, default=10000,
+						help='courses inserted per write measurement')
+	args = parser.parse_args()
+	setup(args.db)
+	seed_courses(args.rows)
+
+	from django.apps import apps
+	from django.db import connection, transaction
+	from django.db.models import Count, F, Sum
+	from django.db.models.functions import TruncMonth
+	from django.test import Client
+	from courses.apps import get_stats_expressions, get_stats_sources
+	from courses.models import Course, CourseMonthStats
+	from views.stats import install_summary_triggers, uninstall_summary_triggers
+
+	client = Client()
+
+	def endpoint():
+		response = client.get('/api-pure/v0/courses/stats/',
+								{'group_by': 'month'})
+		assert response.status_code == 200, response.content
+
+	def aggregate():
+		list(Course.objects.annotate(month=TruncMonth('start_date'))
+				.order_by('month').values('month')
+				.annotate(courses=Count('pk'), lectures=Sum('lectures_num'),
+							duration=Sum(F('end_date') - F('start_date'))))
+
+	report('aggregation by month', measure(aggregate, args.repeat))
+	report('stats endpoint by month', measure(endpoint, args.repeat))
+
+	sources = get_stats_sources(apps)
+
+	def insert():
+		with transaction.atomic():
+			Course.objects.bulk_create([Course(
+				name='Insert %d' % i, start_date='2020-01-01',
+				end_date='2020-02-01', lectures_num=8)
+				for i in range(args.inserts)])
+			transaction.set_rollback(True)
+
+	report('%d inserts with triggers' % args.inserts, measure(insert, 5))
+	uninstall_summary_triggers(connection, CourseMonthStats, sources)
+	report('%d inserts without triggers' % args.inserts, measure(insert, 5))
+	install_summary_triggers(connection, CourseMonthStats, sources,
+								*get_stats_expressions(connection))
+
+
+if __name__ == '__main__':
+	main()
@@ -44,6 +44,11 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    # Removes itself unless DATABASE_ROUTING has a replica
+    'views.routing.ReplicaStickinessMiddleware',
+    # Last, so the time before the view is URL resolution. Removes itself
+    # unless PURE_REST['INSTRUMENTATION'] enables it
+    'views.instrumentation.InstrumentationMiddleware',
 ]
 
 ROOT_URLCONF = 'course_catalogue.urls'
@@ -70,11 +75,45 @@ WSGI_APPLICATION = 'course_catalogue.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/3.1/ref/settings/#databases
 
+# Database profile, applied by the course_catalogue.sqlite3 backend:
+# PRAGMAS run on every new connection (WAL lets readers work while a writer
+# writes, synchronous=NORMAL is safe with WAL), `timeout` is the seconds a
+# writer waits for the lock instead of failing with "database is locked"
+# (IMMEDIATE transactions take the lock first, so they can wait for it),
+# connections are kept for CONN_MAX_AGE seconds and checked before reuse
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'cache_size': -65536,  # KiB
+    'temp_store': 'MEMORY',
+}
+
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
-    }
+        'ENGINE': 'course_catalogue.sqlite3',
+        'NAME': config('DATABASE_NAME', default=str(BASE_DIR / 'db.sqlite3')),
+        'CONN_MAX_AGE': config('CONN_MAX_AGE', default=600, cast=int),
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {'timeout': 20, 'transaction_mode': 'IMMEDIATE'},
+        'PRAGMAS': SQLITE_PRAGMAS,
+    },
+}
+# Read replica, e.g. a copy kept up to date by Litestream or LiteFS. The
+# primary's file unless DATABASE_REPLICA_NAME is given
+DATABASES['replica'] = dict(
+    DATABASES['default'],
+    NAME=config('DATABASE_REPLICA_NAME', default=DATABASES['default']['NAME']),
+)
+
+DATABASE_ROUTERS = ['views.routing.ReplicaRouter']
+
+# Reads of the list, detail, export and change feed views of both APIs go
+# to REPLICA (None reads from the primary). After a write the client reads
+# from the primary for STICKY_SECONDS, marked by the COOKIE cookie
+DATABASE_ROUTING = {
+    'REPLICA': 'replica' if config('DATABASE_REPLICA_NAME', default='') else None,
+    'STICKY_SECONDS': 5,
+    'COOKIE': 'read_primary',
 }
 
 
@@ -115,13 +154,28 @@ MEDIA_ROOT = os.path.join(BASE_DIR, 'media/')
 # Rest Framework settings
 REST_FRAMEWORK = {
     'DEFAULT_FILTER_BACKENDS': ['django_filters.rest_framework.DjangoFilterBackend',
-                                'rest_framework.filters.SearchFilter',
+                                'courses.filters.FullTextSearchFilter',
                                 'rest_framework.filters.OrderingFilter'],
-    'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
+    'DEFAULT_PAGINATION_CLASS': 'courses.pagination.CursorPageNumberPagination',
     'PAGE_SIZE': 10,
     'DATETIME_FORMAT': "%d.%m.%Y %H:%M",
     'DATE_FORMAT': "%d.%m.%Y",
     'DATE_INPUT_FORMATS': ['%Y-%m-%d', '%d.%m.%Y'],
+    # Rows per statement and the most objects per request of bulk actions
+    'BULK_BATCH_SIZE': 500,
+    'BULK_MAX_ITEMS': 10000,
+    # The most ids one `?ids=` multi-get may ask for
+    'MULTI_GET_MAX_IDS': 100,
+    # Counts of paginated lists: STRATEGY is 'exact', 'cached' (kept for
+    # TIMEOUT seconds in CACHE, 'locmem' or an alias from CACHES, and dropped
+    # on writes) or 'estimated' (exact up to LIMIT, estimated above it)
+    'COUNT': {
+        'STRATEGY': 'exact',
+        'CACHE': 'locmem',
+        'MAX_ENTRIES': 1000,
+        'TIMEOUT': 60,
+        'LIMIT': 10000,
+    },
 }
 
 APPEND_SLASH = True
@@ -131,6 +185,83 @@ APPEND_SLASH = True
 PURE_REST = {
     'PAGE_SIZE': 10,
     'DATE_FORMAT': "%d.%m.%Y",
+    # Counts of paginated lists, see REST_FRAMEWORK['COUNT']
+    'COUNT': {
+        'STRATEGY': 'exact',
+        'CACHE': 'locmem',
+        'MAX_ENTRIES': 1000,
+        'TIMEOUT': 60,
+        'LIMIT': 10000,
+    },
+    # Encoder of responses: 'json', 'orjson' or 'auto' (orjson if installed)
+    'JSON_BACKEND': 'auto',
+    # Cache of GET responses of the Pure API, invalidated by writes.
+    # BACKEND is 'locmem' (in-process LRU), an alias from CACHES or None
+    'RESPONSE_CACHE': {
+        'BACKEND': None,
+        'MAX_ENTRIES': 1000,
+        'TIMEOUT': 60,
+    },
+    # Rows per statement and the most objects per request of bulk endpoints
+    'BULK_BATCH_SIZE': 500,
+    'BULK_MAX_ITEMS': 10000,
+    # The most ids one `?ids=` multi-get may ask for
+    'MULTI_GET_MAX_IDS': 100,
+    # Rows fetched from the database and sent to the client at once by exports
+    'EXPORT_CHUNK_SIZE': 2000,
+    # Rows committed per transaction by the import_courses command
+    'IMPORT_BATCH_SIZE': 10000,
+    # Database threads of the async Pure views (None runs them on the thread
+    # Django runs sync views on), the most requests waiting for one and the
+    # Retry-After seconds of the 503 answering requests beyond that
+    'ASYNC': {
+        'MAX_WORKERS': 8,
+        'MAX_QUEUE': 64,
+        'RETRY_AFTER': 1,
+    },
+    # Per-request query count, SQL and phase timings of both APIs, reported in
+    # the Server-Timing header and as JSON lines of the views.instrumentation
+    # logger. METRICS keeps the last METRICS_SAMPLES durations per route for
+    # the percentiles at /metrics, which answers requests with the
+    # `Authorization: Bearer <METRICS_TOKEN>` header or from METRICS_ALLOWED_IPS
+    # (REMOTE_ADDR, the proxy's address behind one), nobody else
+    'INSTRUMENTATION': {
+        'ENABLED': False,
+        'SERVER_TIMING': True,
+        'LOG': True,
+        'METRICS': False,
+        'METRICS_SAMPLES': 1000,
+        'METRICS_TOKEN': config('METRICS_TOKEN', default=''),
+        'METRICS_ALLOWED_IPS': [],
+    },
+    # Change feed: entries per page by default and at most, and the days
+    # entries are kept for by the compact_changes command
+    'CHANGES': {
+        'PAGE_SIZE': 100,
+        'MAX_PAGE_SIZE': 1000,
+        'RETENTION_DAYS': 30,
+    },
+    # The archive_courses command moves courses that ended more than
+    # HORIZON_DAYS ago to the archive table, BATCH_SIZE per transaction
+    'ARCHIVE': {
+        'HORIZON_DAYS': 365,
+        'BATCH_SIZE': 1000,
+    },
+}
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'views.instrumentation': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
 }
 
 DATE_INPUT_FORMATS = ['%Y-%m-%d', '%d.%m.%Y']
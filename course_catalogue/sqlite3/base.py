@@ -0,0 +1,77 @@
+import os
+
+from django.db.backends.sqlite3 import base
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+	"""
+	SQLite backend applying the database profile of the settings: `PRAGMAS`
+	run on every new connection, transactions start with the
+	`transaction_mode` of OPTIONS (as in later Django versions) and, with
+	`CONN_HEALTH_CHECKS`, persistent connections are checked before their
+	first use in a request
+	"""
+	health_check_done = False
+	file_id = None
+	transaction_mode = None
+
+	def get_file_id(self):
+		"""
+		Identity of the database file, which changes when it's replaced (e.g.
+		a replica refreshed with a new copy), None for in-memory databases
+		"""
+		if self.is_in_memory_db():
+			return None
+		try:
+			stat = os.stat(self.settings_dict['NAME'])
+		except OSError:
+			return None
+		return stat.st_dev, stat.st_ino
+
+	def get_connection_params(self):
+		params = super().get_connection_params()
+		# Not an option of sqlite3.connect, see _start_transaction_under_autocommit
+		self.transaction_mode = params.pop('transaction_mode', None)
+		return params
+
+	def _start_transaction_under_autocommit(self):
+		# A deferred transaction reading before it writes fails right away
+		# with "database is locked" if another writer committed meanwhile,
+		# an IMMEDIATE one waits for the lock up to `timeout` instead
+		if self.transaction_mode:
+			self.cursor().execute('BEGIN %s' % self.transaction_mode)
+		else:
+			super()._start_transaction_under_autocommit()
+
+	def get_new_connection(self, conn_params):
+		connection = super().get_new_connection(conn_params)
+		for name, value in self.settings_dict.get('PRAGMAS', {}).items():
+			connection.execute('PRAGMA %s = %s' % (name, value))
+		self.file_id = self.get_file_id()
+		return connection
+
+	def is_usable(self):
+		try:
+			self.connection.execute('SELECT 1')
+		except base.Database.Error:
+			return False
+		# A connection to a replaced file keeps reading the old one
+		return self.get_file_id() == self.file_id
+
+	def close_if_unusable_or_obsolete(self):
+		super().close_if_unusable_or_obsolete()
+		# Called when a request starts and ends, the next one checks again
+		self.health_check_done = False
+
+	def ensure_connection(self):
+		if self.needs_health_check():
+			if not self.is_usable():
+				self.close()
+			self.health_check_done = True
+		super().ensure_connection()
+
+	def needs_health_check(self):
+		if self.connection is None or self.in_atomic_block:
+			return False
+		return not self.health_check_done and \
+			self.settings_dict.get('CONN_HEALTH_CHECKS', False)
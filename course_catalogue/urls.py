@@ -17,7 +17,9 @@ from django.contrib import admin
 from django.urls import path, include
 
 from rest_framework import routers
+from courses.urls import async_urlpatterns
 from courses.views import CourseViewSet
+from views.instrumentation import metrics_view
 
 from rest_framework import permissions
 from drf_yasg.views import get_schema_view
@@ -49,6 +51,9 @@ urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/v0/', include(api_urls)),
     path('api-pure/v0/', include('courses.urls')),
+    path('api-pure-async/v0/', include(async_urlpatterns)),
+    # Request metrics per route, see PURE_REST['INSTRUMENTATION']
+    path('metrics', metrics_view, name='metrics'),
     # Swagger UI
     path('swagger/', schema_view.with_ui('swagger', cache_timeout=0),
          name='schema-swagger-ui'),
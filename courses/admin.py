@@ -1,9 +1,26 @@
 from django.contrib import admin
+from django.db import transaction
+from views.signals import objects_written
 from .models import Course
 
 
 class CourseAdmin(admin.ModelAdmin):
-	pass
+	def save_model(self, request, obj, form, change):
+		super().save_model(request, obj, form, change)
+		objects_written.send(sender=Course, action='update' if change else 'create',
+							pks=[obj.pk])
+
+	def delete_model(self, request, obj):
+		pk = obj.pk
+		super().delete_model(request, obj)
+		objects_written.send(sender=Course, action='delete', pks=[pk])
+
+	def delete_queryset(self, request, queryset):
+		# Unlike the change and delete views, actions aren't atomic
+		with transaction.atomic(savepoint=False):
+			pks = list(queryset.values_list('pk', flat=True))
+			super().delete_queryset(request, queryset)
+			objects_written.send(sender=Course, action='delete', pks=pks)
 
 
 admin.site.register(Course, CourseAdmin)
@@ -1,5 +1,78 @@
 from django.apps import AppConfig
+from django.db import connections
+from django.db.models.signals import post_migrate
+
+# Course fields covered by the full-text index
+SEARCH_FIELDS = ['name']
+
+# Sums of the courses starting in a month behind the stats endpoint: the
+# month and the measures of a course row as SQL of each database with
+# summary triggers (see views.stats)
+STATS_KEYS = {
+    'sqlite': "strftime('%Y-%m-01', {row}.start_date)",
+    'postgresql': "date_trunc('month', {row}.start_date)::date",
+}
+STATS_MEASURES = {
+    'sqlite': {
+        'courses': '1',
+        'lectures': '{row}.lectures_num',
+        'duration_days': 'CAST(julianday({row}.end_date) - '
+                         'julianday({row}.start_date) AS INTEGER)',
+    },
+    'postgresql': {
+        'courses': '1',
+        'lectures': '{row}.lectures_num',
+        'duration_days': '({row}.end_date - {row}.start_date)',
+    },
+}
+
+
+def get_stats_expressions(connection):
+    """
+    The key and measures of the course stats on the database of connection
+    """
+    from views.stats import check_summary_support
+    check_summary_support(connection)
+    return STATS_KEYS[connection.vendor], STATS_MEASURES[connection.vendor]
+
+
+def get_stats_sources(apps):
+    return [apps.get_model('courses', name)
+            for name in ('Course', 'ArchivedCourse')]
+
+
+def ensure_search_index(sender, using, apps=None, **kwargs):
+    # SQLite migrations rebuild altered tables and drop their triggers on the
+    # way, so make sure the ones keeping the search index in sync are back
+    from views.search import install_search_index
+    for name in ('Course', 'ArchivedCourse'):
+        try:
+            model = apps.get_model('courses', name)
+        except (AttributeError, LookupError):
+            continue
+        install_search_index(connections[using], model, SEARCH_FIELDS,
+                             rebuild=False)
+
+
+def ensure_stats_triggers(sender, using, apps=None, **kwargs):
+    # Dropped by table rebuilds as well
+    from views.stats import install_summary_triggers, is_summary_supported
+    try:
+        summary = apps.get_model('courses', 'CourseMonthStats')
+        sources = get_stats_sources(apps)
+    except (AttributeError, LookupError):
+        return
+    connection = connections[using]
+    if not is_summary_supported(connection):
+        # The stats view answers 501 there
+        return
+    install_summary_triggers(connection, summary, sources,
+                             *get_stats_expressions(connection))
 
 
 class CoursesConfig(AppConfig):
     name = 'courses'
+
+    def ready(self):
+        post_migrate.connect(ensure_search_index, sender=self)
+        post_migrate.connect(ensure_stats_triggers, sender=self)
@@ -0,0 +1,60 @@
+import django_filters
+from rest_framework import filters
+
+from views.filters import get_overlap_filter
+from views.search import search
+from .models import Course, CourseRecord
+
+
+class FullTextSearchFilter(filters.SearchFilter):
+	"""
+	DRF search filter using the full-text index instead of `icontains`
+	lookups. Prefixed search fields (`^name`, `=name`, ...) keep the default
+	DRF behaviour
+	"""
+	def filter_queryset(self, request, queryset, view):
+		search_fields = self.get_search_fields(view, request)
+		query = request.query_params.get(self.search_param, '')
+		if not search_fields or not query.strip():
+			return queryset
+		if any(field[0] in self.lookup_prefixes for field in search_fields):
+			return super().filter_queryset(request, queryset, view)
+		return search(queryset, search_fields, query)
+
+
+class DateRangeFilter(django_filters.BaseRangeFilter,
+						django_filters.DateFilter):
+	"""
+	Accepts two comma-separated dates: `<start>,<end>`
+	"""
+
+
+class CourseFilterSet(django_filters.FilterSet):
+	"""
+	Date lookups plus interval queries: `active_on=<date>` and
+	`overlaps=<start>,<end>`
+	"""
+	active_on = django_filters.DateFilter(method='filter_active_on')
+	overlaps = DateRangeFilter(method='filter_overlaps')
+
+	class Meta:
+		model = Course
+		fields = {'start_date': ['gte', 'lte', 'exact', 'gt', 'lt'],
+					'end_date': ['gte', 'lte', 'exact', 'gt', 'lt']}
+
+	def filter_active_on(self, queryset, name, value):
+		return queryset.filter(
+			**get_overlap_filter('start_date', 'end_date', value, value))
+
+	def filter_overlaps(self, queryset, name, value):
+		start, end = value
+		return queryset.filter(
+			**get_overlap_filter('start_date', 'end_date', start, end))
+
+
+class CourseRecordFilterSet(CourseFilterSet):
+	"""
+	CourseFilterSet of courses and archived courses together
+	"""
+	class Meta(CourseFilterSet.Meta):
+		model = CourseRecord
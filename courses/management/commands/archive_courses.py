@@ -0,0 +1,34 @@
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from course_catalogue.settings import PURE_REST
+from courses.models import ArchivedCourse, Course
+from views.archive import archive_objects
+
+
+class Command(BaseCommand):
+	help = ('Moves courses that ended more than --days ago to the archive '
+			'table in batched transactions. Lists read them with '
+			'`?include_archived=1`, detail requests by id as before')
+
+	def add_arguments(self, parser):
+		parser.add_argument('--days', type=int,
+							default=PURE_REST['ARCHIVE']['HORIZON_DAYS'],
+							help='days after their end to keep courses live for')
+		parser.add_argument('--batch-size', type=int,
+							default=PURE_REST['ARCHIVE']['BATCH_SIZE'],
+							help='courses moved per transaction')
+
+	def handle(self, *args, **options):
+		if options['days'] < 0:
+			raise CommandError('--days must not be negative')
+		if options['batch_size'] < 1:
+			raise CommandError('--batch-size must be positive')
+		horizon = timezone.localdate() - datetime.timedelta(days=options['days'])
+		moved = archive_objects(Course.objects.filter(end_date__lt=horizon),
+								ArchivedCourse, options['batch_size'])
+		if options['verbosity']:
+			self.stdout.write('Archived %d courses that ended before %s'
+								% (moved, horizon.isoformat()))
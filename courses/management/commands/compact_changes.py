@@ -0,0 +1,27 @@
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from course_catalogue.settings import PURE_REST
+from courses.models import CourseChange
+from views.changes import compact_changes
+
+
+class Command(BaseCommand):
+	help = ('Compacts the change log of courses: removes entries superseded '
+			'by later ones and entries older than --days. Pollers behind the '
+			'removed entries get 410 Gone from the change feed')
+
+	def add_arguments(self, parser):
+		parser.add_argument('--days', type=int,
+							default=PURE_REST['CHANGES']['RETENTION_DAYS'],
+							help='days to keep entries for')
+
+	def handle(self, *args, **options):
+		if options['days'] < 0:
+			raise CommandError('--days must not be negative')
+		before = timezone.now() - datetime.timedelta(days=options['days'])
+		removed = compact_changes(CourseChange, before)
+		if options['verbosity']:
+			self.stdout.write('Removed %d change log entries' % removed)
@@ -0,0 +1,272 @@
+import contextlib
+import csv
+import datetime
+import functools
+import json
+import os
+import sys
+import time
+
+from django.conf import settings
+from django.core.exceptions import NON_FIELD_ERRORS, ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, router, transaction
+
+from course_catalogue.settings import PURE_REST
+from courses.apps import SEARCH_FIELDS
+from courses.models import Course, validate_dates
+from views.bulk import insert_rows
+from views.search import install_search_index, uninstall_search_index
+
+FIELDS = ['name', 'start_date', 'end_date', 'lectures_num']
+DATE_FIELDS = {'start_date', 'end_date'}
+MODEL_FIELDS = [(name, Course._meta.get_field(name)) for name in FIELDS]
+
+# Applied for the duration of `--fast` loads on SQLite. WAL keeps the file
+# consistent if the process dies, synchronous=OFF skips fsync, so the last
+# transactions (not the file) may be lost on a power failure
+FAST_PRAGMAS = [
+	('journal_mode', 'WAL'),
+	('synchronous', 'OFF'),
+	('cache_size', -262144),
+	('temp_store', 'MEMORY'),
+]
+
+
+@functools.lru_cache(maxsize=65536)
+def parse_date(value):
+	for date_format in settings.DATE_INPUT_FORMATS:
+		try:
+			return datetime.datetime.strptime(value, date_format).date()
+		except ValueError:
+			continue
+	raise ValidationError('Enter a valid date.')
+
+
+def clean_row(row):
+	"""
+	Returns the values of FIELDS in row validated by the same rules as the
+	APIs: the model field validators, the date rule of `Course.clean` and the
+	checks of `CourseSerializer.validate`. Raises ValidationError
+	"""
+	if not isinstance(row, dict):
+		raise ValidationError('Expected a JSON object.')
+	errors = {}
+	values = {}
+	for name, field in MODEL_FIELDS:
+		value = row.get(name, None)
+		try:
+			if name in DATE_FIELDS and value and isinstance(value, str):
+				value = parse_date(value)
+			values[name] = field.clean(value, None)
+		except ValidationError as e:
+			errors[name] = e.messages
+	# The rule of `CourseSerializer.validate`, model validation leaves it to
+	# the CHECK constraint of the column
+	if 'lectures_num' in values and values['lectures_num'] < 0:
+		errors['lectures_num'] = ['Number of lectures should be a natural number']
+	if errors:
+		raise ValidationError(errors)
+	validate_dates(values['start_date'], values['end_date'])
+	return tuple(values[name] for name in FIELDS)
+
+
+def read_ndjson(source):
+	"""
+	Yields (line number, row) for every non-blank line of source, lines that
+	aren't valid JSON are yielded as they are
+	"""
+	for number, line in enumerate(source, 1):
+		if not line.strip():
+			continue
+		try:
+			yield number, json.loads(line)
+		except ValueError:
+			yield number, line.rstrip('\n')
+
+
+def read_csv(source):
+	"""
+	Yields (line number, row) for every record of source, the first line is
+	the header
+	"""
+	reader = csv.DictReader(source)
+	for row in reader:
+		yield reader.line_num, row
+
+
+class Command(BaseCommand):
+	help = ('Imports courses from an NDJSON or CSV file (or stdin), '
+			'validating them and inserting them in batched transactions')
+	readers = {'ndjson': read_ndjson, 'csv': read_csv}
+
+	def add_arguments(self, parser):
+		parser.add_argument('path', nargs='?', default='-',
+							help="file to import, '-' for stdin (default)")
+		parser.add_argument('--format', choices=sorted(self.readers),
+							help='input format, guessed from the file extension '
+							'by default (ndjson for stdin)')
+		parser.add_argument('--batch-size', type=int,
+							default=PURE_REST['IMPORT_BATCH_SIZE'],
+							help='rows committed per transaction')
+		parser.add_argument('--checkpoint',
+							help='file recording the progress after every '
+							'transaction')
+		parser.add_argument('--resume', action='store_true',
+							help='skip the input already imported according to '
+							'the checkpoint')
+		parser.add_argument('--rejects',
+							help='file collecting the rejected rows with their '
+							'errors, as NDJSON')
+		parser.add_argument('--fast', action='store_true',
+							help='tune SQLite for the load, trading durability '
+							'on power loss for speed')
+		parser.add_argument('--defer-search-index', action='store_true',
+							help='drop the SQLite full-text index during the '
+							'load and rebuild it afterwards')
+
+	def handle(self, *args, **options):
+		self.verbosity = options['verbosity']
+		path = options['path']
+		input_format = options['format']
+		if input_format is None:
+			input_format = 'csv' if path.lower().endswith('.csv') else 'ndjson'
+		if options['batch_size'] < 1:
+			raise CommandError('--batch-size must be positive')
+		if options['resume'] and not options['checkpoint']:
+			raise CommandError('--resume requires --checkpoint')
+
+		checkpoint = self.load_checkpoint(options['checkpoint'],
+											options['resume'])
+		connection = connections[router.db_for_write(Course)]
+		with contextlib.ExitStack() as stack:
+			if path == '-':
+				source = sys.stdin
+			else:
+				source = stack.enter_context(
+					open(path, newline='', encoding='utf-8'))
+			rejects = None
+			if options['rejects']:
+				mode = 'a' if checkpoint['line'] else 'w'
+				rejects = stack.enter_context(
+					open(options['rejects'], mode, encoding='utf-8'))
+			if options['fast']:
+				stack.enter_context(self.tuned_sqlite(connection))
+			if options['defer_search_index']:
+				stack.enter_context(self.deferred_search_index(connection))
+			self.load(self.readers[input_format](source), checkpoint,
+					options['batch_size'], options['checkpoint'], rejects)
+
+	def load(self, records, checkpoint, batch_size, checkpoint_path, rejects):
+		started = reported = time.monotonic()
+		skip = checkpoint['line']
+		imported = rejected = 0
+		batch = []
+		rejected_rows = []
+		line = skip
+		for line, row in records:
+			if line <= skip:
+				continue
+			try:
+				batch.append(clean_row(row))
+			except ValidationError as e:
+				errors = e.message_dict if hasattr(e, 'error_dict') else {
+					NON_FIELD_ERRORS: e.messages}
+				rejected_rows.append({'line': line, 'row': row, 'errors': errors})
+			if len(batch) + len(rejected_rows) < batch_size:
+				continue
+			self.commit(batch, rejected_rows, rejects, checkpoint, line,
+						checkpoint_path)
+			imported += len(batch)
+			rejected += len(rejected_rows)
+			batch, rejected_rows = [], []
+			if time.monotonic() - reported >= 1:
+				reported = time.monotonic()
+				self.report(imported, rejected, reported - started)
+		self.commit(batch, rejected_rows, rejects, checkpoint, line,
+					checkpoint_path)
+		imported += len(batch)
+		rejected += len(rejected_rows)
+		self.report(imported, rejected, time.monotonic() - started, done=True)
+
+	def commit(self, batch, rejected_rows, rejects, checkpoint, line,
+				checkpoint_path):
+		"""
+		Inserts a batch in one transaction, then records its rejected rows and
+		the checkpoint, so a resumed import starts right after the batch
+		"""
+		if batch:
+			with transaction.atomic(using=router.db_for_write(Course)):
+				insert_rows(Course, FIELDS, batch)
+		if rejects is not None:
+			for rejected_row in rejected_rows:
+				rejects.write(json.dumps(rejected_row) + '\n')
+			rejects.flush()
+		checkpoint['line'] = line
+		checkpoint['imported'] += len(batch)
+		checkpoint['rejected'] += len(rejected_rows)
+		if checkpoint_path:
+			# Replaced atomically, a crash leaves either the old or the new one
+			with open(checkpoint_path + '.tmp', 'w') as f:
+				json.dump(checkpoint, f)
+			os.replace(checkpoint_path + '.tmp', checkpoint_path)
+
+	def load_checkpoint(self, path, resume):
+		checkpoint = {'line': 0, 'imported': 0, 'rejected': 0}
+		if not path or not os.path.exists(path):
+			return checkpoint
+		if not resume:
+			raise CommandError('Checkpoint %s exists, pass --resume to continue '
+								'the import or remove it' % path)
+		try:
+			with open(path) as f:
+				checkpoint.update(json.load(f))
+		except ValueError:
+			raise CommandError('Checkpoint %s is corrupted' % path)
+		if self.verbosity:
+			self.stdout.write('Resuming after line %d (%d imported, %d rejected)'
+								% (checkpoint['line'], checkpoint['imported'],
+									checkpoint['rejected']))
+		return checkpoint
+
+	def report(self, imported, rejected, elapsed, done=False):
+		if not self.verbosity:
+			return
+		message = '%s %d courses, %d rejected, in %.1f s (%.0f rows/s)' % (
+			'Imported' if done else 'Importing...', imported, rejected, elapsed,
+			(imported + rejected) / elapsed if elapsed else 0)
+		self.stdout.write(self.style.SUCCESS(message) if done else message)
+
+	@contextlib.contextmanager
+	def tuned_sqlite(self, connection):
+		# SQLite can't change them inside a transaction
+		if connection.vendor != 'sqlite' or connection.in_atomic_block:
+			yield
+			return
+		with connection.cursor() as cursor:
+			previous = {}
+			for name, value in FAST_PRAGMAS:
+				cursor.execute('PRAGMA %s' % name)
+				previous[name] = cursor.fetchone()[0]
+				cursor.execute('PRAGMA %s = %s' % (name, value))
+		try:
+			yield
+		finally:
+			with connection.cursor() as cursor:
+				for name, value in reversed(FAST_PRAGMAS):
+					cursor.execute('PRAGMA %s = %s' % (name, previous[name]))
+
+	@contextlib.contextmanager
+	def deferred_search_index(self, connection):
+		"""
+		Drops the full-text index, whose triggers update it row by row, and
+		builds it once from the table afterwards (even if the load failed)
+		"""
+		if connection.vendor != 'sqlite':
+			yield
+			return
+		uninstall_search_index(connection, Course)
+		try:
+			yield
+		finally:
+			install_search_index(connection, Course, SEARCH_FIELDS)
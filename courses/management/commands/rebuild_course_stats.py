@@ -0,0 +1,27 @@
+from django.apps import apps
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, router
+
+from courses.apps import get_stats_expressions, get_stats_sources
+from courses.models import CourseMonthStats
+from views.stats import install_summary_triggers, rebuild_summary
+
+
+class Command(BaseCommand):
+	help = ('Recomputes the course stats by month from the course tables and '
+			'reinstalls the triggers keeping them up to date, e.g. after '
+			'writes made without the triggers')
+
+	def handle(self, *args, **options):
+		using = router.db_for_write(CourseMonthStats)
+		sources = get_stats_sources(apps)
+		try:
+			expressions = get_stats_expressions(connections[using])
+		except ImproperlyConfigured as e:
+			raise CommandError(e)
+		install_summary_triggers(connections[using], CourseMonthStats, sources,
+									*expressions)
+		months = rebuild_summary(CourseMonthStats, sources, *expressions, using)
+		if options['verbosity']:
+			self.stdout.write('Rebuilt the course stats of %d months' % months)
@@ -0,0 +1,25 @@
+from django.db import migrations
+
+from courses.apps import SEARCH_FIELDS
+from views.search import install_search_index, uninstall_search_index
+
+
+def create_search_index(apps, schema_editor):
+    install_search_index(schema_editor.connection,
+                         apps.get_model('courses', 'Course'), SEARCH_FIELDS)
+
+
+def drop_search_index(apps, schema_editor):
+    uninstall_search_index(schema_editor.connection,
+                           apps.get_model('courses', 'Course'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0002_auto_20210504_2250'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
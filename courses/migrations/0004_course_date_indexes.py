@@ -0,0 +1,22 @@
+# Generated by Django 3.2 on 2026-10-18 06:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0003_course_search_index'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='course',
+            name='end_date',
+            field=models.DateField(db_index=True, verbose_name='date of end'),
+        ),
+        migrations.AddIndex(
+            model_name='course',
+            index=models.Index(fields=['start_date', 'end_date'], name='course_interval_idx'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 3.2 on 2026-10-18 07:28
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0005_course_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CourseChange',
+            fields=[
+                ('seq', models.BigAutoField(primary_key=True, serialize=False, verbose_name='sequence')),
+                ('object_id', models.BigIntegerField(null=True, verbose_name='object id')),
+                ('action', models.CharField(choices=[('create', 'create'), ('update', 'update'), ('delete', 'delete'), ('compact', 'compact')], max_length=8, verbose_name='action')),
+                ('changed_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='date of change')),
+            ],
+            options={
+                'ordering': ['seq'],
+                'abstract': False,
+            },
+        ),
+        migrations.AddIndex(
+            model_name='coursechange',
+            index=models.Index(fields=['object_id', 'seq'], name='courses_coursechange_object'),
+        ),
+    ]
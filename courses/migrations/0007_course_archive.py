@@ -0,0 +1,73 @@
+# Generated by Django 3.2 on 2026-10-18 07:54
+
+from django.db import migrations, models
+
+from courses.apps import SEARCH_FIELDS
+import views.archive
+from views.search import install_search_index, uninstall_search_index
+
+COLUMNS = 'id, name, start_date, end_date, lectures_num, updated_at'
+
+
+def create_search_index(apps, schema_editor):
+    install_search_index(schema_editor.connection,
+                         apps.get_model('courses', 'ArchivedCourse'),
+                         SEARCH_FIELDS)
+
+
+def drop_search_index(apps, schema_editor):
+    uninstall_search_index(schema_editor.connection,
+                           apps.get_model('courses', 'ArchivedCourse'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0006_course_change'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CourseRecord',
+            fields=[
+                ('name', models.CharField(max_length=50, verbose_name='name')),
+                ('start_date', models.DateField(verbose_name='date of start')),
+                ('end_date', models.DateField(db_index=True, verbose_name='date of end')),
+                ('lectures_num', models.PositiveIntegerField(verbose_name='number of lectures')),
+                ('updated_at', models.DateTimeField(auto_now=True, db_index=True, verbose_name='date of last update')),
+                ('id', models.BigIntegerField(primary_key=True, serialize=False, verbose_name='ID')),
+            ],
+            options={
+                'db_table': 'courses_courserecord',
+                'ordering': ['id'],
+                'abstract': False,
+                'managed': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivedCourse',
+            fields=[
+                ('name', models.CharField(max_length=50, verbose_name='name')),
+                ('start_date', models.DateField(verbose_name='date of start')),
+                ('end_date', models.DateField(db_index=True, verbose_name='date of end')),
+                ('lectures_num', models.PositiveIntegerField(verbose_name='number of lectures')),
+                ('id', views.archive.ArchiveKeyField(primary_key=True, serialize=False, verbose_name='ID')),
+                ('updated_at', models.DateTimeField(db_index=True, verbose_name='date of last update')),
+            ],
+            options={
+                'ordering': ['id'],
+                'abstract': False,
+            },
+        ),
+        migrations.AddIndex(
+            model_name='archivedcourse',
+            index=models.Index(fields=['start_date', 'end_date'], name='archived_course_interval_idx'),
+        ),
+        migrations.RunSQL(
+            'CREATE VIEW courses_courserecord AS '
+            'SELECT %s FROM courses_course UNION ALL '
+            'SELECT %s FROM courses_archivedcourse' % (COLUMNS, COLUMNS),
+            'DROP VIEW courses_courserecord',
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 3.2 on 2026-10-18 08:05
+
+from django.db import migrations, models
+
+from courses.apps import get_stats_expressions, get_stats_sources
+from views.stats import (install_summary_triggers, is_summary_supported,
+                         rebuild_summary, uninstall_summary_triggers)
+
+
+def create_stats(apps, schema_editor):
+    summary = apps.get_model('courses', 'CourseMonthStats')
+    sources = get_stats_sources(apps)
+    connection = schema_editor.connection
+    if not is_summary_supported(connection):
+        return
+    expressions = get_stats_expressions(connection)
+    install_summary_triggers(connection, summary, sources, *expressions)
+    rebuild_summary(summary, sources, *expressions, connection.alias)
+
+
+def drop_stats_triggers(apps, schema_editor):
+    uninstall_summary_triggers(schema_editor.connection,
+                               apps.get_model('courses', 'CourseMonthStats'),
+                               get_stats_sources(apps))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0007_course_archive'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CourseMonthStats',
+            fields=[
+                ('month', models.DateField(primary_key=True, serialize=False, verbose_name='first day of the month')),
+                ('courses', models.BigIntegerField(default=0, verbose_name='number of courses')),
+                ('lectures', models.BigIntegerField(default=0, verbose_name='number of lectures')),
+                ('duration_days', models.BigIntegerField(default=0, verbose_name='total duration in days')),
+            ],
+            options={
+                'ordering': ['month'],
+            },
+        ),
+        migrations.RunPython(create_stats, drop_stats_triggers),
+    ]
@@ -1,26 +1,138 @@
+from django.core.exceptions import ValidationError
 from django.db import models
+from django.dispatch import receiver
 
+from views.archive import ArchiveKeyField, UnionQuerySet
+from views.changes import ChangeLogEntry, log_changes
+from views.counting import invalidate_count_caches
+from views.signals import objects_written
 
-class Course(models.Model):
+
+def validate_dates(start_date, end_date):
 	"""
-	The model of the course.
+	The date rule of courses, shared by model validation and bulk imports
+	"""
+	try:
+		if start_date > end_date:
+			raise ValidationError('Start date should precede end date')
+	except TypeError:
+		raise ValidationError('Date must be an instance of datetime.date')
+
+
+def get_dates_condition(start_date=None, end_date=None):
+	"""
+	The date rule of courses for updates of some of the dates: checked right
+	away if both are given, otherwise returned as a condition on the stored
+	other date. None if no date changes
+	"""
+	if start_date is not None and end_date is not None:
+		validate_dates(start_date, end_date)
+		return None
+	if start_date is not None:
+		return models.Q(end_date__gte=start_date)
+	if end_date is not None:
+		return models.Q(start_date__lte=end_date)
+	return None
+
+
+class AbstractCourse(models.Model):
+	"""
+	The fields of courses, shared by the live and the archived ones
 	"""
 	name = models.CharField(max_length=50, verbose_name='name')
 	start_date = models.DateField(verbose_name='date of start')
-	end_date = models.DateField(verbose_name='date of end')
+	end_date = models.DateField(verbose_name='date of end', db_index=True)
 	lectures_num = models.PositiveIntegerField(verbose_name='number of lectures')
+	# Row version behind ETag/Last-Modified, not exposed by the APIs
+	updated_at = models.DateTimeField(auto_now=True, db_index=True,
+										verbose_name='date of last update')
 
 	class Meta:
+		abstract = True
 		ordering = ['id']
 
 	def __str__(self):
 		return self.name
 
 	def clean(self):
-		# Dates validation
-		from django.core.exceptions import ValidationError
-		try:
-			if self.start_date > self.end_date:
-				raise ValidationError('Start date should precede end date')
-		except TypeError:
-			raise ValidationError('Date must be an instance of datetime.date')
+		validate_dates(self.start_date, self.end_date)
+
+
+class Course(AbstractCourse):
+	"""
+	The model of the course.
+	"""
+	class Meta(AbstractCourse.Meta):
+		indexes = [
+			# Covers start_date lookups as well as interval queries,
+			# which range over start_date and check end_date in the index
+			models.Index(fields=['start_date', 'end_date'],
+						name='course_interval_idx'),
+		]
+
+
+class ArchivedCourse(AbstractCourse):
+	"""
+	A finished course moved out of the course table by the archive_courses
+	command, with its id and version kept
+	"""
+	id = ArchiveKeyField(primary_key=True, verbose_name='ID')
+	updated_at = models.DateTimeField(db_index=True,
+										verbose_name='date of last update')
+
+	class Meta(AbstractCourse.Meta):
+		indexes = [
+			models.Index(fields=['start_date', 'end_date'],
+						name='archived_course_interval_idx'),
+		]
+
+
+class CourseRecord(AbstractCourse):
+	"""
+	A course of either table, read-only: a database view of courses
+	`UNION ALL` archived courses. Ids are unique across both, as archived
+	courses keep theirs and the course table never reuses them
+	"""
+	id = models.BigIntegerField(primary_key=True, verbose_name='ID')
+	# Counted and searched table by table, see `views.search.search`
+	union_of = (Course, ArchivedCourse)
+
+	objects = UnionQuerySet.as_manager()
+
+	class Meta(AbstractCourse.Meta):
+		managed = False
+		db_table = 'courses_courserecord'
+
+
+class CourseMonthStats(models.Model):
+	"""
+	Sums of the courses, live and archived, starting in a month, kept in
+	step with the course tables by triggers (see `views.stats`)
+	"""
+	month = models.DateField(primary_key=True,
+								verbose_name='first day of the month')
+	courses = models.BigIntegerField(default=0, verbose_name='number of courses')
+	lectures = models.BigIntegerField(default=0,
+										verbose_name='number of lectures')
+	duration_days = models.BigIntegerField(
+		default=0, verbose_name='total duration in days')
+
+	class Meta:
+		ordering = ['month']
+
+
+class CourseChange(ChangeLogEntry):
+	"""
+	The change log of courses, behind the change feed
+	"""
+
+
+@receiver(objects_written, sender=Course)
+def log_course_changes(sender, action, pks, **kwargs):
+	log_changes(CourseChange, action, pks)
+
+
+@receiver(objects_written, sender=Course)
+def invalidate_course_record_counts(sender, **kwargs):
+	# Counts of the union are cached under its own model
+	invalidate_count_caches(CourseRecord)
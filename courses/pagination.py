@@ -0,0 +1,130 @@
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.paginator import InvalidPage
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+from views.counting import CountingPaginator
+from views.pagination import InvalidCursor, KeysetPaginator
+
+
+class CountingDjangoPaginator(CountingPaginator):
+	"""
+	Counts objects with the strategy of REST_FRAMEWORK['COUNT']
+	"""
+	def get_count_settings(self):
+		return settings.REST_FRAMEWORK['COUNT']
+
+
+class CursorPageNumberPagination(PageNumberPagination):
+	"""
+	Page number pagination with an opt-in keyset mode: passing `?cursor=`
+	pages by the ordering key and skips COUNT and OFFSET queries
+	"""
+	django_paginator_class = CountingDjangoPaginator
+	cursor_query_param = 'cursor'
+	keyset_page = None
+	django_paginator = None
+
+	def get_django_paginator(self, queryset, page_size):
+		# Shared by the validators and the page, so objects are counted once
+		if self.django_paginator is None:
+			self.django_paginator = self.django_paginator_class(queryset,
+																page_size)
+		return self.django_paginator
+
+	def get_page(self, queryset, request):
+		paginator = self.get_django_paginator(queryset,
+												self.get_page_size(request))
+		page_number = self.get_page_number(request, paginator)
+		try:
+			return paginator.page(page_number)
+		except InvalidPage as e:
+			raise NotFound(self.invalid_page_message.format(
+				page_number=page_number, message=str(e)))
+
+	def paginate_queryset(self, queryset, request, view=None):
+		self.keyset_page = None
+		if self.cursor_query_param not in request.query_params:
+			if not self.get_page_size(request):
+				return None
+			self.page = self.get_page(queryset, request)
+			if self.page.paginator.num_pages > 1 and self.template is not None:
+				self.display_page_controls = True
+			self.request = request
+			return list(self.page)
+
+		page_size = self.get_page_size(request)
+		if not page_size:
+			return None
+		self.request = request
+		self.keyset_page = self.get_keyset_page(queryset, request, page_size)
+		return self.keyset_page.paginate(self.keyset_page.object_list)
+
+	def paginate_rows(self, queryset, request, fields):
+		"""
+		`paginate_queryset` reading the page as `values_list` tuples of fields
+		instead of objects
+		"""
+		self.keyset_page = None
+		page_size = self.get_page_size(request)
+		if not page_size:
+			return None
+		self.request = request
+		if self.cursor_query_param not in request.query_params:
+			self.page = self.get_page(queryset, request)
+			return list(self.page.object_list.values_list(*fields))
+
+		self.keyset_page = self.get_keyset_page(queryset, request, page_size)
+		# The ordering key of the boundary rows makes the cursors
+		columns = fields + [name for name, _ in
+							self.keyset_page.paginator.ordering
+							if name not in fields]
+		rows = self.keyset_page.paginate(
+			self.keyset_page.object_list.values_list(*columns), columns)
+		return [row[:len(fields)] for row in rows]
+
+	def get_keyset_page(self, queryset, request, page_size):
+		paginator = KeysetPaginator(queryset, page_size)
+		try:
+			return paginator.page(request.query_params[self.cursor_query_param])
+		except InvalidCursor as e:
+			raise NotFound(str(e))
+
+	def get_page_queryset(self, queryset, request):
+		"""
+		Returns (rows, total): the window of the queryset the page is read
+		from and, in page number mode, the count of the whole queryset
+		"""
+		page_size = self.get_page_size(request)
+		if not page_size:
+			return queryset, None
+		if self.cursor_query_param not in request.query_params:
+			page = self.get_page(queryset, request)
+			return page.object_list, page.paginator.count
+		return self.get_keyset_page(queryset, request,
+									page_size).object_list, None
+
+	def get_paginated_response(self, data):
+		if self.keyset_page is None:
+			return Response(OrderedDict([
+				('count', self.page.paginator.count),
+				('count_strategy', self.page.paginator.count_strategy),
+				('next', self.get_next_link()),
+				('previous', self.get_previous_link()),
+				('results', data),
+			]))
+		return Response(OrderedDict([
+			('next', self.get_cursor_link(self.keyset_page.next_cursor)),
+			('previous', self.get_cursor_link(self.keyset_page.previous_cursor)),
+			('results', data),
+		]))
+
+	def get_cursor_link(self, cursor):
+		if cursor is None:
+			return None
+		url = self.request.build_absolute_uri()
+		return replace_query_param(url, self.cursor_query_param, cursor)
@@ -0,0 +1,41 @@
+from rest_framework.renderers import BaseRenderer
+
+from views.formats import ColumnarJsonFormat, MessagePackFormat, msgpack
+
+from .serializers import format_date
+
+
+class ColumnarJSONRenderer(BaseRenderer):
+	"""
+	Renders list data laid out by `views.formats.to_columns` as columnar
+	JSON, picked with `?format=columnar` or the Accept header
+	"""
+	media_type = ColumnarJsonFormat.media_type
+	format = ColumnarJsonFormat.name
+	charset = None
+	response_format = ColumnarJsonFormat(format_date)
+
+	def render(self, data, accepted_media_type=None, renderer_context=None):
+		if data is None:
+			return b''
+		return self.response_format.dumps(data)
+
+
+class MessagePackRenderer(ColumnarJSONRenderer):
+	"""
+	The columnar layout in MessagePack
+	"""
+	media_type = MessagePackFormat.media_type
+	format = MessagePackFormat.name
+	render_style = 'binary'
+	response_format = MessagePackFormat(format_date)
+
+
+def get_columnar_renderers():
+	"""
+	Renderers of the columnar layout, MessagePack if msgpack is installed
+	"""
+	renderers = [ColumnarJSONRenderer]
+	if msgpack is not None:
+		renderers.append(MessagePackRenderer)
+	return renderers
@@ -1,16 +1,26 @@
+import functools
+from collections import OrderedDict
+
 from rest_framework import serializers
 from rest_framework.exceptions import ValidationError
+from rest_framework.settings import api_settings
 
 from .models import Course
 
 
 class CourseSerializer(serializers.ModelSerializer):
 	"""
-	Default serializer for Course model
+	Default serializer for Course model, `fields` limits it to some of them
 	"""
 	class Meta:
 		model = Course
-		fields = '__all__'
+		exclude = ['updated_at']
+
+	def __init__(self, *args, fields=None, **kwargs):
+		super().__init__(*args, **kwargs)
+		if fields is not None:
+			for name in set(self.fields).difference(fields):
+				self.fields.pop(name)
 
 	def validate(self, attrs):
 		if attrs['start_date'] > attrs['end_date']:
@@ -18,3 +28,85 @@ class CourseSerializer(serializers.ModelSerializer):
 		if attrs['lectures_num'] < 0:
 			raise ValidationError('Number of lectures should be a natural number')
 		return attrs
+
+
+def get_value_formatter(field):
+	"""
+	Returns a function turning database values of a serializer field into
+	what its `to_representation` returns, picked once per field. Dates are
+	formatted once per value
+	"""
+	if type(field) in (serializers.IntegerField, serializers.CharField):
+		# int() and str() of values the database returns as int and str
+		return None
+	if type(field) is serializers.DateField:
+		output_format = getattr(field, 'format', api_settings.DATE_FORMAT)
+		if output_format is None:
+			return None
+		return functools.lru_cache(maxsize=4096)(field.to_representation)
+	return field.to_representation
+
+
+@functools.lru_cache(maxsize=4096)
+def _format_date(value, date_format):
+	representation = serializers.DateField(
+		format=date_format).to_representation(value)
+	return representation if isinstance(representation, str) \
+		else value.isoformat()
+
+
+def format_date(value):
+	"""
+	Formats a date like the DateFields of the serializers do, with
+	DATE_FORMAT, for the columnar formats
+	"""
+	return _format_date(value, api_settings.DATE_FORMAT)
+
+
+class RowSerializer:
+	"""
+	Read-only fast path of a model serializer: builds the representations
+	of `values_list` tuples of `sources` with formatters precompiled from
+	its fields (see `get_value_formatter`), the same data the serializer
+	makes of model objects. Fields have to be plain model fields
+	"""
+	def __init__(self, serializer):
+		fields = [field for field in serializer.fields.values()
+					if not field.write_only]
+		model_fields = {field.name: field
+						for field in serializer.Meta.model._meta.concrete_fields
+						if not field.is_relation}
+		unsupported = [field.field_name for field in fields
+						if field.source not in model_fields]
+		if unsupported:
+			raise ValueError('Not plain model fields: %s'
+								% ', '.join(unsupported))
+		self.names = [field.field_name for field in fields]
+		self.sources = [field.source for field in fields]
+		self.formatters = [get_value_formatter(field) for field in fields]
+
+	def to_representation(self, row):
+		return OrderedDict(zip(self.names, [
+			value if value is None or formatter is None else formatter(value)
+			for formatter, value in zip(self.formatters, row)]))
+
+	def to_representations(self, rows):
+		"""
+		Representations of rows, None rows stay None
+		"""
+		return [self.to_representation(row) if row is not None else None
+				for row in rows]
+
+
+@functools.lru_cache(maxsize=None)
+def _get_row_serializer(fields, date_format):
+	return RowSerializer(CourseSerializer(fields=fields))
+
+
+def get_row_serializer(fields=None):
+	"""
+	Returns the RowSerializer of CourseSerializer limited to fields,
+	compiled once per fields and date format
+	"""
+	return _get_row_serializer(tuple(fields) if fields is not None else None,
+								api_settings.DATE_FORMAT)
@@ -1,10 +1,63 @@
+import csv
+import datetime
+import re
+import io
+import sqlite3
 import json
+import os
+import tempfile
+import threading
+import time
+import tracemalloc
+from collections import OrderedDict
+from contextlib import closing
+from unittest import mock, skipUnless
 from urllib.parse import urlencode
 
-from django.urls import reverse
+from asgiref.sync import async_to_sync
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import CommandError, call_command
+from django.db import (DatabaseError, connection, connections, router,
+						transaction)
+from django.forms.models import model_to_dict
+from django.http import JsonResponse
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLResolver, get_resolver, reverse
+from django.utils import timezone
+from django.utils.http import http_date
+from django.views import View
 from rest_framework import status
-from rest_framework.test import APITestCase
-from courses.models import Course
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APITestCase, APITransactionTestCase
+from course_catalogue.settings import PURE_REST
+from course_catalogue.sqlite3.base import DatabaseWrapper
+from courses.apps import (SEARCH_FIELDS, ensure_stats_triggers,
+							get_stats_expressions, get_stats_sources)
+from courses.models import (ArchivedCourse, Course, CourseChange,
+							CourseMonthStats, CourseRecord)
+from courses.pagination import CursorPageNumberPagination
+from courses.serializers import CourseSerializer, get_row_serializer
+from courses.views import (AsyncCourseListCreateView, CourseListCreateView,
+							CourseViewSet)
+from views.asynchronous import DeferredJsonResponse, get_executor
+from views.cache import LRUCache, get_response_cache
+from views.counting import _count_caches
+from views.formats import msgpack
+from views.instrumentation import (MetricsAggregator, RequestMetrics,
+									get_aggregator)
+from views.json import DateDjangoJSONEncoder, JsonConditionalMixin, orjson
+from views.pagination import encode_cursor
+from views.routing import read_replica
+from views.search import (has_search_index, install_search_index,
+							uninstall_search_index)
+from views.signals import objects_written
+from views.stats import (install_summary_triggers, rebuild_summary,
+							uninstall_summary_triggers)
 
 
 class DRFCourseAPITest(APITestCase):
@@ -196,3 +249,2246 @@ class PureCourseAPITest(APITestCase):
 		url = reverse('pure-course-detail', kwargs={'pk': self.entities[-1].id})
 		response = self.client.delete(url, format='json')
 		self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+
+class CursorPaginationTest(APITestCase):
+	def setUp(self) -> None:
+		Course.objects.bulk_create([Course(
+			name='Test%d' % i, start_date='2001-01-01', end_date='2001-02-01',
+			lectures_num=i) for i in range(25)])
+		self.ids = list(Course.objects.values_list('id', flat=True))
+
+	def walk(self, url):
+		ids, pages = [], []
+		while url:
+			with CaptureQueriesContext(connection) as queries:
+				response = self.client.get(url, format='json')
+			self.assertEqual(response.status_code, status.HTTP_200_OK)
+			for query in queries.captured_queries:
+				# Only the page window may be counted, never the table
+				if 'LIMIT' not in query['sql']:
+					self.assertNotIn('COUNT(', query['sql'])
+				self.assertNotIn('OFFSET', query['sql'])
+			body = json.loads(response.content)
+			pages.append(body)
+			ids.extend(row['id'] for row in body['results'])
+			url = body['next']
+		return ids, pages
+
+	def test_pure_walk(self):
+		ids, pages = self.walk(reverse('pure-course-list') + '?cursor=')
+		self.assertEqual(ids, self.ids)
+		self.assertEqual(len(pages), 3)
+		self.assertIsNone(pages[0]['previous'])
+		self.assertNotIn('count', pages[0])
+
+	def test_drf_walk(self):
+		ids, pages = self.walk(reverse('course-list') + '?cursor=')
+		self.assertEqual(ids, self.ids)
+		self.assertEqual(len(pages), 3)
+
+	def test_previous(self):
+		_, pages = self.walk(reverse('pure-course-list') + '?cursor=')
+		response = self.client.get(pages[-1]['previous'], format='json')
+		body = json.loads(response.content)
+		self.assertEqual([row['id'] for row in body['results']], self.ids[10:20])
+		self.assertIsNotNone(body['previous'])
+		self.assertIsNotNone(body['next'])
+
+	def test_ordering_with_ties(self):
+		url = reverse('course-list') + '?' + urlencode(
+			{'cursor': '', 'ordering': '-start_date'})
+		ids, _ = self.walk(url)
+		self.assertEqual(sorted(ids), self.ids)
+		self.assertEqual(len(set(ids)), len(self.ids))
+
+	def test_filters(self):
+		url = reverse('pure-course-list') + '?' + urlencode(
+			{'cursor': '', 'start_date': '2001-01-01', 'search': 'Test1'})
+		ids, _ = self.walk(url)
+		self.assertEqual(ids, list(Course.objects.filter(
+			name__startswith='Test1').values_list('id', flat=True)))
+
+	def test_invalid_cursor(self):
+		for name in ('pure-course-list', 'course-list'):
+			response = self.client.get(reverse(name) + '?cursor=bogus')
+			self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+	def test_forged_cursor(self):
+		# Valid tokens whose values don't fit the ordering fields
+		queries = [{'cursor': encode_cursor(position)}
+					for position in (['abc'], [None], [[1]], [{'a': 1}], [1, 2])]
+		queries.append({'cursor': encode_cursor(['x', 1]),
+						'ordering': '-start_date'})
+		queries.append({'cursor': encode_cursor(['2001-01-01', 'x']),
+						'ordering': '-start_date'})
+		for name in ('pure-course-list', 'course-list'):
+			for query in queries:
+				with self.subTest(name=name, query=query):
+					response = self.client.get(reverse(name), query)
+					self.assertEqual(response.status_code,
+										status.HTTP_404_NOT_FOUND)
+
+
+class FullTextSearchTest(APITestCase):
+	def setUp(self) -> None:
+		for name in ('Advanced Python course', 'Python', 'Django',
+					'Python for data science'):
+			Course.objects.create(name=name, start_date='2001-01-01',
+								end_date='2001-02-01', lectures_num=8)
+
+	def get_names(self, url_name, query):
+		with CaptureQueriesContext(connection) as queries:
+			response = self.client.get(
+				reverse(url_name) + '?' + urlencode({'search': query}))
+		self.assertEqual(response.status_code, status.HTTP_200_OK)
+		self.assertTrue(any('MATCH' in query['sql']
+							for query in queries.captured_queries))
+		self.assertFalse(any('LIKE' in query['sql']
+							for query in queries.captured_queries))
+		return [row['name'] for row in json.loads(response.content)['results']]
+
+	def test_prefix_and_rank(self):
+		for url_name in ('pure-course-list', 'course-list'):
+			names = self.get_names(url_name, 'pyt')
+			self.assertEqual(len(names), 3)
+			self.assertNotIn('Django', names)
+			self.assertEqual(names[0], 'Python')
+			self.assertEqual(self.get_names(url_name, 'python adv'),
+							['Advanced Python course'])
+
+	def test_index_follows_writes(self):
+		course = Course.objects.get(name='Django')
+		course.name = 'Flask'
+		course.save()
+		self.assertEqual(self.get_names('pure-course-list', 'django'), [])
+		self.assertEqual(self.get_names('pure-course-list', 'fla'), ['Flask'])
+		course.delete()
+		self.assertEqual(self.get_names('course-list', 'flask'), [])
+		Course.objects.bulk_create([Course(
+			name='Bulk flask', start_date='2001-01-01', end_date='2001-02-01',
+			lectures_num=1)])
+		self.assertEqual(self.get_names('course-list', 'flask'), ['Bulk flask'])
+
+	@skipUnless(connection.vendor == 'sqlite', 'FTS5 tables of SQLite')
+	def test_index_rebuilt(self):
+		# E.g. by `import_courses --defer-search-index` in this process
+		self.assertTrue(has_search_index(connection, Course))
+		uninstall_search_index(connection, Course)
+		self.assertFalse(has_search_index(connection, Course))
+		install_search_index(connection, Course, SEARCH_FIELDS)
+		self.assertTrue(has_search_index(connection, Course))
+		self.assertEqual(self.get_names('pure-course-list', 'djan'), ['Django'])
+
+
+class DateIntervalTest(APITestCase):
+	def setUp(self) -> None:
+		base = datetime.date(2001, 1, 1)
+		Course.objects.bulk_create([Course(
+			name='Test%d' % i, start_date=base + datetime.timedelta(days=i),
+			end_date=base + datetime.timedelta(days=i + 9),
+			lectures_num=i) for i in range(500)])
+
+	def get_ids(self, url_name, params):
+		response = self.client.get(reverse(url_name) + '?' + urlencode(params))
+		self.assertEqual(response.status_code, status.HTTP_200_OK)
+		return [row['id'] for row in json.loads(response.content)['results']]
+
+	def get_querysets(self, params):
+		"""
+		Filtered querysets of both list views, without ordering and paging
+		"""
+		request = RequestFactory().get('/', params)
+		pure = CourseListCreateView()
+		pure.setup(request)
+		drf = CourseViewSet(request=Request(request), format_kwarg=None,
+							action='list')
+		return [pure.get_queryset().order_by(),
+				drf.filter_queryset(drf.get_queryset()).order_by()]
+
+	def assertIndexed(self, queryset):
+		plan = queryset.explain()
+		self.assertNotRegex(plan, r'\bSCAN\b')
+		self.assertIn('USING', plan)
+
+	def test_active_on(self):
+		expected = list(Course.objects.filter(
+			start_date__lte='2001-01-20', end_date__gte='2001-01-20'
+		).values_list('id', flat=True))
+		self.assertEqual(len(expected), 10)
+		for url_name in ('pure-course-list', 'course-list'):
+			self.assertEqual(self.get_ids(url_name, {'active_on': '2001-01-20'}),
+							expected)
+			self.assertEqual(self.get_ids(url_name, {'active_on': '20.01.2001'}),
+							expected)
+
+	def test_overlaps(self):
+		expected = list(Course.objects.filter(
+			start_date__lte='2001-01-12', end_date__gte='2001-01-10'
+		).values_list('id', flat=True))
+		self.assertEqual(len(expected), 12)
+		for url_name in ('pure-course-list', 'course-list'):
+			ids = self.get_ids(url_name, {'overlaps': '2001-01-10,2001-01-12'})
+			self.assertEqual(ids, expected[:10])
+
+	def test_invalid_interval(self):
+		for url_name in ('course-list', 'pure-course-list'):
+			response = self.client.get(reverse(url_name) + '?overlaps=2001-01-10')
+			self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+	def test_index_plans(self):
+		for params in ({'active_on': '2001-06-01'},
+						{'overlaps': '2001-06-01,2001-07-01'},
+						{'start_date__gte': '2001-06-01'},
+						{'start_date': '2001-06-01'},
+						{'end_date__lt': '2001-02-01'}):
+			for queryset in self.get_querysets(params):
+				with self.subTest(params=params):
+					self.assertIndexed(queryset)
+
+	def test_plan_check(self):
+		with self.assertRaises(AssertionError):
+			self.assertIndexed(Course.objects.filter(lectures_num=5))
+
+
+class FieldsFilterTest(APITestCase):
+	def setUp(self) -> None:
+		base = datetime.date(2001, 1, 1)
+		Course.objects.bulk_create([Course(
+			name='Test%d' % i, start_date=base + datetime.timedelta(days=i),
+			end_date=base + datetime.timedelta(days=i + 9 - i % 3),
+			lectures_num=i) for i in range(50)])
+
+	def get_ids(self, url_name, params):
+		response = self.client.get(reverse(url_name), dict(params, cursor=''))
+		self.assertEqual(response.status_code, status.HTTP_200_OK)
+		return [row['id'] for row in json.loads(response.content)['results']]
+
+	def get_filters(self, params):
+		view = CourseListCreateView()
+		view.setup(RequestFactory().get('/', params))
+		return view.get_field_filters()
+
+	def test_date_formats(self):
+		expected = self.get_ids('course-list', {'start_date__gte': '2001-01-20'})
+		self.assertEqual(len(expected), 10)
+		for value in ('2001-01-20', '20.01.2001'):
+			self.assertEqual(self.get_ids(
+				'pure-course-list', {'start_date__gte': value}), expected)
+
+	def test_invalid_values(self):
+		for url_name in ('pure-course-list', 'pure-course-export'):
+			with self.assertNumQueries(0):
+				response = self.client.get(reverse(url_name),
+											{'start_date__gt': '2001-13-01'})
+			self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+			self.assertIn('start_date__gt',
+							json.loads(response.content)['detail'])
+
+	def test_merged_bounds(self):
+		start, end = datetime.date(2001, 1, 10), datetime.date(2001, 1, 20)
+		self.assertEqual(self.get_filters([
+			('start_date__gte', '2001-01-01'), ('start_date__gt', '2001-01-05'),
+			('start_date__gte', '2001-01-10'), ('start_date__lte', '2001-01-20'),
+			('start_date__lt', '2001-02-01')]), {'start_date__range': (start, end)})
+		self.assertEqual(self.get_filters([
+			('start_date__gt', '2001-01-10'), ('start_date__gte', '2001-01-10'),
+			('end_date__lt', '2001-01-20'), ('end_date__lte', '2001-01-20')]),
+			{'start_date__gt': start, 'end_date__lt': end})
+		self.assertEqual(self.get_filters([
+			('start_date__gte', '2001-01-10'), ('start_date__lte', '2001-01-10')]),
+			{'start_date': start})
+		self.assertEqual(self.get_filters([
+			('start_date__lt', '2001-01-10'), ('start_date', '2001-01-10')]), None)
+
+		params = {'start_date__gte': '2001-01-10', 'start_date__lt': '2001-01-15',
+					'end_date__lte': '2001-01-22'}
+		self.assertEqual(self.get_ids('pure-course-list', params),
+						self.get_ids('course-list', params))
+		with self.assertNumQueries(0):
+			ids = self.get_ids('pure-course-list', {
+				'start_date__gt': '2001-01-20', 'start_date__lt': '2001-01-10'})
+		self.assertEqual(ids, [])
+
+	def test_ordering(self):
+		for ordering in ('-start_date', 'end_date,-id', '-updated_at'):
+			params = {'ordering': ordering, 'start_date__lt': '2001-01-20'}
+			self.assertEqual(self.get_ids('pure-course-list', params),
+							self.get_ids('course-list', params))
+		# Ordering wins over the relevance of searches
+		ids = self.get_ids('pure-course-list', {'search': 'test',
+												'ordering': '-id'})
+		self.assertEqual(ids, sorted(ids, reverse=True))
+		# Only indexed columns
+		response = self.client.get(reverse('pure-course-list'),
+									{'ordering': 'start_date,name'})
+		self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+		self.assertIn('name', json.loads(response.content)['detail'])
+
+
+class ResponseCacheTest(APITestCase):
+	def setUp(self) -> None:
+		patcher = mock.patch.dict(PURE_REST['RESPONSE_CACHE'],
+									{'BACKEND': 'locmem'})
+		patcher.start()
+		self.addCleanup(patcher.stop)
+		self.entities = [Course.objects.create(
+			name='Test%d' % i, start_date='2001-01-01', end_date='2001-02-01',
+			lectures_num=8) for i in range(2)]
+		self.cache = get_response_cache()
+		self.cache.backend.clear()
+
+	def get(self, url, cached):
+		response = self.client.get(url)
+		self.assertEqual(response.status_code, status.HTTP_200_OK)
+		self.assertEqual(response['X-Cache'], 'HIT' if cached else 'MISS')
+		return json.loads(response.content)
+
+	def detail_url(self, entity):
+		return reverse('pure-course-detail', kwargs={'pk': entity.id})
+
+	def test_hits(self):
+		url = reverse('pure-course-list')
+		self.get(url + '?search=test&page=1', cached=False)
+		hits = self.cache.hits
+		with self.assertNumQueries(0):
+			body = self.get(url + '?page=1&search=test', cached=True)
+		self.assertEqual(body['count'], 2)
+		self.assertEqual(self.cache.hits, hits + 1)
+		self.get(url + '?page=1&search=test1', cached=False)
+
+	def test_hosts_apart(self):
+		url = reverse('pure-course-list') + '?cursor='
+		Course.objects.create(name='Test2', start_date='2001-01-01',
+								end_date='2001-02-01', lectures_num=8)
+		with mock.patch.object(CourseListCreateView, 'paginate_by', 1):
+			for host, secure in (('testserver', False), ('other', False),
+									('other', True)):
+				response = self.client.get(url, HTTP_HOST=host, secure=secure)
+				self.assertEqual(response['X-Cache'], 'MISS')
+				scheme = 'https' if secure else 'http'
+				self.assertTrue(json.loads(response.content)['next'].startswith(
+					'%s://%s/' % (scheme, host)))
+			response = self.client.get(url, HTTP_HOST='other')
+			self.assertEqual(response['X-Cache'], 'HIT')
+
+	def test_create_invalidates_lists_only(self):
+		list_url = reverse('pure-course-list')
+		self.get(list_url, cached=False)
+		self.get(self.detail_url(self.entities[0]), cached=False)
+		entity = {'name': 'Test3', 'start_date': '01.01.2003',
+					'end_date': '01.02.2003', 'lectures_num': 8}
+		self.client.post(list_url, entity, format='json')
+		self.assertEqual(self.get(list_url, cached=False)['count'], 3)
+		self.get(self.detail_url(self.entities[0]), cached=True)
+
+	def test_update_and_delete_invalidate_object(self):
+		first, second = [self.detail_url(entity) for entity in self.entities]
+		self.get(first, cached=False)
+		self.get(second, cached=False)
+		entity = {'name': 'Test333', 'start_date': '02.01.2003',
+					'end_date': '02.02.2003', 'lectures_num': 7}
+		self.client.put(first, entity, format='json')
+		self.assertEqual(self.get(first, cached=False)['name'], 'Test333')
+		self.get(second, cached=True)
+		self.client.delete(second)
+		self.assertEqual(self.client.get(second).status_code,
+						status.HTTP_404_NOT_FOUND)
+
+	def test_drf_writes_invalidate(self):
+		url = self.detail_url(self.entities[0])
+		self.get(url, cached=False)
+		drf_url = reverse('course-detail', kwargs={'pk': self.entities[0].id})
+		entity = {'name': 'Changed', 'start_date': '02.01.2003',
+					'end_date': '02.02.2003', 'lectures_num': 7}
+		self.client.put(drf_url, entity, format='json')
+		self.assertEqual(self.get(url, cached=False)['name'], 'Changed')
+
+	def test_lru_eviction(self):
+		clock = mock.Mock(return_value=0)
+		cache = LRUCache(max_entries=2, timeout=10, clock=clock)
+		cache.set('a', 1)
+		cache.set('b', 2)
+		cache.get('a')
+		cache.set('c', 3)
+		self.assertIsNone(cache.get('b'))
+		self.assertEqual(cache.get('a'), 1)
+		clock.return_value = 10
+		self.assertIsNone(cache.get('a'))
+
+
+class ConditionalGetTest(APITestCase):
+	def setUp(self) -> None:
+		for config in (PURE_REST['COUNT'], settings.REST_FRAMEWORK['COUNT']):
+			patcher = mock.patch.dict(config, {'STRATEGY': 'cached'})
+			patcher.start()
+			self.addCleanup(patcher.stop)
+		_count_caches.clear()
+		self.entities = [Course.objects.create(
+			name='Test%d' % i, start_date='2001-01-01', end_date='2001-02-01',
+			lectures_num=8) for i in range(3)]
+
+	def urls(self):
+		pk = self.entities[0].id
+		return [reverse('pure-course-list') + '?search=test',
+				reverse('pure-course-detail', kwargs={'pk': pk}),
+				reverse('course-list') + '?search=test',
+				reverse('course-detail', kwargs={'pk': pk})]
+
+	def test_not_modified(self):
+		for url in self.urls():
+			response = self.client.get(url)
+			self.assertEqual(response.status_code, status.HTTP_200_OK)
+			self.assertNotIn('updated_at', response.content.decode())
+			etag = response['ETag']
+			# One cheap validator query over the page (the count is cached),
+			# no row fetching or serializing
+			with self.assertNumQueries(1):
+				response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+			self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+			self.assertEqual(response.content, b'')
+
+	def test_detail_last_modified(self):
+		for url in self.urls()[1::2]:
+			last_modified = self.client.get(url)['Last-Modified']
+			response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+			self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+	def test_delete_if_modified_since(self):
+		# Lists have no Last-Modified, deletes don't change the newest version
+		for url in self.urls()[::2]:
+			self.assertNotIn('Last-Modified', self.client.get(url))
+		since = http_date(time.time() + 60)
+		self.entities.pop().delete()
+		for url in self.urls()[::2]:
+			response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=since)
+			self.assertEqual(response.status_code, status.HTTP_200_OK)
+			self.assertEqual(len(json.loads(response.content)['results']), 2)
+
+	def test_writes_change_etags(self):
+		etags = [self.client.get(url)['ETag'] for url in self.urls()]
+		self.entities[0].lectures_num = 9
+		self.entities[0].save()
+		for url, etag in zip(self.urls(), etags):
+			response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+			self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+		list_url = self.urls()[0]
+		etag = self.client.get(list_url)['ETag']
+		self.entities[2].delete()
+		response = self.client.get(list_url, HTTP_IF_NONE_MATCH=etag)
+		self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+	def test_default_validators(self):
+		# The mixin works without overriding get_validators
+		class Base(View):
+			def get(self, request, *args, **kwargs):
+				return JsonResponse({})
+
+		class ConditionalView(JsonConditionalMixin, Base):
+			last_modified_field = 'updated_at'
+
+			def get_queryset(self):
+				return Course.objects.all()
+
+		view = ConditionalView.as_view()
+		pk = self.entities[0].id
+		for kwargs in ({'pk': pk}, {}):
+			response = view(RequestFactory().get('/'), **kwargs)
+			self.assertEqual(response.status_code, status.HTTP_200_OK)
+			self.assertEqual('Last-Modified' in response, bool(kwargs))
+			request = RequestFactory().get('/', HTTP_IF_NONE_MATCH=response['ETag'])
+			self.assertEqual(view(request, **kwargs).status_code,
+								status.HTTP_304_NOT_MODIFIED)
+
+	def test_pages_differ(self):
+		url = reverse('pure-course-list')
+		self.assertNotEqual(self.client.get(url + '?page=1')['ETag'],
+							self.client.get(url + '?cursor=')['ETag'])
+
+
+class BulkAPITest(APITestCase):
+	def setUp(self) -> None:
+		self.entities = [Course.objects.create(
+			name='Test%d' % i, start_date='2001-01-01', end_date='2001-02-01',
+			lectures_num=8) for i in range(3)]
+
+	def items(self, count, **extra):
+		return [dict({'name': 'Bulk%d' % i, 'start_date': '01.01.2003',
+					'end_date': '01.02.2003', 'lectures_num': i}, **extra)
+				for i in range(count)]
+
+	def test_create(self):
+		batch_size = mock.patch.object(CourseViewSet, 'bulk_batch_size', 2)
+		pure_batch_size = mock.patch('views.json.JsonBulkView.batch_size', 2)
+		for url_name in ('pure-course-bulk', 'course-bulk'):
+			with batch_size, pure_batch_size:
+				response = self.client.post(reverse(url_name), self.items(5),
+											format='json')
+			self.assertIn(response.status_code, (status.HTTP_200_OK,
+												status.HTTP_201_CREATED))
+			body = json.loads(response.content)
+			self.assertEqual([row['name'] for row in body],
+							['Bulk%d' % i for i in range(5)])
+			for row in body:
+				self.assertEqual(Course.objects.get(pk=row['id']).name,
+								row['name'])
+		self.assertEqual(Course.objects.count(), 13)
+
+	def test_create_validation(self):
+		items = self.items(3)
+		items[1]['end_date'] = '01.01.2002'
+		items[2] = 'not an object'
+		for url_name in ('pure-course-bulk', 'course-bulk'):
+			response = self.client.post(reverse(url_name), items, format='json')
+			self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+			body = json.loads(response.content)
+			if url_name == 'pure-course-bulk':
+				self.assertEqual([error['index'] for error in body['errors']],
+								[1, 2])
+			else:
+				self.assertEqual([bool(error) for error in body],
+								[False, True, True])
+		self.assertEqual(Course.objects.count(), 3)
+
+	def test_update(self):
+		items = self.items(3)
+		for item, entity in zip(items, self.entities):
+			item['id'] = entity.id
+		for url_name in ('pure-course-bulk', 'course-bulk'):
+			response = self.client.put(reverse(url_name), items, format='json')
+			self.assertEqual(response.status_code, status.HTTP_200_OK)
+		self.assertEqual(sorted(Course.objects.values_list('name', flat=True)),
+						['Bulk0', 'Bulk1', 'Bulk2'])
+
+	def test_update_validation(self):
+		items = self.items(2, id=self.entities[0].id)
+		for url_name in ('pure-course-bulk', 'course-bulk'):
+			response = self.client.put(reverse(url_name), items, format='json')
+			self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+		self.assertEqual(Course.objects.get(pk=self.entities[0].id).name,
+						'Test0')
+
+	def test_delete(self):
+		pks = [entity.id for entity in self.entities]
+		response = self.client.delete(reverse('pure-course-bulk'),
+										pks[:1] + [0], format='json')
+		self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+		response = self.client.delete(reverse('pure-course-bulk'), pks[:2],
+										format='json')
+		self.assertEqual(json.loads(response.content), {'deleted': 2})
+		response = self.client.delete(reverse('course-bulk'), pks[2:],
+										format='json')
+		self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+		self.assertFalse(Course.objects.exists())
+
+	def test_limit(self):
+		with mock.patch('views.json.JsonBulkView.max_items', 2):
+			response = self.client.post(reverse('pure-course-bulk'),
+										self.items(3), format='json')
+		self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class ExportTest(APITestCase):
+	@classmethod
+	def setUpTestData(cls):
+		Course.objects.bulk_create([Course(
+			name='Test "%d"' % i, start_date='2001-01-01', end_date='2001-02-01',
+			lectures_num=i) for i in range(10000)])
+
+	def export(self, params):
+		url = reverse('pure-course-export') + '?' + urlencode(params)
+		response = self.client.get(url)
+		self.assertEqual(response.status_code, status.HTTP_200_OK)
+		return response
+
+	def test_ndjson(self):
+		response = self.export({'search': 'test', 'start_date': '2001-01-01'})
+		lines = b''.join(response.streaming_content).decode().splitlines()
+		self.assertEqual(len(lines), 10000)
+		first = json.loads(lines[0])
+		self.assertEqual(first['name'], 'Test "0"')
+		self.assertEqual(first['start_date'], '01.01.2001')
+		self.assertEqual(set(first), {'id', 'name', 'start_date', 'end_date',
+									'lectures_num'})
+
+	def test_csv(self):
+		response = self.export({'format': 'csv', 'end_date__lt': '2001-01-01'})
+		self.assertEqual(response['Content-Type'], 'text/csv')
+		lines = b''.join(response.streaming_content).decode().splitlines()
+		self.assertEqual(lines, ['id,name,start_date,end_date,lectures_num'])
+		response = self.export({'format': 'csv'})
+		rows = list(csv.reader(
+			b''.join(response.streaming_content).decode().splitlines()))
+		self.assertEqual(len(rows), 10001)
+		self.assertEqual(rows[1][1:], ['Test "0"', '01.01.2001', '01.02.2001',
+										'0'])
+
+	def test_flat_memory(self):
+		response = self.export({})
+		tracemalloc.start()
+		try:
+			for _ in response.streaming_content:
+				pass
+			peak = tracemalloc.get_traced_memory()[1]
+		finally:
+			tracemalloc.stop()
+		# Everything at once would take over ten megabytes
+		self.assertLess(peak, 2 * 1024 * 1024)
+
+	def test_unknown_format(self):
+		response = self.client.get(reverse('pure-course-export') + '?format=xml')
+		self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class ImportCoursesTest(APITestCase):
+	def setUp(self) -> None:
+		directory = tempfile.TemporaryDirectory()
+		self.addCleanup(directory.cleanup)
+		self.directory = directory.name
+
+	def path(self, name):
+		return os.path.join(self.directory, name)
+
+	def write(self, name, rows):
+		with open(self.path(name), 'w') as f:
+			f.write(''.join(json.dumps(row) + '\n' for row in rows))
+		return self.path(name)
+
+	def rows(self, count):
+		return [{'name': 'Import%d' % i, 'start_date': '01.01.2003',
+				'end_date': '2003-02-01', 'lectures_num': i} for i in range(count)]
+
+	def call(self, *args, **options):
+		call_command('import_courses', *args, stdout=io.StringIO(), **options)
+
+	def test_ndjson(self):
+		self.call(self.write('courses.ndjson', self.rows(5)), batch_size=2)
+		course = Course.objects.get(name='Import3')
+		self.assertEqual(course.start_date, datetime.date(2003, 1, 1))
+		self.assertEqual(course.end_date, datetime.date(2003, 2, 1))
+		self.assertEqual(course.lectures_num, 3)
+		self.assertIsNotNone(course.updated_at)
+		self.assertEqual(Course.objects.count(), 5)
+
+	def test_csv_stdin(self):
+		lines = ['name,start_date,end_date,lectures_num',
+				'"Comma, course",2003-01-01,01.02.2003,4']
+		with mock.patch('sys.stdin', io.StringIO('\n'.join(lines) + '\n')):
+			self.call('-', format='csv')
+		self.assertEqual(Course.objects.get().name, 'Comma, course')
+
+	def test_rejects(self):
+		rows = self.rows(4)
+		rows[1]['end_date'] = '01.01.2002'
+		rows[2]['lectures_num'] = -1
+		del rows[3]['name']
+		path = self.write('courses.ndjson', rows)
+		with open(path, 'a') as f:
+			f.write('\nnot json\n')
+		self.call(path, rejects=self.path('rejects.ndjson'))
+		self.assertEqual(Course.objects.count(), 1)
+		with open(self.path('rejects.ndjson')) as f:
+			rejects = [json.loads(line) for line in f]
+		self.assertEqual([reject['line'] for reject in rejects], [2, 3, 4, 6])
+		self.assertEqual(rejects[0]['errors'], {
+			'__all__': ['Start date should precede end date']})
+		self.assertEqual(list(rejects[1]['errors']), ['lectures_num'])
+		self.assertEqual(list(rejects[2]['errors']), ['name'])
+		self.assertEqual(rejects[3]['row'], 'not json')
+
+	def test_resume(self):
+		path = self.write('courses.ndjson', self.rows(7))
+		checkpoint = self.path('checkpoint.json')
+		from views.bulk import insert_rows
+		calls = []
+
+		def failing_insert_rows(*args):
+			calls.append(args)
+			if len(calls) == 3:
+				raise RuntimeError('Crash')
+			return insert_rows(*args)
+
+		target = 'courses.management.commands.import_courses.insert_rows'
+		with mock.patch(target, failing_insert_rows):
+			with self.assertRaises(RuntimeError):
+				self.call(path, batch_size=2, checkpoint=checkpoint)
+		self.assertEqual(Course.objects.count(), 4)
+		with self.assertRaises(CommandError):
+			self.call(path, batch_size=2, checkpoint=checkpoint)
+		self.call(path, batch_size=2, checkpoint=checkpoint, resume=True)
+		self.assertEqual(sorted(Course.objects.values_list('name', flat=True)),
+						['Import%d' % i for i in range(7)])
+		with open(checkpoint) as f:
+			self.assertEqual(json.load(f), {'line': 7, 'imported': 7,
+											'rejected': 0})
+
+	def test_fast_load(self):
+		self.call(self.write('courses.ndjson', self.rows(3)), fast=True,
+				defer_search_index=True)
+		response = self.client.get(reverse('course-list') + '?search=import2')
+		self.assertEqual([row['name'] for row in response.data['results']],
+						['Import2'])
+
+
+class JsonEncodingTest(APITestCase):
+	def setUp(self) -> None:
+		self.entities = [Course.objects.create(
+			name=name, start_date='2001-01-01', end_date='2001-02-01',
+			lectures_num=i) for i, name in enumerate(
+				['Plain', 'Quoted "name"\\', 'Ünïcödé', 'Line\nbreak'])]
+		patcher = mock.patch.dict(PURE_REST, {'JSON_BACKEND': 'json'})
+		patcher.start()
+		self.addCleanup(patcher.stop)
+
+	def expected(self, data):
+		return JsonResponse(data, safe=False,
+							encoder=DateDjangoJSONEncoder).content
+
+	def test_same_bytes(self):
+		# The standard library backend writes what JsonResponse did
+		rows = [model_to_dict(entity) for entity in Course.objects.all()]
+		response = self.client.get(reverse('pure-course-list'))
+		self.assertEqual(response.content, self.expected(
+			{'count': 4, 'count_strategy': 'exact', 'total_pages': 1,
+			'results': rows}))
+		response = self.client.get(reverse('pure-course-list') + '?cursor=')
+		self.assertEqual(response.content, self.expected(
+			{'next': None, 'previous': None, 'results': rows}))
+		response = self.client.get(reverse('pure-course-detail',
+											kwargs={'pk': self.entities[1].pk}))
+		self.assertEqual(response.content, self.expected(rows[1]))
+		response = self.client.post(reverse('pure-course-bulk'), [{
+			'name': 'Bulk', 'start_date': '2003-01-01', 'end_date': '2003-02-01',
+			'lectures_num': 1}], format='json')
+		self.assertEqual(response.content, self.expected(
+			[model_to_dict(Course.objects.get(name='Bulk'))]))
+
+	def test_cursor_columns(self):
+		# Ordering fields the responses don't expose still make cursors
+		with mock.patch.object(CourseListCreateView, 'ordering',
+								['-updated_at']):
+			response = self.client.get(reverse('pure-course-list') + '?cursor=')
+		body = json.loads(response.content)
+		self.assertEqual(set(body['results'][0]), {
+			'id', 'name', 'start_date', 'end_date', 'lectures_num'})
+
+	@skipUnless(orjson, 'orjson is not installed')
+	def test_orjson(self):
+		url = reverse('pure-course-list')
+		expected = json.loads(self.client.get(url).content)
+		with mock.patch.dict(PURE_REST, {'JSON_BACKEND': 'orjson'}):
+			response = self.client.get(url)
+		self.assertEqual(json.loads(response.content), expected)
+		self.assertEqual(expected['results'][0]['start_date'], '01.01.2001')
+
+
+class SparseFieldsTest(APITestCase):
+	def setUp(self) -> None:
+		self.entity = Course.objects.create(
+			name='Test1', start_date='2001-01-01', end_date='2001-02-01',
+			lectures_num=8)
+
+	def get(self, url, params):
+		with CaptureQueriesContext(connection) as queries:
+			response = self.client.get(url, params)
+		self.assertEqual(response.status_code, status.HTTP_200_OK)
+		# Queries reading rows, without the ones computing validators
+		sqls = [query['sql'] for query in queries.captured_queries]
+		return json.loads(response.content), [
+			sql for sql in sqls if 'courses_course' in sql and 'updated_at' not in sql]
+
+	def get_columns(self, sql):
+		columns = sql[len('SELECT '):sql.index(' FROM ')]
+		return {column.split('.')[-1].strip('"')
+				for column in columns.split(', ')}
+
+	def test_list(self):
+		for url in (reverse('pure-course-list'), reverse('course-list')):
+			for extra in ({}, {'cursor': ''}):
+				body, queries = self.get(url, dict(extra, fields='name,id'))
+				self.assertEqual(body['results'], [
+					{'id': self.entity.pk, 'name': 'Test1'}])
+				rows_query = [sql for sql in queries if 'COUNT' not in sql][-1]
+				self.assertEqual(self.get_columns(rows_query), {'id', 'name'})
+
+	def test_detail(self):
+		# The DRF API reads a row, not an object, so without the key
+		for url_name, columns in (('pure-course-detail', {'id', 'lectures_num'}),
+									('course-detail', {'lectures_num'})):
+			url = reverse(url_name, kwargs={'pk': self.entity.pk})
+			body, queries = self.get(url, {'fields': 'lectures_num'})
+			self.assertEqual(body, {'lectures_num': 8})
+			self.assertEqual(self.get_columns(queries[-1]), columns)
+
+	def test_all_fields(self):
+		for url in (reverse('pure-course-list'), reverse('course-list')):
+			body, _ = self.get(url, {'fields': ''})
+			self.assertEqual(set(body['results'][0]), {
+				'id', 'name', 'start_date', 'end_date', 'lectures_num'})
+
+	def test_invalid(self):
+		for url in (reverse('pure-course-list'), reverse('course-list'),
+					reverse('pure-course-detail', kwargs={'pk': self.entity.pk})):
+			response = self.client.get(url, {'fields': 'name,updated_at'})
+			self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+			self.assertIn('updated_at', response.content.decode())
+
+
+class CountStrategyTest(APITestCase):
+	def setUp(self) -> None:
+		Course.objects.bulk_create([Course(
+			name='Test%d' % i, start_date='2001-01-01', end_date='2001-02-01',
+			lectures_num=8) for i in range(5)])
+		_count_caches.clear()
+
+	def set_count(self, **config):
+		for settings_config in (PURE_REST['COUNT'],
+								settings.REST_FRAMEWORK['COUNT']):
+			patcher = mock.patch.dict(settings_config, config)
+			patcher.start()
+			self.addCleanup(patcher.stop)
+
+	def get(self, url, params=None, strategy=None, count=None):
+		with CaptureQueriesContext(connection) as queries:
+			response = self.client.get(url, params)
+		self.assertEqual(response.status_code, status.HTTP_200_OK)
+		body = json.loads(response.content)
+		self.assertEqual((body['count'], body['count_strategy']),
+						(count, strategy))
+		return body, [query['sql'] for query in queries.captured_queries]
+
+	def patch_page_size(self, page_size):
+		patchers = [
+			mock.patch.object(CourseListCreateView, 'paginate_by', page_size),
+			mock.patch.object(CursorPageNumberPagination, 'page_size',
+								page_size),
+		]
+		for patcher in patchers:
+			patcher.start()
+			self.addCleanup(patcher.stop)
+
+	def urls(self):
+		return [reverse('pure-course-list'), reverse('course-list')]
+
+	def test_exact(self):
+		for url in self.urls():
+			self.get(url, {'search': 'test1'}, 'exact', 1)
+
+	def test_cached(self):
+		self.set_count(STRATEGY='cached')
+		self.get(self.urls()[0], {'search': 'test', 'page': 1}, 'exact', 5)
+		# Same filters, in any order and through either API, aren't counted
+		for url in self.urls():
+			_, queries = self.get(url, {'page': 1, 'search': 'test'},
+									'cached', 5)
+			self.assertFalse([sql for sql in queries if 'COUNT(*)' in sql])
+		response = self.client.post(reverse('course-list'), {
+			'name': 'Test5', 'start_date': '2001-01-01',
+			'end_date': '2001-02-01', 'lectures_num': 8}, format='json')
+		self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+		self.get(self.urls()[0], {'search': 'test'}, 'exact', 6)
+		self.get(self.urls()[1], {'search': 'test'}, 'cached', 6)
+
+	def test_shared_cache(self):
+		self.set_count(STRATEGY='cached', CACHE='default')
+		caches['default'].clear()
+		self.addCleanup(caches['default'].clear)
+		url = self.urls()[0]
+		self.get(url, {'search': 'test'}, 'exact', 5)
+		self.get(url, {'search': 'test'}, 'cached', 5)
+		# A process that hasn't counted yet writes
+		_count_caches.clear()
+		response = self.client.post(reverse('course-list'), {
+			'name': 'Test5', 'start_date': '2001-01-01',
+			'end_date': '2001-02-01', 'lectures_num': 8}, format='json')
+		self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+		self.get(url, {'search': 'test'}, 'exact', 6)
+
+	def test_estimated(self):
+		self.set_count(STRATEGY='estimated', LIMIT=3)
+		self.patch_page_size(2)
+		for url in self.urls():
+			self.get(url, {'search': 'test1'}, 'exact', 1)
+			self.get(url, {}, 'estimated', 3)
+			# Pages past the estimate aren't rejected
+			body, _ = self.get(url, {'page': 3}, 'estimated', 3)
+			self.assertEqual(len(body['results']), 1)
+
+		with connection.cursor() as cursor:
+			cursor.execute('ANALYZE')
+		for url in self.urls():
+			self.get(url, {}, 'estimated', 5)
+			# Filtered lists have no estimate on SQLite
+			self.get(url, {'search': 'test'}, 'estimated', 3)
+
+
+class InstrumentationTest(APITestCase):
+	def setUp(self) -> None:
+		Course.objects.bulk_create([Course(
+			name='Test%d' % i, start_date='2001-01-01', end_date='2001-02-01',
+			lectures_num=8) for i in range(3)])
+		self.enable(METRICS=True, METRICS_ALLOWED_IPS=['127.0.0.1'])
+
+	def enable(self, **config):
+		patcher = mock.patch.dict(PURE_REST['INSTRUMENTATION'],
+									dict(config, ENABLED=True))
+		patcher.start()
+		self.addCleanup(patcher.stop)
+		self.addCleanup(lambda: get_aggregator() and get_aggregator().clear())
+		# Middleware is set up with the first request of a client
+		self.client = self.client_class()
+
+	def get_timing(self, response):
+		timing = {}
+		for entry in response['Server-Timing'].split(', '):
+			name, *params = entry.split(';')
+			timing[name] = dict(param.split('=', 1) for param in params)
+		return timing
+
+	def test_server_timing(self):
+		pk = Course.objects.first().pk
+		cases = [
+			(reverse('pure-course-list'), {'route', 'filter', 'encode'}),
+			(reverse('pure-course-detail', kwargs={'pk': pk}),
+				{'route', 'encode'}),
+			(reverse('course-list'), {'route', 'filter', 'serialize', 'render'}),
+		]
+		for url, phases in cases:
+			with CaptureQueriesContext(connection) as queries:
+				response = self.client.get(url)
+			self.assertEqual(response.status_code, status.HTTP_200_OK)
+			timing = self.get_timing(response)
+			self.assertLessEqual(phases, set(timing))
+			self.assertEqual(timing['db']['desc'],
+							'"%d queries"' % len(queries.captured_queries))
+			self.assertGreaterEqual(float(timing['total']['dur']),
+									float(timing['db']['dur']))
+
+	def test_log(self):
+		with self.assertLogs('views.instrumentation', 'INFO') as logs:
+			response = self.client.get(reverse('pure-course-list'))
+		record = json.loads(logs.records[0].getMessage())
+		self.assertEqual(record['route'], 'GET /api-pure/v0/courses/')
+		self.assertEqual(record['status'], 200)
+		self.assertEqual(record['size'], len(response.content))
+		self.assertGreater(record['queries'], 0)
+		self.assertIn('encode', record['phases_ms'])
+
+	def test_metrics(self):
+		for _ in range(3):
+			self.client.get(reverse('course-list'))
+		self.client.get(reverse('pure-course-list'))
+		response = self.client.get(reverse('metrics'))
+		self.assertEqual(response.status_code, status.HTTP_200_OK)
+		stats = json.loads(response.content)
+		self.assertEqual(stats['GET /api/v0/courses/']['count'], 3)
+		self.assertEqual(set(stats['GET /api-pure/v0/courses/']['duration_ms']),
+						{'p50', 'p95', 'p99'})
+		response = self.client.get(reverse('metrics'), REMOTE_ADDR='10.0.0.1')
+		self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+	def test_metrics_access(self):
+		# Behind a local proxy every client is 127.0.0.1, it isn't trusted
+		# unless listed
+		self.enable(METRICS=True, METRICS_ALLOWED_IPS=[], METRICS_TOKEN='')
+		response = self.client.get(reverse('metrics'))
+		self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+		self.enable(METRICS_TOKEN='secret')
+		for authorization, code in (('Bearer secret', status.HTTP_200_OK),
+									('Bearer other', status.HTTP_403_FORBIDDEN),
+									('secret', status.HTTP_403_FORBIDDEN)):
+			response = self.client.get(reverse('metrics'),
+										HTTP_AUTHORIZATION=authorization,
+										REMOTE_ADDR='10.0.0.1')
+			self.assertEqual(response.status_code, code, authorization)
+
+	def test_response_cache(self):
+		response = self.client.get(reverse('metrics'))
+		self.assertNotIn('response_cache', json.loads(response.content))
+		patcher = mock.patch.dict(PURE_REST['RESPONSE_CACHE'],
+									{'BACKEND': 'locmem'})
+		patcher.start()
+		self.addCleanup(patcher.stop)
+		get_response_cache().backend.clear()
+		before = get_response_cache().get_stats()
+		for cache in ('MISS', 'HIT'):
+			response = self.client.get(reverse('pure-course-list'))
+			self.assertEqual(response['X-Cache'], cache)
+		response = self.client.get(reverse('metrics'))
+		stats = json.loads(response.content)['response_cache']
+		self.assertEqual(stats['hits'], before['hits'] + 1)
+		self.assertEqual(stats['misses'], before['misses'] + 1)
+		self.assertGreater(stats['hit_rate'], 0)
+
+	def test_percentiles(self):
+		aggregator = MetricsAggregator(max_samples=100)
+		for duration in range(1, 201):
+			metrics = RequestMetrics()
+			metrics.started, metrics.finished = 0, duration / 1000
+			aggregator.add('GET /', metrics)
+		stats = aggregator.get_stats()['GET /']
+		self.assertEqual((stats['count'], stats['samples']), (200, 100))
+		self.assertEqual(stats['duration_ms'],
+						{'p50': 150, 'p95': 195, 'p99': 199})
+
+	def test_nested_phases(self):
+		metrics = RequestMetrics()
+		with metrics.time('outer'):
+			with metrics.time('inner'):
+				metrics(lambda *args: None, 'SELECT 1', None, False, {})
+		self.assertEqual(metrics.queries, 1)
+		self.assertGreater(metrics.phases['inner'], 0)
+		self.assertGreater(metrics.phases['outer'], 0)
+
+	def test_disabled(self):
+		patcher = mock.patch.dict(PURE_REST['INSTRUMENTATION'],
+									{'ENABLED': False})
+		patcher.start()
+		self.addCleanup(patcher.stop)
+		self.client = self.client_class()
+		response = self.client.get(reverse('pure-course-list'))
+		self.assertNotIn('Server-Timing', response)
+		response = self.client.get(reverse('metrics'))
+		self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+@skipUnless(connection.vendor == 'sqlite', 'plans and steps of SQLite')
+class QueryBudgetTest(APITestCase):
+	"""
+	Pins the most queries every endpoint may run and checks them on a seeded
+	table: no plan may scan the whole course table and endpoints touching a
+	bounded number of rows must do the same work on a table 4 times larger
+	"""
+	rows = 1000
+	# Routes without cases: the admin and the schema views aren't ours
+	skipped_routes = {'schema-swagger-ui'}
+	# (route name, method, params or body, the most queries, bounded work).
+	# Unbounded: exact counts, search and export read every matching row
+	cases = [
+		('api-root', 'get', {}, 0, True),
+		('course-list', 'get', {}, 3, False),
+		('course-list', 'get', {'cursor': ''}, 2, True),
+		('course-list', 'get', {'cursor': '', 'start_date__gte': '2001-01-01',
+								'end_date__lte': '2019-01-01'}, 2, True),
+		# Sparse matches: a page reads more rows of a larger table
+		('course-list', 'get', {'cursor': '', 'active_on': '2010-06-01'}, 2,
+			False),
+		('course-list', 'get', {'search': 'python'}, 3, False),
+		('course-list', 'get', 'ids', 1, True),
+		('course-list', 'get', {'format': 'columnar'}, 3, False),
+		('course-list', 'get', {'format': 'columnar', 'cursor': ''}, 2, True),
+		# The union of the live and the archived courses, merged in id order
+		('course-list', 'get', {'include_archived': '1'}, 3, False),
+		('course-list', 'get', {'include_archived': '1', 'cursor': ''}, 2,
+			True),
+		('course-list', 'post', 'course', 2, True),
+		('course-detail', 'get', {}, 2, True),
+		('course-detail', 'put', 'course', 3, True),
+		('course-detail', 'delete', {}, 3, True),
+		# SAVEPOINT, the statements, the change log and RELEASE
+		('course-bulk', 'post', ['course', 'course'], 5, True),
+		('course-bulk', 'put', ['object', 'object'], 5, True),
+		('course-bulk', 'delete', ['pk', 'pk'], 5, True),
+		('pure-course-list', 'get', {}, 3, False),
+		('pure-course-list', 'get', {'cursor': ''}, 2, True),
+		('pure-course-list', 'get', {'cursor': '', 'active_on': '2010-06-01'},
+			2, False),
+		('pure-course-list', 'get', {'cursor': '', 'ordering': '-start_date',
+										'start_date__gte': '2001-01-01',
+										'start_date__lte': '2019-01-01'}, 2, True),
+		('pure-course-list', 'get', {'search': 'python'}, 3, False),
+		('pure-course-list', 'get', 'ids', 1, True),
+		('pure-course-list', 'get', {'format': 'columnar'}, 3, False),
+		('pure-course-list', 'get', {'format': 'columnar', 'cursor': ''}, 2,
+			True),
+		('pure-course-list', 'get', {'include_archived': '1'}, 3, False),
+		('pure-course-list', 'get', {'include_archived': '1', 'cursor': ''}, 2,
+			True),
+		('pure-course-list', 'get', {'include_archived': '1',
+										'search': 'python'}, 3, False),
+		('pure-course-list', 'post', 'course', 2, True),
+		# The count and a chunk: SAVEPOINT, its keys, the DELETE, the change
+		# log and RELEASE
+		('pure-course-list', 'delete', {'end_date__lt': '2000-02-03',
+										'confirm': 'true'}, 6, True),
+		('pure-course-detail', 'get', {}, 2, True),
+		('pure-course-detail', 'post', 'course', 3, True),
+		# The UPDATE and the change log, nothing is read
+		('pure-course-detail', 'patch', {'lectures_num': 9}, 2, True),
+		('pure-course-detail', 'patch', {'end_date': '2030-01-01'}, 2, True),
+		# The DELETE and the change log, without reading the object first
+		('pure-course-detail', 'delete', {}, 2, True),
+		('pure-course-bulk', 'post', ['course', 'course'], 5, True),
+		('pure-course-bulk', 'put', ['object', 'object'], 5, True),
+		('pure-course-bulk', 'delete', ['pk', 'pk'], 5, True),
+		('pure-course-export', 'get', {}, 1, False),
+		('pure-course-changes', 'get', {}, 1, True),
+		('pure-course-changes', 'get', {'since': 0, 'limit': 10}, 1, True),
+		# A row per month of the seeded dates, not per course
+		('pure-course-stats', 'get', {}, 1, False),
+		('pure-course-stats', 'get', {'group_by': 'month'}, 1, False),
+		('pure-async-course-list', 'get', {}, 3, False),
+		('pure-async-course-list', 'get', {'cursor': ''}, 2, True),
+		('pure-async-course-list', 'post', 'course', 2, True),
+		('pure-async-course-detail', 'get', {}, 2, True),
+		('pure-async-course-detail', 'post', 'course', 3, True),
+		('pure-async-course-detail', 'patch', {'lectures_num': 9}, 2, True),
+		('pure-async-course-detail', 'delete', {}, 2, True),
+		('metrics', 'get', {}, 0, True),
+	]
+	# Queries allowed to scan the course table: exports read all of it
+	full_scan_routes = {'pure-course-export'}
+	full_scan = re.compile(r'^SCAN (TABLE )?courses_course\b(?!.*\bUSING\b)')
+
+	def setUp(self) -> None:
+		# The metrics endpoint is there only with instrumentation on, async
+		# views query on this thread, so their queries are captured
+		patchers = [
+			mock.patch.dict(PURE_REST['INSTRUMENTATION'],
+							{'ENABLED': True, 'METRICS': True, 'LOG': False,
+							'METRICS_ALLOWED_IPS': ['127.0.0.1']}),
+			mock.patch.dict(PURE_REST['ASYNC'], {'MAX_WORKERS': None}),
+		]
+		for patcher in patchers:
+			patcher.start()
+			self.addCleanup(patcher.stop)
+		self.client = self.client_class()
+
+	def seed(self, count):
+		existing = Course.objects.count()
+		base = datetime.date(2000, 1, 1)
+		Course.objects.bulk_create([Course(
+			name='%s course %d' % (('Python', 'Django', 'Go')[i % 3], i),
+			start_date=base + datetime.timedelta(days=i % 7000),
+			end_date=base + datetime.timedelta(days=i % 7000 + 30),
+			lectures_num=i % 40) for i in range(existing, count)])
+		with connection.cursor() as cursor:
+			cursor.execute('ANALYZE')
+
+	def get_route_names(self, resolver=None):
+		names = set()
+		for pattern in (resolver or get_resolver()).url_patterns:
+			if isinstance(pattern, URLResolver):
+				if pattern.app_name != 'admin':
+					names |= self.get_route_names(pattern)
+			elif pattern.name:
+				names.add(pattern.name)
+		return names
+
+	def get_payload(self, payload, i):
+		if isinstance(payload, list):
+			return [self.get_payload(item, i + n)
+					for n, item in enumerate(payload)]
+		if not isinstance(payload, str):
+			return payload
+		pk = self.pks[i % len(self.pks)]
+		course = {'name': 'Budget %d' % i, 'start_date': '2001-01-01',
+					'end_date': '2001-02-01', 'lectures_num': 8}
+		ids = ','.join(str(pk) for pk in self.pks[:5])
+		return {'course': course, 'object': dict(course, id=pk), 'pk': pk,
+				'ids': {'ids': ids + ',0'}}[payload]
+
+	def request(self, case, i):
+		name, method, payload, _, _ = case
+		kwargs = {'pk': self.pks[i % len(self.pks)]} \
+			if name.endswith('-detail') else {}
+		url = reverse(name, kwargs=kwargs)
+		data = self.get_payload(payload, i)
+		if method == 'delete' and isinstance(data, dict) and data:
+			# Filtered deletes take their parameters in the query string
+			return self.client.delete(url + '?' + urlencode(data))
+		if method != 'get':
+			return getattr(self.client, method)(url, data, format='json')
+		response = self.client.get(url, data)
+		if response.streaming:
+			# Streamed rows are read while the response is sent
+			b''.join(response.streaming_content)
+		return response
+
+	def run_cases(self, repeat=3):
+		"""
+		Runs every case repeat times, returns its queries and the fewest
+		SQLite VM steps it took (writes merge the search index now and then)
+		"""
+		steps = [0]
+
+		def count_steps():
+			steps[0] += 1
+			return 0
+
+		results = []
+		connection.ensure_connection()
+		for i, case in enumerate(self.cases):
+			fewest = None
+			for attempt in range(repeat):
+				# Deleted and updated objects differ between cases and runs
+				self.pks = list(Course.objects.order_by('?').values_list(
+					'pk', flat=True)[:10])
+				steps[0] = 0
+				connection.connection.set_progress_handler(count_steps, 10)
+				try:
+					with CaptureQueriesContext(connection) as queries:
+						response = self.request(case, i * repeat + attempt)
+				finally:
+					connection.connection.set_progress_handler(None, 10)
+				self.assertLess(response.status_code, 400, case)
+				fewest = steps[0] if fewest is None else min(fewest, steps[0])
+			results.append(([query['sql'] for query in
+							queries.captured_queries], fewest))
+		return results
+
+	def get_full_scans(self, sql):
+		"""
+		Steps of the plan of sql reading the whole course table. Scans under a
+		LIMIT stop early, the growth check covers them
+		"""
+		statement = sql.startswith(('SELECT', 'UPDATE', 'DELETE'))
+		if not statement or re.search(r'\bLIMIT \d+', sql):
+			return []
+		with connection.cursor() as cursor:
+			cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+			details = [row[-1] for row in cursor.fetchall()]
+		return [detail for detail in details if self.full_scan.match(detail)]
+
+	def test_budgets(self):
+		self.assertEqual(
+			{name for name, *_ in self.cases} | self.skipped_routes,
+			self.get_route_names(), 'Every route needs a query budget')
+		self.seed(self.rows)
+		small = self.run_cases()
+		self.seed(self.rows * 4)
+		large = self.run_cases()
+		for case, small_run, large_run in zip(self.cases, small, large):
+			name, method, payload, budget, bounded = case
+			(_, small_steps), (queries, large_steps) = small_run, large_run
+			with self.subTest(case=case):
+				# The first run warms up the one-off queries (introspection)
+				self.assertLessEqual(len(queries), budget, '\n'.join(queries))
+				if name not in self.full_scan_routes:
+					for sql in queries:
+						self.assertEqual(self.get_full_scans(sql), [], sql)
+				if bounded:
+					self.assertLessEqual(large_steps, small_steps * 1.5 + 10)
+
+
+class AsyncViewsTest(APITestCase):
+	def setUp(self) -> None:
+		Course.objects.bulk_create([Course(
+			name='Test%d' % i, start_date='2001-01-01', end_date='2001-02-01',
+			lectures_num=8) for i in range(3)])
+		# On the test thread, inside the test transaction
+		patcher = mock.patch.dict(PURE_REST['ASYNC'], {'MAX_WORKERS': None})
+		patcher.start()
+		self.addCleanup(patcher.stop)
+
+	def get_urls(self, name, **kwargs):
+		return (reverse('pure-' + name, kwargs=kwargs),
+				reverse('pure-async-' + name, kwargs=kwargs))
+
+	def test_reads(self):
+		pk = Course.objects.first().pk
+		cases = [
+			(self.get_urls('course-list'), {}),
+			(self.get_urls('course-list'), {'cursor': '', 'search': 'test'}),
+			(self.get_urls('course-list'), {'fields': 'name'}),
+			(self.get_urls('course-detail', pk=pk), {}),
+			(self.get_urls('course-detail', pk=pk), {'fields': 'id'}),
+		]
+		for urls, params in cases:
+			sync, asynchronous = [self.client.get(url, params) for url in urls]
+			self.assertEqual(asynchronous.status_code, sync.status_code)
+			self.assertEqual(asynchronous.content.replace(b'-async', b''),
+							sync.content)
+			self.assertEqual(asynchronous['ETag'], sync['ETag'])
+
+	def test_writes(self):
+		data = {'name': 'Async', 'start_date': '2001-01-01',
+				'end_date': '2001-02-01', 'lectures_num': 3}
+		list_url = reverse('pure-async-course-list')
+		response = self.client.post(list_url, data, format='json')
+		self.assertEqual(response.status_code, status.HTTP_200_OK)
+		created = json.loads(response.content)
+		self.assertEqual(created, dict(data, id=created['id'],
+										start_date='01.01.2001',
+										end_date='01.02.2001'))
+		url = reverse('pure-async-course-detail', kwargs={'pk': created['id']})
+		response = self.client.post(url, dict(data, name='Renamed'),
+									format='json')
+		self.assertEqual(json.loads(response.content)['name'], 'Renamed')
+		response = self.client.post(list_url, dict(data, lectures_num=-1),
+									format='json')
+		self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+		response = self.client.delete(url)
+		self.assertEqual(response.status_code, status.HTTP_200_OK)
+		self.assertFalse(Course.objects.filter(pk=created['id']).exists())
+
+	def test_deferred_encoding(self):
+		request = RequestFactory().get(reverse('pure-async-course-list'))
+		view = CourseListCreateView.as_view()
+		async_view = AsyncCourseListCreateView.as_view()
+		response = async_to_sync(async_view)(request)
+		# Encoded by the handler once the view has returned
+		self.assertIsInstance(response, DeferredJsonResponse)
+		self.assertFalse(response.is_rendered)
+		self.assertEqual(response.render().content, view(request).content)
+
+
+class AsyncExecutorTest(APITransactionTestCase):
+	def setUp(self) -> None:
+		Course.objects.bulk_create([Course(
+			name='Test%d' % i, start_date='2001-01-01', end_date='2001-02-01',
+			lectures_num=8) for i in range(3)])
+
+	def set_executor(self, **config):
+		patcher = mock.patch.dict(PURE_REST['ASYNC'], config)
+		patcher.start()
+		self.addCleanup(patcher.stop)
+		self.addCleanup(get_executor().shutdown)
+		return get_executor()
+
+	def test_pool(self):
+		executor = self.set_executor(MAX_WORKERS=2, MAX_QUEUE=2)
+		threads = set()
+		original = CourseListCreateView.get_queryset
+
+		def get_queryset(view):
+			threads.add(threading.current_thread().name)
+			return original(view)
+
+		with mock.patch.object(CourseListCreateView, 'get_queryset',
+								get_queryset):
+			response = self.client.get(reverse('pure-async-course-list'))
+		self.assertEqual(response.status_code, status.HTTP_200_OK)
+		self.assertEqual(json.loads(response.content)['count'], 3)
+		self.assertTrue(all(name.startswith('db') for name in threads))
+		self.assertEqual(executor.max_workers, 2)
+
+	def test_saturated(self):
+		executor = self.set_executor(MAX_WORKERS=1, MAX_QUEUE=0,
+										RETRY_AFTER=3)
+		release, started = threading.Event(), threading.Event()
+
+		def block():
+			started.set()
+			release.wait()
+
+		# Takes the only thread
+		busy = threading.Thread(target=async_to_sync(executor.run),
+								args=[block])
+		busy.start()
+		started.wait()
+		try:
+			response = self.client.get(reverse('pure-async-course-list'))
+		finally:
+			release.set()
+			busy.join()
+		self.assertEqual(response.status_code,
+						status.HTTP_503_SERVICE_UNAVAILABLE)
+		self.assertEqual(response['Retry-After'], '3')
+		response = self.client.get(reverse('pure-async-course-list'))
+		self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+
+class MultiGetTest(APITestCase):
+	def setUp(self) -> None:
+		Course.objects.bulk_create([Course(
+			name='Test%d' % i, start_date='2001-01-01', end_date='2001-02-01',
+			lectures_num=i) for i in range(5)])
+		self.pks = list(Course.objects.values_list('pk', flat=True))
+		self.missing = max(self.pks) + 1
+
+	def urls(self):
+		return [reverse('pure-course-list'), reverse('course-list')]
+
+	def get(self, url, ids, queries=1, **params):
+		with self.assertNumQueries(queries):
+			response = self.client.get(url, dict(
+				params, ids=','.join(str(pk) for pk in ids)))
+		self.assertEqual(response.status_code, status.HTTP_200_OK)
+		return response
+
+	def test_order_and_markers(self):
+		ids = [self.pks[3], self.missing, self.pks[0], self.pks[3]]
+		for url in self.urls():
+			body = json.loads(self.get(url, ids).content)
+			self.assertEqual(body['count'], 2)
+			self.assertEqual(body['not_found'], [self.missing])
+			self.assertEqual([row and row['id'] for row in body['results']],
+							[self.pks[3], None, self.pks[0], self.pks[3]])
+			self.assertEqual(body['results'][0]['lectures_num'], 3)
+
+	def test_same_objects_as_detail(self):
+		pure, drf = [json.loads(self.get(url, self.pks).content)['results']
+						for url in self.urls()]
+		for pk, pure_row, drf_row in zip(self.pks, pure, drf):
+			detail = reverse('pure-course-detail', kwargs={'pk': pk})
+			self.assertEqual(pure_row, json.loads(self.client.get(detail).content))
+			detail = reverse('course-detail', kwargs={'pk': pk})
+			self.assertEqual(drf_row, json.loads(self.client.get(detail).content))
+
+	def test_fields_and_filters(self):
+		for url in self.urls():
+			body = json.loads(self.get(url, self.pks[:3],
+										fields='name').content)
+			self.assertEqual(body['results'][0], {'name': 'Test0'})
+			body = json.loads(self.get(url, self.pks[:3],
+										start_date='2001-01-01').content)
+			self.assertEqual(body['count'], 3)
+			body = json.loads(self.get(url, [], queries=0).content)
+			self.assertEqual(body['results'], [])
+
+	def test_conditional(self):
+		for url in self.urls():
+			response = self.get(url, self.pks[:2])
+			response = self.client.get(url, {'ids': '%d,%d' % tuple(
+				self.pks[:2])}, HTTP_IF_NONE_MATCH=response['ETag'])
+			self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+	def test_invalid(self):
+		for url in self.urls():
+			for ids in ('1,x', ','.join(['1'] * 101)):
+				response = self.client.get(url, {'ids': ids})
+				self.assertEqual(response.status_code,
+								status.HTTP_400_BAD_REQUEST)
+			patchers = [mock.patch.object(view, 'max_ids', 2)
+						for view in (CourseViewSet, CourseListCreateView)]
+			with patchers[0], patchers[1]:
+				response = self.client.get(url, {'ids': '1,2,3'})
+			self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+			self.assertIn('limit is 2', response.content.decode())
+
+
+class ChangeFeedTest(APITestCase):
+	def setUp(self) -> None:
+		self.url = reverse('pure-course-changes')
+		self.course = {'name': 'Test1', 'start_date': '2001-01-01',
+						'end_date': '2001-02-01', 'lectures_num': 8}
+
+	def get_changes(self, **params):
+		response = self.client.get(self.url, params)
+		self.assertEqual(response.status_code, status.HTTP_200_OK)
+		return json.loads(response.content)
+
+	def write(self):
+		"""
+		Writes through both APIs, returns the expected (id, action) entries
+		"""
+		pure = json.loads(self.client.post(reverse('pure-course-list'),
+											self.course, format='json').content)
+		drf = self.client.post(reverse('course-list'), self.course,
+								format='json').data
+		self.client.post(reverse('pure-course-detail', kwargs={'pk': pure['id']}),
+						self.course, format='json')
+		self.client.put(reverse('course-detail', kwargs={'pk': drf['id']}),
+						self.course, format='json')
+		self.client.delete(reverse('pure-course-detail',
+									kwargs={'pk': pure['id']}))
+		bulk = self.client.post(reverse('course-bulk'), [self.course] * 2,
+								format='json').data
+		self.client.delete(reverse('course-detail', kwargs={'pk': drf['id']}))
+		return [(pure['id'], 'create'), (drf['id'], 'create'),
+				(pure['id'], 'update'), (drf['id'], 'update'),
+				(pure['id'], 'delete'), (bulk[0]['id'], 'create'),
+				(bulk[1]['id'], 'create'), (drf['id'], 'delete')]
+
+	def test_feed(self):
+		start = self.get_changes()
+		self.assertEqual(start['results'], [])
+		expected = self.write()
+		changes = self.get_changes(since=start['last_seq'])
+		self.assertEqual([(row['id'], row['action'])
+						for row in changes['results']], expected)
+		seqs = [row['seq'] for row in changes['results']]
+		self.assertEqual(seqs, sorted(set(seqs)))
+		self.assertEqual(changes['last_seq'], seqs[-1])
+		self.assertFalse(changes['has_more'])
+		self.assertEqual(self.get_changes()['last_seq'], seqs[-1])
+
+		# Paging by limit
+		since, pages = start['last_seq'], []
+		while True:
+			page = self.get_changes(since=since, limit=3)
+			pages.append(page['results'])
+			since = page['last_seq']
+			if not page['has_more']:
+				break
+		self.assertEqual([len(page) for page in pages], [3, 3, 2])
+		self.assertEqual(sum(pages, []), changes['results'])
+		self.assertEqual(self.get_changes(since=since)['results'], [])
+
+	def test_invalid(self):
+		for params in ({'since': 'x'}, {'since': -1}, {'since': 0, 'limit': 'x'},
+						{'since': 0, 'limit': 1001}):
+			response = self.client.get(self.url, params)
+			self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+	def test_compaction(self):
+		since = self.get_changes()['last_seq']
+		expected = self.write()
+		out = io.StringIO()
+		call_command('compact_changes', days=1, stdout=out)
+		# Only the latest entry of every course is left
+		self.assertEqual(out.getvalue(), 'Removed 4 change log entries\n')
+		changes = self.get_changes(since=since)['results']
+		self.assertEqual([(row['id'], row['action']) for row in changes],
+						expected[4:])
+
+		CourseChange.objects.update(
+			changed_at=timezone.now() - datetime.timedelta(days=2))
+		last_seq = changes[-1]['seq']
+		call_command('compact_changes', days=1, stdout=out)
+		self.client.delete(reverse('course-detail',
+									kwargs={'pk': expected[5][0]}))
+		response = self.client.get(self.url, {'since': since})
+		self.assertEqual(response.status_code, status.HTTP_410_GONE)
+		self.assertEqual(json.loads(response.content)['last_seq'],
+						last_seq + 1)
+		# Pollers up to date with the compacted entries lose nothing
+		changes = self.get_changes(since=last_seq)['results']
+		self.assertEqual([(row['id'], row['action']) for row in changes],
+						[(expected[5][0], 'delete')])
+
+
+class ChangeLogTransactionTest(APITransactionTestCase):
+	def test_rolled_back_with_the_write(self):
+		course = {'name': 'Test1', 'start_date': '2001-01-01',
+					'end_date': '2001-02-01', 'lectures_num': 8}
+		with mock.patch('courses.models.log_changes',
+						side_effect=DatabaseError('log is full')):
+			with self.assertRaises(DatabaseError):
+				self.client.post(reverse('pure-course-list'), course,
+								format='json')
+			with self.assertRaises(DatabaseError):
+				self.client.post(reverse('course-list'), course, format='json')
+		self.assertFalse(Course.objects.exists())
+		self.client.post(reverse('pure-course-list'), course, format='json')
+		self.assertEqual(list(CourseChange.objects.values_list(
+			'object_id', 'action')), [(Course.objects.get().pk, 'create')])
+
+
+class DatabaseProfileTest(APITestCase):
+	def setUp(self) -> None:
+		directory = tempfile.TemporaryDirectory()
+		self.addCleanup(directory.cleanup)
+		self.path = os.path.join(directory.name, 'profile.sqlite3')
+		self.create_file(self.path, 1)
+
+	def create_file(self, path, value):
+		with closing(sqlite3.connect(path)) as db, db:
+			db.execute('CREATE TABLE t (value INTEGER)')
+			db.execute('INSERT INTO t VALUES (?)', [value])
+
+	def get_connection(self, **settings_dict):
+		wrapper = DatabaseWrapper(dict(connection.settings_dict, NAME=self.path,
+										**settings_dict), 'profile')
+		self.addCleanup(wrapper.close)
+		return wrapper
+
+	def query(self, wrapper, sql):
+		with wrapper.cursor() as cursor:
+			cursor.execute(sql)
+			return cursor.fetchone()[0]
+
+	def test_pragmas(self):
+		wrapper = self.get_connection()
+		for name, value in settings.SQLITE_PRAGMAS.items():
+			self.assertEqual(str(self.query(wrapper, 'PRAGMA ' + name)).lower(),
+							str({'NORMAL': 1, 'MEMORY': 2}.get(value, value)).lower())
+
+	def test_transaction_mode(self):
+		for options, sql in (({}, 'BEGIN'),
+							({'transaction_mode': 'IMMEDIATE'}, 'BEGIN IMMEDIATE')):
+			wrapper = self.get_connection(OPTIONS=options)
+			wrapper.ensure_connection()
+			with CaptureQueriesContext(wrapper) as queries:
+				wrapper._start_transaction_under_autocommit()
+			self.assertEqual(queries[0]['sql'], sql)
+			self.assertTrue(wrapper.connection.in_transaction)
+			wrapper.connection.rollback()
+
+	def test_health_checks(self):
+		checked = self.get_connection()
+		unchecked = self.get_connection(CONN_HEALTH_CHECKS=False)
+		for wrapper in (checked, unchecked):
+			self.assertEqual(self.query(wrapper, 'SELECT value FROM t'), 1)
+		# The file is replaced by a fresh copy, as replicas are
+		copy = self.path + '.copy'
+		self.create_file(copy, 2)
+		os.replace(copy, self.path)
+		for wrapper in (checked, unchecked):
+			# The next request starts
+			wrapper.close_if_unusable_or_obsolete()
+		self.assertEqual(self.query(checked, 'SELECT value FROM t'), 2)
+		self.assertEqual(self.query(unchecked, 'SELECT value FROM t'), 1)
+		# Checked once per request
+		with mock.patch.object(checked, 'is_usable') as is_usable:
+			self.query(checked, 'SELECT 1')
+		is_usable.assert_not_called()
+
+
+class ReplicaRoutingTest(APITestCase):
+	databases = {'default', 'replica'}
+
+	def setUp(self) -> None:
+		patcher = mock.patch.dict(settings.DATABASE_ROUTING,
+									{'REPLICA': 'replica'})
+		patcher.start()
+		self.addCleanup(patcher.stop)
+		# Middleware is loaded by the first request of a client
+		self.client = self.client_class()
+		self.course = {'name': 'Test1', 'start_date': '2001-01-01',
+						'end_date': '2001-02-01', 'lectures_num': 8}
+
+	def get_counts(self, client, pk):
+		"""
+		Courses client sees in the lists and the detail of pk of both APIs
+		"""
+		counts = []
+		for url_name in ('pure-course-list', 'course-list'):
+			response = client.get(reverse(url_name))
+			counts.append(json.loads(response.content)['count'])
+		for url_name in ('pure-course-detail', 'course-detail'):
+			response = client.get(reverse(url_name, kwargs={'pk': pk}))
+			counts.append(int(response.status_code == status.HTTP_200_OK))
+		return counts
+
+	def test_reads_from_replica(self):
+		response = self.client.post(reverse('pure-course-list'), self.course,
+									format='json')
+		pk = json.loads(response.content)['id']
+		cookie = response.cookies[settings.DATABASE_ROUTING['COOKIE']]
+		self.assertEqual(cookie['max-age'],
+						settings.DATABASE_ROUTING['STICKY_SECONDS'])
+		# The writer reads its write from the primary
+		self.assertEqual(self.get_counts(self.client, pk), [1, 1, 1, 1])
+		# Others read the replica, which the write didn't reach
+		other = self.client_class()
+		self.assertEqual(self.get_counts(other, pk), [0, 0, 0, 0])
+		Course.objects.using('replica').create(pk=pk, **self.course)
+		self.assertEqual(self.get_counts(other, pk), [1, 1, 1, 1])
+
+		response = other.delete(reverse('course-detail', kwargs={'pk': pk}))
+		self.assertIn(settings.DATABASE_ROUTING['COOKIE'], response.cookies)
+		self.assertEqual(self.get_counts(other, pk), [0, 0, 0, 0])
+		self.assertTrue(Course.objects.using('replica').filter(pk=pk).exists())
+
+	def test_response_cache(self):
+		patcher = mock.patch.dict(PURE_REST['RESPONSE_CACHE'],
+									{'BACKEND': 'locmem'})
+		patcher.start()
+		self.addCleanup(patcher.stop)
+		get_response_cache().backend.clear()
+		response = self.client.post(reverse('pure-course-list'), self.course,
+									format='json')
+		pk = json.loads(response.content)['id']
+		# Another client caches the lagging replica's responses...
+		other = self.client_class()
+		self.assertEqual(self.get_counts(other, pk)[::2], [0, 0])
+		self.assertEqual(other.get(reverse('pure-course-list'))['X-Cache'],
+						'HIT')
+		# ...which the pinned writer doesn't get
+		response = self.client.get(reverse('pure-course-list'))
+		self.assertEqual(response['X-Cache'], 'MISS')
+		self.assertEqual(self.get_counts(self.client, pk)[::2], [1, 1])
+		response = self.client.get(reverse('pure-course-list'))
+		self.assertEqual(response['X-Cache'], 'HIT')
+		self.assertEqual(json.loads(response.content)['count'], 1)
+
+	def test_router_is_pure(self):
+		request = RequestFactory().get('/')
+		with read_replica(request):
+			# Routing a write (get_or_create, admin, ...) isn't a write
+			self.assertEqual(router.db_for_write(Course), 'default')
+			self.assertEqual(router.db_for_read(Course), 'replica')
+			objects_written.send(sender=Course, action='update', pks=[1])
+			self.assertEqual(router.db_for_read(Course), 'default')
+		self.assertEqual(router.db_for_read(Course), 'default')
+
+	def test_routing_off(self):
+		with mock.patch.dict(settings.DATABASE_ROUTING, {'REPLICA': None}):
+			client = self.client_class()
+			response = client.post(reverse('course-list'), self.course,
+									format='json')
+			self.assertEqual(response.cookies, {})
+			self.assertEqual(self.get_counts(self.client_class(),
+											response.data['id']), [1, 1, 1, 1])
+
+
+class ResponseFormatTest(APITestCase):
+	def setUp(self) -> None:
+		Course.objects.bulk_create([Course(
+			name='Tést%d' % i, start_date='2001-01-%02d' % (i + 1),
+			end_date='2001-02-01', lectures_num=i) for i in range(12)])
+		# Async views on the test thread, inside the test transaction
+		patcher = mock.patch.dict(PURE_REST['ASYNC'], {'MAX_WORKERS': None})
+		patcher.start()
+		self.addCleanup(patcher.stop)
+
+	def urls(self):
+		return [reverse('pure-course-list'), reverse('pure-async-course-list'),
+				reverse('course-list')]
+
+	def get(self, url, params=None, accept=None, media_type=None):
+		headers = {'HTTP_ACCEPT': accept} if accept else {}
+		response = self.client.get(url, params or {}, **headers)
+		self.assertEqual(response.status_code, status.HTTP_200_OK)
+		if media_type is not None:
+			self.assertEqual(response['Content-Type'], media_type)
+		self.assertIn('Accept', response['Vary'])
+		return response
+
+	def test_columnar(self):
+		for url in self.urls():
+			body = json.loads(self.get(url).content)
+			columnar = json.loads(self.get(
+				url, {'format': 'columnar'},
+				media_type='application/vnd.columnar+json').content)
+			results = body.pop('results')
+			self.assertEqual(columnar.pop('columns'), list(results[0]))
+			rows = columnar.pop('rows')
+			# The same page with the same dates, links keep the format
+			for key in ('next', 'previous'):
+				if body.get(key, None):
+					self.assertIn('format=columnar', columnar.pop(key))
+					body.pop(key)
+			self.assertEqual(columnar, body)
+			self.assertEqual(rows, [list(row.values()) for row in results])
+			self.assertEqual(rows[0][2:], ['01.01.2001', '01.02.2001', 0])
+
+	def test_accept(self):
+		for url in self.urls():
+			response = self.get(url, accept='application/vnd.columnar+json',
+								media_type='application/vnd.columnar+json')
+			self.assertIn('rows', json.loads(response.content))
+			for accept in ('application/json, application/vnd.columnar+json',
+							'application/json', '*/*'):
+				response = self.get(url, accept=accept)
+				self.assertIn('results', json.loads(response.content))
+
+	def test_cursor_ids_and_fields(self):
+		pks = list(Course.objects.values_list('pk', flat=True))
+		for url in self.urls():
+			body = json.loads(self.get(url, {
+				'format': 'columnar', 'cursor': '', 'fields': 'name'}).content)
+			self.assertEqual(body['columns'], ['name'])
+			self.assertEqual(body['rows'][0], ['Tést0'])
+			self.assertIn('format=columnar', body['next'])
+			body = json.loads(self.get(url, {'format': 'columnar', 'ids': '%d,%d'
+											% (pks[1], max(pks) + 1)}).content)
+			self.assertEqual(body['rows'], [[pks[1], 'Tést1', '02.01.2001',
+											'01.02.2001', 1], None])
+			self.assertEqual(body['not_found'], [max(pks) + 1])
+
+	def test_same_bytes_without_orjson(self):
+		url = reverse('pure-course-list')
+		content = self.get(url, {'format': 'columnar'}).content
+		with mock.patch('views.formats.orjson', None):
+			self.assertEqual(self.get(url, {'format': 'columnar'}).content,
+							content)
+
+	@skipUnless(msgpack, 'msgpack is not installed')
+	def test_msgpack(self):
+		for url in self.urls():
+			columnar = self.get(url, {'format': 'columnar'}).content
+			response = self.get(url, {'format': 'msgpack'},
+								media_type='application/msgpack')
+			self.assertEqual(msgpack.unpackb(response.content), json.loads(
+				columnar.replace(b'format=columnar', b'format=msgpack')))
+			response = self.get(url, accept='application/msgpack',
+								media_type='application/msgpack')
+			self.assertIn('rows', msgpack.unpackb(response.content))
+
+	def test_validators_and_cache(self):
+		with mock.patch.dict(PURE_REST['RESPONSE_CACHE'], {'BACKEND': 'locmem'}):
+			get_response_cache().backend.clear()
+			for url in self.urls():
+				etag = self.get(url)['ETag']
+				response = self.get(url, accept='application/vnd.columnar+json')
+				self.assertNotEqual(response['ETag'], etag)
+				self.assertIn('rows', json.loads(response.content))
+				response = self.client.get(
+					url, HTTP_ACCEPT='application/vnd.columnar+json',
+					HTTP_IF_NONE_MATCH=response['ETag'])
+				self.assertEqual(response.status_code,
+								status.HTTP_304_NOT_MODIFIED)
+
+	def test_unknown_format(self):
+		response = self.client.get(reverse('pure-course-list'),
+									{'format': 'xml'})
+		self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+		# Only lists have the compact formats
+		pk = Course.objects.values_list('pk', flat=True)[0]
+		response = self.client.get(reverse('course-detail', kwargs={'pk': pk}),
+									HTTP_ACCEPT='application/vnd.columnar+json')
+		self.assertEqual(response.status_code, status.HTTP_406_NOT_ACCEPTABLE)
+
+
+class RowSerializerTest(APITestCase):
+	def setUp(self) -> None:
+		Course.objects.bulk_create([Course(
+			name='Tést "%d"\n' % i, start_date='2001-01-%02d' % (i + 1),
+			end_date='2001-02-01', lectures_num=i) for i in range(12)])
+
+	def test_parity(self):
+		courses = list(Course.objects.all())
+		for fields in (None, ['name'], ['end_date', 'id']):
+			expected = CourseSerializer(courses, many=True, fields=fields).data
+			row_serializer = get_row_serializer(fields)
+			rows = Course.objects.values_list(*row_serializer.sources)
+			self.assertEqual(
+				JSONRenderer().render(row_serializer.to_representations(rows)),
+				JSONRenderer().render(expected))
+
+	def test_filters_once(self):
+		filter_queryset = mock.patch.object(
+			CourseViewSet, 'filter_queryset', autospec=True,
+			side_effect=CourseViewSet.filter_queryset)
+		for params in ({}, {'cursor': ''}, {'search': 'test', 'fields': 'name'}):
+			with self.subTest(params=params), filter_queryset as patched:
+				response = self.client.get(reverse('course-list'), params)
+				self.assertEqual(response.status_code, status.HTTP_200_OK)
+				self.assertEqual(patched.call_count, 1)
+
+	def test_responses(self):
+		courses = list(Course.objects.all())
+		response = self.client.get(reverse('course-list'))
+		expected = json.loads(response.content, object_pairs_hook=OrderedDict)
+		expected['results'] = CourseSerializer(courses[:10], many=True).data
+		self.assertEqual(response.content, JSONRenderer().render(expected))
+		response = self.client.get(reverse('course-list'), {
+			'cursor': '', 'ordering': '-start_date', 'fields': 'name,id'})
+		expected = json.loads(response.content, object_pairs_hook=OrderedDict)
+		expected['results'] = CourseSerializer(
+			courses[::-1][:10], many=True, fields=['name', 'id']).data
+		self.assertEqual(response.content, JSONRenderer().render(expected))
+		for course in courses[:3]:
+			url = reverse('course-detail', kwargs={'pk': course.pk})
+			self.assertEqual(self.client.get(url).content,
+							JSONRenderer().render(CourseSerializer(course).data))
+		self.assertEqual(self.client.get(url, {'format': 'api'}).status_code,
+						status.HTTP_200_OK)
+
+	def test_date_format(self):
+		course = Course.objects.first()
+		url = reverse('course-detail', kwargs={'pk': course.pk})
+		with self.settings(REST_FRAMEWORK=dict(settings.REST_FRAMEWORK,
+												DATE_FORMAT='iso-8601')):
+			self.assertEqual(json.loads(self.client.get(url).content)[
+				'start_date'], '2001-01-01')
+		self.assertEqual(json.loads(self.client.get(url).content)[
+			'start_date'], '01.01.2001')
+
+
+class PatchTest(APITestCase):
+	def setUp(self) -> None:
+		self.course = Course.objects.create(
+			name='Test1', start_date='2001-01-01', end_date='2001-02-01',
+			lectures_num=8)
+		self.url = reverse('pure-course-detail', kwargs={'pk': self.course.pk})
+		# Async views on the test thread, inside the test transaction
+		patcher = mock.patch.dict(PURE_REST['ASYNC'], {'MAX_WORKERS': None})
+		patcher.start()
+		self.addCleanup(patcher.stop)
+
+	def patch(self, data, code=status.HTTP_200_OK, url=None, **headers):
+		response = self.client.patch(url or self.url, data, format='json',
+									**headers)
+		self.assertEqual(response.status_code, code, response.content)
+		return response
+
+	def test_partial(self):
+		for url_name in ('pure-course-detail', 'pure-async-course-detail'):
+			url = reverse(url_name, kwargs={'pk': self.course.pk})
+			with CaptureQueriesContext(connection) as queries:
+				response = self.patch({'lectures_num': 9}, url=url)
+			self.assertEqual(json.loads(response.content),
+							{'id': self.course.pk, 'lectures_num': 9})
+			# Only the changed column and the version, without reading
+			update = queries.captured_queries[0]['sql']
+			self.assertRegex(update, r'^UPDATE "courses_course" SET '
+								r'"lectures_num" = 9, "updated_at" = .+ WHERE')
+			self.assertFalse(any(query['sql'].startswith('SELECT')
+								for query in queries.captured_queries))
+			self.assertEqual(self.client.get(self.url)['ETag'], response['ETag'])
+		self.course.refresh_from_db()
+		self.assertEqual((self.course.name, self.course.lectures_num,
+							self.course.end_date.isoformat()),
+						('Test1', 9, '2001-02-01'))
+		self.assertEqual(CourseChange.objects.filter(
+			object_id=self.course.pk, action='update').count(), 2)
+
+	def test_validation(self):
+		cases = [
+			({'lectures_num': -1}, 'lectures_num'),
+			({'lectures_num': 'x', 'name': 'Test2'}, 'lectures_num'),
+			({'updated_at': '2001-01-01'}, 'updated_at'),
+			({'id': 5}, 'id'),
+			([], '__all__'),
+			({}, '__all__'),
+			# The date rule, against the stored date or the other given one
+			({'start_date': '2001-03-01'}, '__all__'),
+			({'end_date': '2000-12-01'}, '__all__'),
+			({'start_date': '2001-03-01', 'end_date': '2001-02-15'}, '__all__'),
+		]
+		for data, field in cases:
+			response = self.patch(data, status.HTTP_400_BAD_REQUEST)
+			self.assertIn(field, json.loads(response.content))
+		self.assertEqual(Course.objects.get(pk=self.course.pk).name, 'Test1')
+		response = self.patch({'start_date': '2001-01-15', 'name': 'Test2'})
+		self.assertEqual(json.loads(response.content)['start_date'],
+						'15.01.2001')
+		self.patch({'lectures_num': 1}, status.HTTP_404_NOT_FOUND, url=reverse(
+			'pure-course-detail', kwargs={'pk': self.course.pk + 1}))
+
+	def test_if_match(self):
+		etag = self.client.get(self.url)['ETag']
+		response = self.patch({'lectures_num': 9}, HTTP_IF_MATCH=etag)
+		self.patch({'lectures_num': 10}, status.HTTP_412_PRECONDITION_FAILED,
+					HTTP_IF_MATCH=etag)
+		self.patch({'lectures_num': 10}, status.HTTP_412_PRECONDITION_FAILED,
+					HTTP_IF_MATCH='W/%s' % response['ETag'])
+		self.patch({'lectures_num': 10},
+					HTTP_IF_MATCH='%s, %s' % (etag, response['ETag']))
+		self.patch({'lectures_num': 11}, HTTP_IF_MATCH='*')
+		self.assertEqual(Course.objects.get(pk=self.course.pk).lectures_num, 11)
+
+
+class DeleteTest(APITestCase):
+	def setUp(self) -> None:
+		Course.objects.bulk_create([Course(
+			name='Test%d' % i, start_date='2001-01-01',
+			end_date='2001-02-%02d' % (i + 1), lectures_num=i)
+			for i in range(12)])
+		self.url = reverse('pure-course-list')
+
+	def delete(self, params, code=status.HTTP_200_OK):
+		response = self.client.delete(self.url + '?' + urlencode(params))
+		self.assertEqual(response.status_code, code, response.content)
+		return json.loads(response.content)
+
+	def test_detail(self):
+		pk = Course.objects.values_list('pk', flat=True)[0]
+		url = reverse('pure-course-detail', kwargs={'pk': pk})
+		with CaptureQueriesContext(connection) as queries:
+			response = self.client.delete(url)
+		self.assertEqual(response.status_code, status.HTTP_200_OK)
+		self.assertEqual([query['sql'].split()[0]
+							for query in queries.captured_queries],
+						['DELETE', 'INSERT'])
+		self.assertEqual(self.client.delete(url).status_code,
+						status.HTTP_404_NOT_FOUND)
+		self.assertEqual(CourseChange.objects.filter(
+			object_id=pk, action='delete').count(), 1)
+
+	def test_filtered(self):
+		body = self.delete({'end_date__lt': '2001-02-05', 'confirm': 'true'})
+		self.assertEqual(body, {'deleted': 4})
+		self.assertEqual(Course.objects.count(), 8)
+		self.assertFalse(Course.objects.filter(end_date__lt='2001-02-05')
+						.exists())
+		self.assertEqual(CourseChange.objects.filter(action='delete').count(), 4)
+		body = self.delete({'active_on': '2001-02-12', 'confirm': '1'})
+		self.assertEqual(body, {'deleted': 1})
+
+	def test_chunks(self):
+		params = {'end_date__lte': '2001-02-05', 'confirm': 'true'}
+		with mock.patch.object(CourseListCreateView, 'batch_size', 2):
+			with CaptureQueriesContext(connection) as queries:
+				body = self.delete(params)
+		self.assertEqual(body, {'deleted': 5})
+		self.assertEqual(len([query for query in queries.captured_queries
+							if query['sql'].startswith('DELETE')]), 3)
+
+	def test_guards(self):
+		for params in ({'confirm': 'true'},
+						{'end_date__lt': '2001-02-05'},
+						{'end_date__lt': '2001-02-05', 'confirm': 'no'},
+						{'end_date__lt': 'x', 'confirm': 'true'}):
+			self.delete(params, status.HTTP_400_BAD_REQUEST)
+		with mock.patch.object(CourseListCreateView, 'max_rows', 3):
+			body = self.delete({'end_date__lt': '2001-02-05', 'confirm': 'true'},
+								status.HTTP_400_BAD_REQUEST)
+			self.assertIn('More than 3', body['detail'])
+			self.delete({'end_date__lt': '2001-02-04', 'confirm': 'true'})
+		self.assertEqual(Course.objects.count(), 9)
+
+
+class ArchiveTest(APITestCase):
+	def setUp(self) -> None:
+		courses = [Course(name='Old python %d' % i, start_date='2000-01-01',
+							end_date='2000-02-%02d' % (i + 1), lectures_num=i)
+					for i in range(5)]
+		courses += [Course(name='New python %d' % i, start_date='2000-01-01',
+							end_date='2099-01-01', lectures_num=i)
+					for i in range(3)]
+		Course.objects.bulk_create(courses)
+		self.old = list(Course.objects.filter(end_date__lt='2001-01-01')
+						.values_list('pk', 'updated_at'))
+
+	def archive(self, **options):
+		out = io.StringIO()
+		call_command('archive_courses', stdout=out, **options)
+		return out.getvalue()
+
+	def get_ids(self, name, params, **kwargs):
+		response = self.client.get(reverse(name), params, **kwargs)
+		self.assertEqual(response.status_code, status.HTTP_200_OK)
+		return [course['id'] for course in json.loads(response.content)['results']]
+
+	def test_command(self):
+		self.assertIn('Archived 5 courses', self.archive(batch_size=2))
+		self.assertEqual(Course.objects.count(), 3)
+		self.assertEqual(list(ArchivedCourse.objects.values_list(
+			'pk', 'updated_at')), self.old)
+		self.assertEqual(CourseChange.objects.filter(action='delete').count(), 5)
+		self.assertIn('Archived 0 courses', self.archive())
+		# Ids aren't reused by new courses
+		Course.objects.filter(end_date__gt='2001-01-01').delete()
+		course = Course.objects.create(name='Next', start_date='2099-01-01',
+										end_date='2099-02-01', lectures_num=1)
+		self.assertGreater(course.pk, max(pk for pk, _ in self.old))
+		with self.assertRaises(CommandError):
+			self.archive(days=-1)
+
+	def test_list(self):
+		self.archive()
+		old = [pk for pk, _ in self.old]
+		everything = sorted(old + list(Course.objects.values_list('pk',
+																	flat=True)))
+		for name in ('pure-course-list', 'course-list'):
+			with self.subTest(name):
+				self.assertEqual(self.get_ids(name, {}), everything[5:])
+				archived = {'include_archived': '1'}
+				self.assertEqual(self.get_ids(name, archived), everything)
+				self.assertEqual(self.get_ids(name, dict(
+					archived, end_date__lt='2000-02-03')), old[:2])
+				self.assertEqual(self.get_ids(name, dict(
+					archived, search='old pyth')), old)
+				self.assertEqual(self.get_ids(name, dict(
+					archived, ordering='-id', cursor='')), everything[::-1])
+				response = self.client.get(reverse(name), archived)
+				self.assertEqual(json.loads(response.content)['count'], 8)
+
+	def test_detail(self):
+		pk = self.old[0][0]
+		urls = [reverse(name, kwargs={'pk': pk})
+				for name in ('pure-course-detail', 'course-detail')]
+		etags = [self.client.get(url)['ETag'] for url in urls]
+		self.archive()
+		for url, etag in zip(urls, etags):
+			with self.subTest(url):
+				response = self.client.get(url)
+				self.assertEqual(response.status_code, status.HTTP_200_OK)
+				self.assertEqual(json.loads(response.content)['name'],
+								'Old python 0')
+				# Same version, so clients' copies stay fresh
+				self.assertEqual(response['ETag'], etag)
+				# Archived courses are read-only
+				self.assertEqual(self.client.delete(url).status_code,
+								status.HTTP_404_NOT_FOUND)
+		self.assertTrue(CourseRecord.objects.filter(pk=pk).exists())
+
+
+class StatsTest(APITestCase):
+	def setUp(self) -> None:
+		# On the test thread, inside the test transaction
+		patcher = mock.patch.dict(PURE_REST['ASYNC'], {'MAX_WORKERS': None})
+		patcher.start()
+		self.addCleanup(patcher.stop)
+
+	def create(self, name, start_date, end_date, lectures_num):
+		course = {'name': name, 'start_date': start_date, 'end_date': end_date,
+					'lectures_num': lectures_num}
+		response = self.client.post(reverse('pure-course-list'), course,
+									format='json')
+		self.assertEqual(response.status_code, status.HTTP_200_OK)
+		return json.loads(response.content)['id']
+
+	def get_stats(self, params=None):
+		response = self.client.get(reverse('pure-course-stats'), params or {})
+		self.assertEqual(response.status_code, status.HTTP_200_OK)
+		return json.loads(response.content)
+
+	def get_summary(self):
+		return list(CourseMonthStats.objects.filter(courses__gt=0)
+					.values_list('month', 'courses', 'lectures', 'duration_days'))
+
+	def test_writes(self):
+		pks = [self.create('Jan', '2020-01-05', '2020-01-15', 4),
+				self.create('Jan', '2020-01-20', '2020-02-09', 6),
+				self.create('Feb', '2020-02-01', '2020-03-02', 8)]
+		self.assertEqual(self.get_summary(), [
+			(datetime.date(2020, 1, 1), 2, 10, 30),
+			(datetime.date(2020, 2, 1), 1, 8, 30)])
+		writes = [
+			('patch', 'pure-course-detail', {'start_date': '2019-12-31'}),
+			('post', 'pure-course-detail', {
+				'name': 'Jan', 'start_date': '2020-01-05',
+				'end_date': '2020-01-25', 'lectures_num': 5}),
+			('put', 'course-detail', {
+				'name': 'Feb', 'start_date': '2020-02-01',
+				'end_date': '2020-02-11', 'lectures_num': 2}),
+		]
+		for (method, name, data), pk in zip(writes, pks):
+			response = getattr(self.client, method)(
+				reverse(name, kwargs={'pk': pk}), data, format='json')
+			self.assertEqual(response.status_code, status.HTTP_200_OK)
+		self.assertEqual(self.get_summary(), [
+			(datetime.date(2019, 12, 1), 1, 4, 15),
+			(datetime.date(2020, 1, 1), 1, 5, 20),
+			(datetime.date(2020, 2, 1), 1, 2, 10)])
+
+		# Archived courses are counted as well
+		summary = self.get_summary()
+		call_command('archive_courses', stdout=io.StringIO())
+		self.assertEqual(Course.objects.count(), 0)
+		self.assertEqual(self.get_summary(), summary)
+
+		course = Course.objects.create(name='Mar', start_date='2020-03-01',
+										end_date='2020-03-11', lectures_num=1)
+		self.assertEqual(self.get_summary()[-1],
+						(datetime.date(2020, 3, 1), 1, 1, 10))
+		for name in ('course-detail', 'pure-async-course-detail'):
+			pk = self.create('Mar', '2020-03-01', '2020-03-11', 1)
+			response = self.client.delete(reverse(name, kwargs={'pk': pk}))
+			self.assertLess(response.status_code, 300)
+		course.delete()
+		self.assertEqual(self.get_summary(), summary)
+
+	def test_response(self):
+		self.create('Jan', '2020-01-05', '2020-01-15', 4)
+		self.create('Jan', '2020-01-20', '2020-02-09', 6)
+		self.create('Feb', '2021-02-01', '2021-03-04', 8)
+		total = {'courses': 3, 'lectures': 18, 'average_duration': 20.33}
+		with self.assertNumQueries(1):
+			self.assertEqual(self.get_stats(), {'total': total})
+		self.assertEqual(self.get_stats({'group_by': 'month'}), {
+			'total': total, 'group_by': 'month', 'results': [
+				{'month': '2020-01', 'courses': 2, 'lectures': 10,
+					'average_duration': 15.0},
+				{'month': '2021-02', 'courses': 1, 'lectures': 8,
+					'average_duration': 31.0}]})
+		self.assertEqual(self.get_stats({'group_by': 'year'})['results'], [
+			{'year': '2020', 'courses': 2, 'lectures': 10,
+				'average_duration': 15.0},
+			{'year': '2021', 'courses': 1, 'lectures': 8,
+				'average_duration': 31.0}])
+		response = self.client.get(reverse('pure-course-stats'),
+									{'group_by': 'week'})
+		self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+	def test_rebuild(self):
+		Course.objects.bulk_create([Course(
+			name='Test%d' % i, start_date='2020-0%d-01' % (i % 3 + 1),
+			end_date='2020-06-01', lectures_num=i) for i in range(9)])
+		summary = self.get_summary()
+		CourseMonthStats.objects.update(courses=0, lectures=7)
+		CourseMonthStats.objects.create(month='1999-01-01', courses=5)
+		out = io.StringIO()
+		call_command('rebuild_course_stats', stdout=out)
+		self.assertIn('3 months', out.getvalue())
+		self.assertEqual(self.get_summary(), summary)
+		self.assertEqual(summary[0], (datetime.date(2020, 1, 1), 3, 9, 152 * 3))
+
+	def test_backends(self):
+		other = mock.MagicMock(vendor='mysql', alias='other')
+		with self.assertRaises(ImproperlyConfigured):
+			get_stats_expressions(other)
+		# Other databases skip the triggers and the endpoint says so
+		with mock.patch.object(connection, 'vendor', 'mysql'):
+			ensure_stats_triggers(None, 'default', apps)
+			with self.assertRaises(CommandError):
+				call_command('rebuild_course_stats')
+			response = self.client.get(reverse('pure-course-stats'))
+		self.assertEqual(response.status_code, status.HTTP_501_NOT_IMPLEMENTED)
+		# PostgreSQL gets a trigger function per table
+		postgresql = mock.MagicMock(vendor='postgresql', alias='default')
+		postgresql.ops.quote_name = connection.ops.quote_name
+		cursor = postgresql.cursor.return_value.__enter__.return_value
+		sources = get_stats_sources(apps)
+		install_summary_triggers(postgresql, CourseMonthStats, sources,
+									*get_stats_expressions(postgresql))
+		statements = [call.args[0] for call in cursor.execute.call_args_list]
+		self.assertEqual(len(statements), 3 * len(sources))
+		self.assertIn("date_trunc('month', new.start_date)::date", statements[0])
+		self.assertIn('AFTER INSERT OR UPDATE OR DELETE ON "courses_course"',
+						statements[2])
+
+
+@skipUnless(os.environ.get('POSTGRESQL_TEST_NAME'),
+			'set POSTGRESQL_TEST_NAME (and _USER, _PASSWORD, _HOST, _PORT) to a '
+			'scratch PostgreSQL database')
+class StatsPostgreSQLTest(APITestCase):
+	"""
+	Runs the summary triggers on a real PostgreSQL database. The tables are
+	created in a transaction that is rolled back, so nothing is left behind
+	"""
+	alias = 'postgresql'
+
+	def setUp(self) -> None:
+		try:
+			import psycopg2  # noqa: F401
+		except ImportError:
+			self.skipTest('psycopg2 is not installed')
+		settings_dict = {'ENGINE': 'django.db.backends.postgresql'}
+		for name in ('NAME', 'USER', 'PASSWORD', 'HOST', 'PORT'):
+			settings_dict[name] = os.environ.get('POSTGRESQL_TEST_' + name, '')
+		patcher = mock.patch.dict(connections.databases,
+									{self.alias: settings_dict})
+		patcher.start()
+		self.addCleanup(patcher.stop)
+		self.addCleanup(self.close)
+		self.connection = connections[self.alias]
+		try:
+			self.connection.ensure_connection()
+		except DatabaseError as e:
+			self.skipTest('PostgreSQL is not available: %s' % e)
+
+	def close(self):
+		connections[self.alias].close()
+		del connections[self.alias]
+
+	def get_summary(self):
+		return list(CourseMonthStats.objects.using(self.alias).filter(
+			courses__gt=0).values_list('month', 'courses', 'lectures',
+										'duration_days'))
+
+	def test_triggers(self):
+		courses = Course.objects.using(self.alias)
+		sources = [Course, ArchivedCourse]
+		expressions = get_stats_expressions(self.connection)
+		with transaction.atomic(using=self.alias):
+			with self.connection.schema_editor() as editor:
+				for model in (Course, ArchivedCourse, CourseMonthStats):
+					editor.create_model(model)
+			install_summary_triggers(self.connection, CourseMonthStats, sources,
+										*expressions)
+			courses.bulk_create([
+				Course(name='Jan', start_date='2020-01-05',
+						end_date='2020-01-15', lectures_num=4),
+				Course(name='Jan', start_date='2020-01-20',
+						end_date='2020-02-09', lectures_num=6),
+				Course(name='Feb', start_date='2021-02-01',
+						end_date='2021-03-04', lectures_num=8)])
+			january, february = datetime.date(2020, 1, 1), datetime.date(2021, 2, 1)
+			self.assertEqual(self.get_summary(), [(january, 2, 10, 30),
+													(february, 1, 8, 31)])
+			courses.filter(lectures_num=6).update(start_date='2021-02-09',
+												end_date='2021-02-19')
+			courses.filter(lectures_num=4).delete()
+			ArchivedCourse.objects.using(self.alias).create(
+				id=100, name='Old', start_date='2020-01-01',
+				end_date='2020-01-03', lectures_num=1, updated_at=timezone.now())
+			summary = [(january, 1, 1, 2), (february, 2, 14, 41)]
+			self.assertEqual(self.get_summary(), summary)
+
+			CourseMonthStats.objects.using(self.alias).update(courses=7)
+			months = rebuild_summary(CourseMonthStats, sources, *expressions,
+										self.alias)
+			self.assertEqual(months, 2)
+			self.assertEqual(self.get_summary(), summary)
+			uninstall_summary_triggers(self.connection, CourseMonthStats, sources)
+			courses.filter(lectures_num=8).delete()
+			self.assertEqual(self.get_summary(), summary)
+			transaction.set_rollback(True, using=self.alias)
@@ -1,9 +1,25 @@
 from django.urls import path
-from .views import CourseListCreateView, CourseModelView
+from .views import (AsyncCourseListCreateView, AsyncCourseModelView,
+					CourseBulkView, CourseChangeFeedView, CourseExportView,
+					CourseListCreateView, CourseModelView, CourseStatsView)
 
 
 urlpatterns = [
 	path('courses/', CourseListCreateView.as_view(), name='pure-course-list'),
 	path('courses/<int:pk>/', CourseModelView.as_view(),
 			name='pure-course-detail'),
+	path('courses/bulk/', CourseBulkView.as_view(), name='pure-course-bulk'),
+	path('courses/export/', CourseExportView.as_view(),
+			name='pure-course-export'),
+	path('courses/changes/', CourseChangeFeedView.as_view(),
+			name='pure-course-changes'),
+	path('courses/stats/', CourseStatsView.as_view(), name='pure-course-stats'),
+]
+
+# Async variants of the list and the detail views, for ASGI servers
+async_urlpatterns = [
+	path('courses/', AsyncCourseListCreateView.as_view(),
+			name='pure-async-course-list'),
+	path('courses/<int:pk>/', AsyncCourseModelView.as_view(),
+			name='pure-async-course-detail'),
 ]
@@ -1,25 +1,405 @@
-from rest_framework import viewsets
-from .serializers import CourseSerializer
-from .models import Course
-from views.json import JsonModelView, JsonListCreateView
+from collections import OrderedDict
 
+from django.conf import settings
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import transaction
+from django.http import Http404
+from django.utils.cache import patch_vary_headers
+from rest_framework import status, viewsets
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+from .filters import CourseFilterSet, CourseRecordFilterSet
+from .renderers import get_columnar_renderers
+from .serializers import CourseSerializer, get_row_serializer
+from .models import (Course, CourseChange, CourseMonthStats, CourseRecord,
+						get_dates_condition)
+from views.asynchronous import AsyncJsonListCreateView, AsyncJsonModelView
+from views.bulk import create_objects, delete_objects, update_objects
+from views.changes import ChangeFeedView
+from views.conditional import (get_list_validators, get_not_modified_response,
+								get_object_validators, get_rows_validators,
+								set_validators)
+from views.export import ExportView
+from views.filters import FieldsFilter, IntervalFilter, SearchFilter
+from views.formats import to_columns
+from views.instrumentation import get_metrics
+from views.json import (JsonBulkView, JsonModelView, JsonListCreateView,
+						parse_fields, parse_ids)
+from views.routing import ReplicaReadMixin
+from views.signals import objects_written
+from views.stats import SummaryView
 
-class CourseViewSet(viewsets.ModelViewSet):
+
+class CourseViewSet(ReplicaReadMixin, viewsets.ModelViewSet):
 	queryset = Course.objects.all()
 	serializer_class = CourseSerializer
 	search_fields = ['name']
 	ordering_fields = '__all__'
-	filterset_fields = {'start_date': ['gte', 'lte', 'exact', 'gt', 'lt'],
-						'end_date': ['gte', 'lte', 'exact', 'gt', 'lt']}
+	last_modified_field = 'updated_at'
+	fields_query_param = 'fields'
+	ids_query_param = 'ids'
+	max_ids = settings.REST_FRAMEWORK['MULTI_GET_MAX_IDS']
+	archive_query_param = 'include_archived'
+	bulk_batch_size = settings.REST_FRAMEWORK['BULK_BATCH_SIZE']
+	bulk_max_items = settings.REST_FRAMEWORK['BULK_MAX_ITEMS']
+
+	def reads_archive(self):
+		"""
+		Whether archived courses are read too: by id always, in lists with
+		`?include_archived=1`. They are read-only
+		"""
+		if self.action == 'retrieve':
+			return True
+		value = self.request.query_params.get(self.archive_query_param, '')
+		return self.action == 'list' and value in ('1', 'true')
+
+	def get_queryset(self):
+		if self.reads_archive():
+			return CourseRecord.objects.all()
+		return super().get_queryset()
+
+	@property
+	def filterset_class(self):
+		# django-filter checks it against the model of the queryset
+		if self.reads_archive():
+			return CourseRecordFilterSet
+		return CourseFilterSet
+
+	def get_renderers(self):
+		renderers = super().get_renderers()
+		if self.action == 'list':
+			# Only lists have rows to lay out in columns
+			renderers += [renderer() for renderer in get_columnar_renderers()]
+		return renderers
+
+	def get_variant(self):
+		"""
+		Name of the columnar format the list is rendered in, None otherwise
+		"""
+		renderer = getattr(self.request, 'accepted_renderer', None)
+		response_format = getattr(renderer, 'response_format', None)
+		return response_format.name if response_format is not None else None
+
+	def get_row_serializer(self):
+		"""
+		Fast path of the serializer for reads, limited to `?fields=`
+		"""
+		return get_row_serializer(self.get_response_fields())
+
+	def get_response_fields(self):
+		"""
+		Fields picked with `?fields=` for list and retrieve, None for all
+		"""
+		request = getattr(self, 'request', None)
+		if request is None or self.action not in ('list', 'retrieve'):
+			return None
+		value = request.query_params.get(self.fields_query_param, '')
+		if not value:
+			return None
+		try:
+			return parse_fields(value, list(CourseSerializer().fields))
+		except DjangoValidationError as e:
+			raise ValidationError({self.fields_query_param: e.messages})
+
+	def filter_queryset(self, queryset):
+		with get_metrics(self.request).time('filter'):
+			return super().filter_queryset(queryset)
+
+	def get_serializer(self, *args, **kwargs):
+		kwargs.setdefault('fields', self.get_response_fields())
+		return super().get_serializer(*args, **kwargs)
+
+	def get_ids(self):
+		"""
+		Primary keys requested with `?ids=`, None without it
+		"""
+		value = self.request.query_params.get(self.ids_query_param, None)
+		if value is None:
+			return None
+		try:
+			return parse_ids(value, Course._meta.pk, self.max_ids)
+		except DjangoValidationError as e:
+			raise ValidationError({self.ids_query_param: e.messages})
+
+	def list_ids(self, request, ids):
+		"""
+		Multi-get: the objects with ids in their order, null for the missing
+		ones, read with a single query
+		"""
+		queryset = self.filter_queryset(self.get_queryset())
+		row_serializer = self.get_row_serializer()
+		rows = {row[-2]: row for row in queryset.filter(
+			pk__in=set(ids)).order_by().values_list(
+			*row_serializer.sources, 'pk', self.last_modified_field)}
+		etag, last_modified = get_rows_validators(
+			request, Course, rows, [row[-1] for row in rows.values()],
+			self.get_variant())
+		response = get_not_modified_response(request, etag, last_modified)
+		if response is None:
+			with get_metrics(request).time('serialize'):
+				response = Response(self.get_rows_data(OrderedDict([
+					('count', len(rows)),
+					('results', [rows.get(pk, None) for pk in ids]),
+					('not_found', [pk for pk in dict.fromkeys(ids)
+									if pk not in rows]),
+				])))
+		return set_validators(response, etag, last_modified)
+
+	def get_rows_data(self, data):
+		"""
+		Turns the `values_list` tuples of data's `results` (or of data, a
+		list) into the response data: columns in the columnar formats, the
+		representations of the row serializer otherwise
+		"""
+		row_serializer = self.get_row_serializer()
+		rows = data['results'] if isinstance(data, dict) else data
+		if self.get_variant() is None:
+			rows = row_serializer.to_representations(rows)
+		else:
+			# Without the columns read for validators
+			width = len(row_serializer.names)
+			rows = [row if row is None else row[:width] for row in rows]
+		if isinstance(data, dict):
+			data['results'] = rows
+		else:
+			data = rows
+		if self.get_variant() is None:
+			return data
+		return to_columns(data, row_serializer.names)
+
+	def list(self, request, *args, **kwargs):
+		ids = self.get_ids()
+		if ids is not None:
+			response = self.list_ids(request, ids)
+		else:
+			response = self.list_page(request, *args, **kwargs)
+		patch_vary_headers(response, ['Accept'])
+		return response
+
+	def list_page(self, request, *args, **kwargs):
+		queryset = self.filter_queryset(self.get_queryset())
+		window, total = queryset, None
+		if self.paginator is not None:
+			window, total = self.paginator.get_page_queryset(queryset, request)
+		etag, last_modified = get_list_validators(
+			request, window, self.last_modified_field, total,
+			self.get_variant())
+		response = get_not_modified_response(request, etag, last_modified)
+		if response is None:
+			# Paging and serializer work, the JSON is rendered after the view
+			with get_metrics(request).time('serialize'):
+				response = self.list_rows(request, queryset)
+		return set_validators(response, etag, last_modified)
+
+	def list_rows(self, request, queryset):
+		"""
+		`list` of the filtered queryset reading the page as `values_list`
+		tuples instead of objects, see `get_rows_data`
+		"""
+		sources = self.get_row_serializer().sources
+		rows = None
+		if self.paginator is not None:
+			rows = self.paginator.paginate_rows(queryset, request, sources)
+		if rows is None:
+			return Response(self.get_rows_data(
+				list(queryset.values_list(*sources))))
+		return Response(self.get_rows_data(
+			self.paginator.get_paginated_response(rows).data))
+
+	def retrieve(self, request, *args, **kwargs):
+		etag, last_modified = get_object_validators(
+			request, self.get_queryset(), self.kwargs[self.lookup_field],
+			self.last_modified_field)
+		response = None
+		if etag is not None:
+			response = get_not_modified_response(request, etag, last_modified)
+		if response is None:
+			with get_metrics(request).time('serialize'):
+				response = self.retrieve_row(request)
+		return set_validators(response, etag, last_modified)
+
+	def retrieve_row(self, request):
+		"""
+		`retrieve` reading the object as a `values_list` tuple, represented
+		by the row serializer
+		"""
+		row_serializer = self.get_row_serializer()
+		lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+		queryset = self.filter_queryset(self.get_queryset()).order_by()
+		try:
+			rows = list(queryset.filter(**{
+				self.lookup_field: self.kwargs[lookup_url_kwarg]
+			}).values_list(*row_serializer.sources)[:1])
+		except (TypeError, ValueError, DjangoValidationError):
+			rows = []
+		if not rows:
+			raise Http404
+		return Response(row_serializer.to_representation(rows[0]))
+
+	def get_bulk_items(self, request):
+		items = request.data
+		if not isinstance(items, list):
+			raise ValidationError('Expected a list')
+		if len(items) > self.bulk_max_items:
+			raise ValidationError('Too many objects, the limit is %d'
+									% self.bulk_max_items)
+		return items
+
+	def get_bulk_pks(self, items):
+		pks = []
+		for item in items:
+			try:
+				pks.append(Course._meta.pk.to_python(item))
+			except (DjangoValidationError, TypeError):
+				pks.append(None)
+		return pks
+
+	@action(detail=False, methods=['post', 'put', 'delete'])
+	def bulk(self, request):
+		"""
+		POST creates, PUT updates (items must contain `id`) and DELETE deletes
+		(items are ids) a list of courses in one transaction. Nothing is
+		written if any item is invalid, the errors are listed per item
+		"""
+		items = self.get_bulk_items(request)
+		with transaction.atomic():
+			if request.method == 'POST':
+				return self.bulk_create(items)
+			if request.method == 'PUT':
+				return self.bulk_update(items)
+			return self.bulk_destroy(items)
+
+	def bulk_create(self, items):
+		serializer = self.get_serializer(data=items, many=True)
+		serializer.is_valid(raise_exception=True)
+		courses = create_objects(Course, [
+			Course(**data) for data in serializer.validated_data
+		], self.bulk_batch_size)
+		return Response(self.get_serializer(courses, many=True).data,
+						status=status.HTTP_201_CREATED)
+
+	def bulk_update(self, items):
+		pks = self.get_bulk_pks([item.get('id', None) if isinstance(item, dict)
+									else None for item in items])
+		courses = Course.objects.select_for_update().in_bulk(
+			[pk for pk in pks if pk is not None])
+		serializers, errors, seen = [], [], set()
+		for pk, item in zip(pks, items):
+			if pk not in courses or pk in seen:
+				message = 'Not found' if pk not in courses else 'Duplicate'
+				errors.append({'id': [message]})
+				continue
+			seen.add(pk)
+			serializer = self.get_serializer(courses[pk], data=item)
+			errors.append({} if serializer.is_valid() else serializer.errors)
+			serializers.append(serializer)
+		if any(errors):
+			raise ValidationError(errors)
+
+		for serializer in serializers:
+			for name, value in serializer.validated_data.items():
+				setattr(serializer.instance, name, value)
+		fields = [name for name, field in self.get_serializer().fields.items()
+					if not field.read_only]
+		update_objects(Course, [serializer.instance
+								for serializer in serializers],
+						fields, self.bulk_batch_size)
+		return Response([serializer.data for serializer in serializers])
+
+	def bulk_destroy(self, items):
+		pks = self.get_bulk_pks(items)
+		existing = set(Course.objects.filter(
+			pk__in=[pk for pk in pks if pk is not None]
+		).values_list('pk', flat=True))
+		errors = [{} if pk in existing else {'id': ['Not found']}
+					for pk in pks]
+		if any(errors):
+			raise ValidationError(errors)
+		delete_objects(Course, existing, self.bulk_batch_size)
+		return Response(status=status.HTTP_204_NO_CONTENT)
+
+	def perform_create(self, serializer):
+		with transaction.atomic(savepoint=False):
+			super().perform_create(serializer)
+			objects_written.send(sender=Course, action='create',
+								pks=[serializer.instance.pk])
+
+	def perform_update(self, serializer):
+		with transaction.atomic(savepoint=False):
+			super().perform_update(serializer)
+			objects_written.send(sender=Course, action='update',
+								pks=[serializer.instance.pk])
+
+	def perform_destroy(self, instance):
+		pk = instance.pk
+		with transaction.atomic(savepoint=False):
+			super().perform_destroy(instance)
+			objects_written.send(sender=Course, action='delete', pks=[pk])
 
 
 class CourseModelView(JsonModelView):
 	model = Course
+	union_model = CourseRecord
 	fields = '__all__'
+	last_modified_field = 'updated_at'
+
+	def get_update_condition(self, changes):
+		return get_dates_condition(changes.get('start_date', None),
+									changes.get('end_date', None))
 
 
 class CourseListCreateView(JsonListCreateView):
 	model = Course
+	union_model = CourseRecord
 	fields = '__all__'
 	search_fields = ['name']
 	filter_fields = ['start_date', 'end_date']
+	interval_fields = ('start_date', 'end_date')
+	last_modified_field = 'updated_at'
+
+
+class AsyncCourseModelView(AsyncJsonModelView, CourseModelView):
+	"""
+	CourseModelView for ASGI servers
+	"""
+
+
+class AsyncCourseListCreateView(AsyncJsonListCreateView, CourseListCreateView):
+	"""
+	CourseListCreateView for ASGI servers
+	"""
+
+
+class CourseBulkView(JsonBulkView):
+	model = Course
+	fields = '__all__'
+
+
+class CourseExportView(FieldsFilter, IntervalFilter, SearchFilter, ExportView):
+	model = Course
+	search_fields = ['name']
+	filter_fields = ['start_date', 'end_date']
+	interval_fields = ('start_date', 'end_date')
+
+
+class CourseChangeFeedView(ChangeFeedView):
+	log_model = CourseChange
+
+
+class CourseStatsView(SummaryView):
+	"""
+	Courses starting, their lectures and average duration in days, in total
+	and by month or year of start
+	"""
+	summary_model = CourseMonthStats
+	groups = {
+		'month': lambda month: month.strftime('%Y-%m'),
+		'year': lambda month: str(month.year),
+	}
+
+	def get_values(self, sums):
+		courses = sums['courses']
+		duration = round(sums['duration_days'] / courses, 2) if courses else None
+		return {'courses': courses, 'lectures': sums['lectures'],
+				'average_duration': duration}
@@ -0,0 +1,108 @@
+import sys
+
+from django.db import connections, models, router, transaction
+from django.views.generic.list import MultipleObjectMixin
+
+from views.routing import SAFE_METHODS
+from views.signals import objects_written
+
+
+class ArchiveKeyField(models.BigIntegerField):
+	"""
+	Primary key of archive tables, which keep the keys of the moved objects:
+	declared `integer` on SQLite, so it's the rowid of the table like the
+	keys of auto fields are, instead of a column with an index of its own
+	"""
+	def db_type(self, connection):
+		if connection.vendor == 'sqlite':
+			return 'integer'
+		return super().db_type(connection)
+
+
+class UnionQuerySet(models.QuerySet):
+	"""
+	QuerySet of a model backed by a database view over the union of the
+	tables of its `union_of` models, counted so that every table is counted
+	from its indexes: unfiltered counts add up the counts of the tables in
+	a single query, filtered ones count a subquery, whose filters (unlike
+	those of an aggregate over the view) SQLite pushes into every table
+	"""
+	def count(self):
+		query = self.query
+		combined = query.is_sliced or query.distinct or query.combinator
+		if self._result_cache is not None or combined:
+			return super().count()
+		if query.where or query.extra_tables:
+			return self.order_by().values('pk')[:sys.maxsize].count()
+		qn = connections[self.db].ops.quote_name
+		sql = ' + '.join('(SELECT COUNT(*) FROM %s)' % qn(part._meta.db_table)
+							for part in self.model.union_of)
+		with connections[self.db].cursor() as cursor:
+			cursor.execute('SELECT ' + sql)
+			return cursor.fetchone()[0]
+
+
+def archive_objects(queryset, archive_model, batch_size):
+	"""
+	Moves the objects of queryset to archive_model, a table with the same
+	fields, batch_size objects at a time: each batch is copied and deleted
+	in its own transaction, so writers wait for one batch at most. Objects
+	keep their primary keys and field values, auto timestamps included.
+	Returns the number of moved objects
+	"""
+	model = queryset.model
+	names = [field.attname for field in model._meta.concrete_fields]
+	pk_index = names.index(model._meta.pk.attname)
+	using = router.db_for_write(model)
+	moved = 0
+	while True:
+		with transaction.atomic(using=using):
+			rows = list(queryset.using(using).order_by('pk')
+						.values_list(*names)[:batch_size])
+			pks = [row[pk_index] for row in rows]
+			if pks:
+				archive_model._base_manager.using(using).bulk_create([
+					archive_model(**dict(zip(names, row))) for row in rows])
+				model._base_manager.using(using).filter(pk__in=pks).delete()
+				# Gone from the live table, so its caches, counts and change
+				# log see a delete
+				objects_written.send(sender=model, action='delete', pks=pks)
+		moved += len(pks)
+		if len(pks) < batch_size:
+			return moved
+
+
+class ArchiveListMixin(MultipleObjectMixin):
+	"""
+	Mixin for lists of models with an archive: `?include_archived=1` reads
+	GET requests from `union_model`, the view of the live and archived
+	objects, with the same filters, search, ordering and pagination. Lists
+	read the live objects only otherwise. Disabled unless `union_model` is
+	set
+	"""
+	union_model = None
+	archive_query_param = 'include_archived'
+
+	def include_archived(self):
+		value = self.request.GET.get(self.archive_query_param, '')
+		return self.union_model is not None and value in ('1', 'true') and \
+			self.request.method in SAFE_METHODS
+
+	def get_queryset(self):
+		if self.include_archived():
+			return self.union_model._default_manager.all()
+		return super().get_queryset()
+
+
+class ArchiveDetailMixin:
+	"""
+	Mixin for detail views of models with an archive: GET requests look
+	objects up in `union_model`, so archived ones are found by id as well.
+	Writes only see the live objects, archived ones are read-only
+	"""
+	union_model = None
+
+	def get_queryset(self):
+		if self.union_model is not None and self.request.method in SAFE_METHODS:
+			return self.union_model._default_manager.all()
+		return super().get_queryset()
@@ -0,0 +1,247 @@
+import asyncio
+import concurrent.futures
+import functools
+import threading
+
+from asgiref.sync import sync_to_async
+from django.db import close_old_connections
+from django.http import HttpResponse, JsonResponse
+from django.utils.decorators import classonlymethod
+
+from course_catalogue.settings import PURE_REST
+from views.instrumentation import instrument_connections
+from views.json import (JsonCreateView, JsonDeleteView, JsonDetailView,
+						JsonListCreateView, JsonListView, JsonModelView,
+						JsonUpdateView, get_field_names, get_json_backend,
+						get_row_encoder)
+
+
+class ExecutorSaturated(Exception):
+	"""
+	Raised when the database executor has no room for another task
+	"""
+
+
+class DatabaseExecutor:
+	"""
+	Runs the database work of async views on its own pool of `max_workers`
+	threads (so at most that many connections), with at most `max_queue`
+	tasks waiting for a thread. Further tasks are rejected with
+	ExecutorSaturated instead of queueing without bound.
+	Without max_workers the work runs where Django runs sync views, on the
+	thread shared by them, still bounded by max_queue
+	"""
+	def __init__(self, max_workers, max_queue):
+		self.max_workers = max_workers
+		self.max_queue = max_queue
+		self.executor = None
+		if max_workers:
+			self.executor = concurrent.futures.ThreadPoolExecutor(
+				max_workers, thread_name_prefix='db')
+		# Running and waiting tasks
+		self.slots = threading.Semaphore((max_workers or 1) + max_queue)
+
+	@staticmethod
+	def call(func, *args, **kwargs):
+		# Pool threads get no request signals, so connections are checked
+		# here like Django does around every request
+		close_old_connections()
+		try:
+			return func(*args, **kwargs)
+		finally:
+			close_old_connections()
+
+	async def run(self, func, *args, **kwargs):
+		if not self.slots.acquire(blocking=False):
+			raise ExecutorSaturated
+		if self.executor is None:
+			try:
+				return await sync_to_async(func)(*args, **kwargs)
+			finally:
+				self.slots.release()
+		try:
+			future = self.executor.submit(self.call, func, *args, **kwargs)
+		except BaseException:
+			self.slots.release()
+			raise
+		# Released when the task is done, even if the request is cancelled
+		future.add_done_callback(lambda future: self.slots.release())
+		return await asyncio.wrap_future(future)
+
+	def shutdown(self):
+		if self.executor is not None:
+			self.executor.shutdown(wait=True)
+
+
+_executors = {}
+
+
+def get_executor():
+	"""
+	Returns the executor configured by PURE_REST['ASYNC'], shared by all the
+	async views
+	"""
+	config = PURE_REST['ASYNC']
+	key = (config.get('MAX_WORKERS', 8), config.get('MAX_QUEUE', 64))
+	if key not in _executors:
+		_executors[key] = DatabaseExecutor(*key)
+	return _executors[key]
+
+
+class PendingRows:
+	"""
+	Rows read from the database, encoded with encode once the response is
+	rendered
+	"""
+	def __init__(self, encode, rows):
+		self.encode = encode
+		self.rows = rows
+
+	def resolve(self):
+		return self.encode(self.rows)
+
+
+class DeferredJsonResponse(HttpResponse):
+	"""
+	JSON response encoded when it's rendered, after the view returned, like
+	a TemplateResponse. Values of data (or data itself) may be PendingRows.
+	dumps replaces the JSON backend, e.g. for compact formats
+	"""
+	def __init__(self, data, dumps=None, **kwargs):
+		kwargs.setdefault('content_type', 'application/json')
+		super().__init__(**kwargs)
+		self.data = data
+		self.dumps = dumps
+		self.is_rendered = False
+		self._post_render_callbacks = []
+
+	def __getstate__(self):
+		# Pickled (e.g. by caches) without the data it was rendered from
+		state = self.__dict__.copy()
+		state.update(data=None, dumps=None, _post_render_callbacks=[])
+		return state
+
+	def add_post_render_callback(self, callback):
+		if self.is_rendered:
+			callback(self)
+		else:
+			self._post_render_callbacks.append(callback)
+
+	def get_data(self):
+		data = self.data
+		if isinstance(data, PendingRows):
+			return data.resolve()
+		if isinstance(data, dict):
+			return {key: value.resolve() if isinstance(value, PendingRows)
+					else value for key, value in data.items()}
+		return data
+
+	def render(self):
+		if self.is_rendered:
+			return self
+		dumps = self.dumps or get_json_backend().dumps
+		self.content = dumps(self.get_data())
+		self.is_rendered = True
+		for callback in self._post_render_callbacks:
+			callback(self)
+		return self
+
+
+class AsyncJsonMixin:
+	"""
+	Turns a JSON view into an async one: the view runs on the database
+	executor (see `DatabaseExecutor`) and its response is encoded by the
+	handler once it's returned, outside the database threads. A saturated
+	executor is answered with 503 Service Unavailable and `Retry-After`
+	"""
+	@classonlymethod
+	def as_view(cls, **initkwargs):
+		view = super().as_view(**initkwargs)
+
+		def run(request, *args, **kwargs):
+			with instrument_connections(request):
+				return view(request, *args, **kwargs)
+
+		async def async_view(request, *args, **kwargs):
+			try:
+				return await get_executor().run(run, request, *args, **kwargs)
+			except ExecutorSaturated:
+				response = JsonResponse({'detail': 'Server is busy, try again '
+											'later'}, status=503)
+				response['Retry-After'] = str(PURE_REST['ASYNC']['RETRY_AFTER'])
+				return response
+
+		functools.update_wrapper(async_view, view)
+		return async_view
+
+	def render_to_response(self, context, **response_kwargs):
+		return DeferredJsonResponse(self.get_paginated_data(context),
+									**response_kwargs)
+
+	def render_object(self, obj):
+		encoder = get_row_encoder(obj.__class__, get_field_names(obj.__class__))
+		return DeferredJsonResponse(
+			PendingRows(encoder.encode_row, encoder.get_row(obj)))
+
+
+class AsyncJsonListView(AsyncJsonMixin, JsonListView):
+	"""
+	JsonListView running on the database executor
+	"""
+	def get_data(self, context, rows=None):
+		if self.response_format is not None:
+			return super().get_data(context, rows)
+		model = context['object_list'].model
+		fields = self.get_response_fields()
+		if rows is None:
+			rows = context['object_list'].values_list(*fields)
+		return PendingRows(get_row_encoder(model, fields).encode_rows,
+							list(rows))
+
+	def render_to_response(self, context, **response_kwargs):
+		if self.response_format is None:
+			return super().render_to_response(context, **response_kwargs)
+		return DeferredJsonResponse(
+			self.get_columnar_data(context), dumps=self.response_format.dumps,
+			content_type=self.response_format.media_type, **response_kwargs)
+
+
+class AsyncJsonDetailView(AsyncJsonMixin, JsonDetailView):
+	"""
+	JsonDetailView running on the database executor
+	"""
+	def get_data(self, context):
+		encoder = get_row_encoder(context['object'].__class__,
+									self.get_response_fields())
+		return PendingRows(encoder.encode_row,
+							encoder.get_row(context['object']))
+
+
+class AsyncJsonCreateView(AsyncJsonMixin, JsonCreateView):
+	"""
+	JsonCreateView running on the database executor
+	"""
+
+
+class AsyncJsonUpdateView(AsyncJsonMixin, JsonUpdateView):
+	"""
+	JsonUpdateView running on the database executor
+	"""
+
+
+class AsyncJsonDeleteView(AsyncJsonMixin, JsonDeleteView):
+	"""
+	JsonDeleteView running on the database executor
+	"""
+
+
+class AsyncJsonModelView(AsyncJsonDetailView, JsonModelView):
+	"""
+	JsonModelView running on the database executor
+	"""
+
+
+class AsyncJsonListCreateView(AsyncJsonListView, JsonListCreateView):
+	"""
+	JsonListCreateView running on the database executor
+	"""
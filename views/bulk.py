@@ -0,0 +1,113 @@
+import functools
+
+from django.db import connections, router
+from django.utils import timezone
+
+from views.signals import objects_written
+
+
+def chunks(items, size):
+	for start in range(0, len(items), size):
+		yield items[start:start + size]
+
+
+def create_objects(model, objs, batch_size):
+	"""
+	Inserts objs with one multi-row INSERT per batch and sets their primary
+	keys. Call it inside a transaction
+	"""
+	using = router.db_for_write(model)
+	connection = connections[using]
+	fields = [field for field in model._meta.concrete_fields
+				if not field.primary_key]
+	# Backends that can't return rows from a bulk insert get one statement
+	# per batch, so the keys can be read back from the last inserted row
+	max_batch_size = connection.ops.bulk_batch_size(fields, objs)
+	batch_size = min(batch_size, max_batch_size or batch_size)
+	for batch in chunks(objs, batch_size):
+		model._base_manager.using(using).bulk_create(batch)
+		if batch[0].pk is None and connection.vendor == 'sqlite':
+			with connection.cursor() as cursor:
+				cursor.execute('SELECT last_insert_rowid()')
+				last = cursor.fetchone()[0]
+			# Rows of a single INSERT get consecutive rowids
+			for pk, obj in zip(range(last - len(batch) + 1, last + 1), batch):
+				obj.pk = pk
+	objects_written.send(sender=model, action='create',
+						pks=[obj.pk for obj in objs])
+	return objs
+
+
+def insert_rows(model, fields, rows):
+	"""
+	Inserts rows (tuples of clean values of fields) with one prepared
+	statement run for all of them, skipping model instances and the SQL
+	compiler, and returns their primary keys. Auto timestamps are set to now.
+	Call it inside a transaction
+	"""
+	using = router.db_for_write(model)
+	connection = connections[using]
+	if connection.vendor != 'sqlite':
+		objs = [model(**dict(zip(fields, row))) for row in rows]
+		return [obj.pk for obj in create_objects(model, objs, len(objs))]
+
+	columns = [model._meta.get_field(name) for name in fields]
+	# The values are clean already, only database adaptation is left
+	prepare = [functools.partial(field.get_db_prep_value, connection=connection,
+								prepared=True) for field in columns]
+	now = timezone.now()
+	timestamps = [field for field in model._meta.concrete_fields
+					if any(getattr(field, name, False)
+							for name in ('auto_now', 'auto_now_add'))]
+	extra = tuple(field.get_db_prep_save(now, connection)
+					for field in timestamps)
+	qn = connection.ops.quote_name
+	sql = 'INSERT INTO %s (%s) VALUES (%s)' % (
+		qn(model._meta.db_table),
+		', '.join(qn(field.column) for field in columns + timestamps),
+		', '.join(['%s'] * (len(columns) + len(timestamps))))
+
+	def get_params(row):
+		return tuple(prep(value) for prep, value in zip(prepare, row)) + extra
+
+	with connection.cursor() as cursor:
+		cursor.executemany(sql, [get_params(row) for row in rows])
+		cursor.execute('SELECT last_insert_rowid()')
+		last = cursor.fetchone()[0]
+	# Nobody else can write until the transaction ends, so the rowids
+	# of the rows are consecutive
+	pks = list(range(last - len(rows) + 1, last + 1))
+	objects_written.send(sender=model, action='create', pks=pks)
+	return pks
+
+
+def update_objects(model, objs, fields, batch_size):
+	"""
+	Writes fields of objs with batched UPDATE statements, refreshing auto
+	timestamps `bulk_update` doesn't know about. Call it inside a transaction
+	"""
+	fields = list(fields)
+	now = timezone.now()
+	for field in model._meta.concrete_fields:
+		if getattr(field, 'auto_now', False):
+			for obj in objs:
+				setattr(obj, field.attname, now)
+			if field.name not in fields:
+				fields.append(field.name)
+	for batch in chunks(objs, batch_size):
+		model._base_manager.bulk_update(batch, fields)
+	objects_written.send(sender=model, action='update',
+						pks=[obj.pk for obj in objs])
+	return objs
+
+
+def delete_objects(model, pks, batch_size):
+	"""
+	Deletes objects by primary key, one statement per batch.
+	Call it inside a transaction
+	"""
+	deleted = 0
+	for batch in chunks(list(pks), batch_size):
+		deleted += model._base_manager.filter(pk__in=batch).delete()[0]
+	objects_written.send(sender=model, action='delete', pks=list(pks))
+	return deleted
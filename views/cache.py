@@ -0,0 +1,181 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from django.core.cache import caches
+from django.db import transaction
+from django.dispatch import receiver
+from django.http import HttpResponse
+
+from course_catalogue.settings import PURE_REST
+from views.signals import objects_written
+
+
+class LRUCache:
+	"""
+	A thread-safe in-process cache evicting the least recently used entries
+	above max_entries and entries older than timeout seconds.
+	Implements the subset of Django's cache API used by `ResponseCache`
+	"""
+	def __init__(self, max_entries=1000, timeout=300, clock=time.monotonic):
+		self.max_entries = max_entries
+		self.timeout = timeout
+		self.clock = clock
+		self._data = OrderedDict()
+		self._lock = threading.Lock()
+
+	def get(self, key, default=None):
+		with self._lock:
+			item = self._data.get(key, None)
+			if item is None:
+				return default
+			value, expires = item
+			if expires is not None and expires <= self.clock():
+				del self._data[key]
+				return default
+			self._data.move_to_end(key)
+			return value
+
+	def set(self, key, value, timeout=None):
+		timeout = self.timeout if timeout is None else timeout
+		expires = self.clock() + timeout if timeout else None
+		with self._lock:
+			self._data[key] = (value, expires)
+			self._data.move_to_end(key)
+			while len(self._data) > self.max_entries:
+				self._data.popitem(last=False)
+
+	def delete(self, key):
+		with self._lock:
+			self._data.pop(key, None)
+
+	def clear(self):
+		with self._lock:
+			self._data.clear()
+
+	def __len__(self):
+		return len(self._data)
+
+
+class ResponseCache:
+	"""
+	Caches rendered GET responses keyed on path, normalized query string and
+	the negotiated format.
+
+	Keys embed generation counters instead of being deleted one by one:
+	writing an object bumps the generation of its model's lists and of that
+	object, so only responses that could include it become unreachable
+	(and age out of the backend). Generations start from the current time,
+	so a lost counter never brings stale entries back.
+	"""
+	cached_headers = ('Content-Type', 'ETag', 'Last-Modified')
+
+	def __init__(self, backend, timeout=None):
+		self.backend = backend
+		self.timeout = timeout
+		self.hits = 0
+		self.misses = 0
+		self._lock = threading.Lock()
+
+	def get_generation(self, *parts):
+		key = 'pure-cache-gen:' + ':'.join(str(part) for part in parts)
+		generation = self.backend.get(key, None)
+		if generation is None:
+			generation = time.time_ns()
+			self.backend.set(key, generation, None)
+		return generation
+
+	def bump_generation(self, *parts):
+		key = 'pure-cache-gen:' + ':'.join(str(part) for part in parts)
+		self.backend.set(key, time.time_ns(), None)
+
+	def get_key(self, request, model, pk=None, variant=None, alias=None):
+		"""
+		Key of the response to request. Responses read from the database
+		alias (a replica, None for the default one) are kept apart, clients
+		pinned to the primary never get what a lagging replica served. So
+		are those of other hosts and schemes, lists link to their pages
+		with absolute URLs
+		"""
+		label = model._meta.label_lower
+		if pk is None:
+			generation = self.get_generation(label)
+		else:
+			generation = self.get_generation(label, pk)
+		query = sorted((name, sorted(values))
+						for name, values in request.GET.lists())
+		origin = '%s://%s' % (request.scheme, request.get_host())
+		raw = '%s|%s|%s%s|%r|%s|%s' % (label, generation, origin, request.path,
+										query, variant, alias)
+		return 'pure-cache:' + hashlib.md5(raw.encode()).hexdigest()
+
+	def get(self, key):
+		cached = self.backend.get(key, None)
+		with self._lock:
+			if cached is None:
+				self.misses += 1
+				return None
+			self.hits += 1
+		content, status, headers = cached
+		response = HttpResponse(content, status=status)
+		for name, value in headers.items():
+			response[name] = value
+		return response
+
+	def set(self, key, response):
+		headers = {name: response[name] for name in self.cached_headers
+					if response.has_header(name)}
+		self.backend.set(key, (response.content, response.status_code, headers),
+						self.timeout)
+
+	def invalidate(self, model, pks=()):
+		label = model._meta.label_lower
+		self.bump_generation(label)
+		for pk in pks:
+			self.bump_generation(label, pk)
+
+	def get_stats(self):
+		"""
+		Lookups of this process so far, reported at `/metrics`
+		"""
+		with self._lock:
+			hits, misses = self.hits, self.misses
+		total = hits + misses
+		return {'hits': hits, 'misses': misses,
+				'hit_rate': round(hits / total, 4) if total else 0.0}
+
+
+_response_caches = {}
+
+
+def get_response_cache():
+	"""
+	Returns the response cache configured by PURE_REST['RESPONSE_CACHE']
+	or None if caching is disabled
+	"""
+	config = PURE_REST.get('RESPONSE_CACHE', None) or {}
+	if not config.get('BACKEND', None):
+		return None
+	key = tuple(sorted(config.items()))
+	if key not in _response_caches:
+		timeout = config.get('TIMEOUT', 60)
+		if config['BACKEND'] == 'locmem':
+			backend = LRUCache(config.get('MAX_ENTRIES', 1000), timeout)
+		else:
+			# Any cache alias from settings.CACHES (file, database, ...)
+			backend = caches[config['BACKEND']]
+		_response_caches[key] = ResponseCache(backend, timeout)
+	return _response_caches[key]
+
+
+@receiver(objects_written)
+def invalidate_response_cache(sender, action, pks, **kwargs):
+	cache = get_response_cache()
+	if cache is None:
+		return
+	pks = pks if action != 'create' else ()
+	cache.invalidate(sender, pks)
+	# Once more after commit, so readers can't cache the data they could
+	# still see before it
+	transaction.on_commit(lambda: cache.invalidate(sender, pks))
@@ -0,0 +1,147 @@
+import zlib
+
+from django.core.exceptions import ValidationError
+from django.db import connections, models, router, transaction
+from django.db.models import Max, OuterRef, Subquery
+from django.http import JsonResponse
+from django.utils import timezone
+from django.views import View
+
+from course_catalogue.settings import PURE_REST
+from views.bulk import chunks
+from views.routing import ReplicaReadMixin
+
+
+class ChangeLogEntry(models.Model):
+	"""
+	Abstract append-only log of the writes to a model: every created,
+	updated or deleted object gets an entry with a sequence number growing
+	with every write. Compaction (see `compact_changes`) leaves a `compact`
+	entry marking the sequence the log has been truncated at
+	"""
+	CREATE, UPDATE, DELETE, COMPACT = 'create', 'update', 'delete', 'compact'
+	ACTIONS = [(CREATE, 'create'), (UPDATE, 'update'), (DELETE, 'delete'),
+				(COMPACT, 'compact')]
+
+	seq = models.BigAutoField(primary_key=True, verbose_name='sequence')
+	# Primary key of the written object, null for compaction marks
+	object_id = models.BigIntegerField(null=True, verbose_name='object id')
+	action = models.CharField(max_length=8, choices=ACTIONS,
+								verbose_name='action')
+	changed_at = models.DateTimeField(default=timezone.now,
+										verbose_name='date of change')
+
+	class Meta:
+		abstract = True
+		ordering = ['seq']
+		indexes = [
+			# The latest entry of an object, for compaction
+			models.Index(fields=['object_id', 'seq'],
+						name='%(app_label)s_%(class)s_object'),
+		]
+
+
+def log_changes(log_model, action, pks, batch_size=None):
+	"""
+	Appends entries of action on pks to log_model. Call it in the
+	transaction of the write, so both are committed together
+	"""
+	using = router.db_for_write(log_model)
+	connection = connections[using]
+	if connection.vendor == 'postgresql':
+		# Concurrent writers could commit their sequence numbers out of
+		# order and pollers would skip the late ones, so writers take turns
+		# from here until they commit
+		key = zlib.crc32(log_model._meta.db_table.encode())
+		with connection.cursor() as cursor:
+			cursor.execute('SELECT pg_advisory_xact_lock(%s)', [key])
+	now = timezone.now()
+	entries = [log_model(object_id=pk, action=action, changed_at=now)
+				for pk in pks]
+	for batch in chunks(entries, batch_size or PURE_REST['BULK_BATCH_SIZE']):
+		log_model._base_manager.using(using).bulk_create(batch)
+
+
+def compact_changes(log_model, before):
+	"""
+	Removes entries superseded by a later entry of the same object, then
+	truncates the log at the last entry made before `before`, leaving a
+	`compact` mark in its place. Returns the number of removed entries
+	"""
+	using = router.db_for_write(log_model)
+	manager = log_model._base_manager.using(using)
+	with transaction.atomic(using=using):
+		latest = manager.filter(object_id=OuterRef('object_id')) \
+			.order_by('-seq').values('seq')[:1]
+		removed = manager.filter(seq__lt=Subquery(latest)).delete()[0]
+		horizon = manager.filter(changed_at__lt=before) \
+			.aggregate(seq=Max('seq'))['seq']
+		if horizon is not None:
+			removed += manager.filter(seq__lte=horizon).delete()[0]
+			# Pollers behind the mark get 410 Gone instead of a gap
+			manager.create(seq=horizon, action=log_model.COMPACT)
+	return removed
+
+
+def parse_number(value, name, maximum=None):
+	"""
+	Parses a non-negative integer query parameter, raises ValidationError
+	on anything else or values above maximum
+	"""
+	try:
+		number = int(value)
+	except ValueError:
+		number = -1
+	if number < 0 or (maximum is not None and number > maximum):
+		limit = ' up to %d' % maximum if maximum is not None else ''
+		raise ValidationError('%s must be a non-negative integer%s' % (
+			name, limit))
+	return number
+
+
+class ChangeFeedView(ReplicaReadMixin, View):
+	"""
+	Change feed of a model for incremental sync:
+	`?since=<seq>&limit=<n>` returns the entries of `log_model` after
+	`since` in order, `last_seq` to poll with next and whether there are
+	more. Without `since` only the current `last_seq` is returned, to start
+	from. Pollers behind the last compaction get 410 Gone and have to read
+	the whole list again
+	"""
+	log_model = None
+	since_query_param = 'since'
+	limit_query_param = 'limit'
+	page_size = PURE_REST['CHANGES']['PAGE_SIZE']
+	max_page_size = PURE_REST['CHANGES']['MAX_PAGE_SIZE']
+
+	def get_last_seq(self):
+		return self.log_model.objects.aggregate(seq=Max('seq'))['seq'] or 0
+
+	def get(self, request, *args, **kwargs):
+		try:
+			since = request.GET.get(self.since_query_param, None)
+			if since is not None:
+				since = parse_number(since, self.since_query_param)
+			limit = parse_number(
+				request.GET.get(self.limit_query_param, self.page_size),
+				self.limit_query_param, self.max_page_size)
+		except ValidationError as e:
+			return JsonResponse({'detail': e.messages[0]}, status=400)
+		if since is None:
+			return JsonResponse({'results': [], 'last_seq': self.get_last_seq(),
+								'has_more': False})
+
+		rows = list(self.log_model.objects.filter(seq__gt=since)
+					.order_by('seq')
+					.values_list('seq', 'object_id', 'action')[:limit + 1])
+		if rows and rows[0][2] == self.log_model.COMPACT:
+			message = 'Changes after %d were compacted, read the whole list ' \
+				'again' % since
+			return JsonResponse({'detail': message,
+								'last_seq': self.get_last_seq()}, status=410)
+		results = [{'seq': seq, 'id': pk, 'action': action}
+					for seq, pk, action in rows[:limit]]
+		return JsonResponse({
+			'results': results,
+			'last_seq': results[-1]['seq'] if results else since,
+			'has_more': len(rows) > limit})
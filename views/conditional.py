@@ -0,0 +1,160 @@
+import datetime
+import hashlib
+
+from django.db.models import Count, Max, Sum
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_etags, parse_http_date_safe
+
+EPOCH = datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+
+
+def get_query_digest(request, variant=None):
+	"""
+	Short digest of the normalized query string, representations of the
+	same data differ by it (pages, filters, ...), and of the variant
+	(e.g. the format negotiated with the Accept header) if any
+	"""
+	query = sorted((name, sorted(values)) for name, values in request.GET.lists())
+	if variant is not None:
+		query.append((None, variant))
+	return hashlib.sha1(repr(query).encode()).hexdigest()[:16]
+
+
+def get_object_etag(pk, last_modified, request=None):
+	"""
+	Strong ETag of an object: its primary key and version (the timestamp of
+	the last update in microseconds), plus the query digest if any
+	"""
+	etag = '%s-%x' % (pk, get_version(last_modified))
+	if request is not None and request.GET:
+		etag += '-' + get_query_digest(request)
+	return '"%s"' % etag
+
+
+def get_version(last_modified):
+	"""
+	Version of an object in ETags: its timestamp in microseconds, exactly
+	"""
+	return (last_modified - EPOCH) // datetime.timedelta(microseconds=1)
+
+
+def get_version_timestamp(version):
+	"""
+	The timestamp `get_version` made version of
+	"""
+	return EPOCH + datetime.timedelta(microseconds=version)
+
+
+def parse_object_etag(etag):
+	"""
+	Returns the version encoded by `get_object_etag` or None
+	"""
+	try:
+		return int(etag.strip().strip('"').split('-')[1], 16)
+	except (IndexError, ValueError):
+		return None
+
+
+def get_if_match_versions(request, pk):
+	"""
+	Versions of the object with pk the If-Match header accepts: None without
+	the header or with `*`, otherwise a list, empty if no ETag of the header
+	is a strong ETag of that object
+	"""
+	header = request.META.get('HTTP_IF_MATCH', None)
+	if header is None:
+		return None
+	etags = parse_etags(header)
+	if etags == ['*']:
+		return None
+	versions = []
+	for etag in etags:
+		version = parse_object_etag(etag)
+		if etag.startswith('"%s-' % pk) and version is not None:
+			versions.append(version)
+	return versions
+
+
+def get_object_validators(request, queryset, pk, field):
+	"""
+	ETag and last modification time of the object with pk, read with a single
+	indexed query of one column. Returns (None, None) if there is no object
+	"""
+	last_modified = queryset.filter(pk=pk).values_list(field, flat=True).first()
+	if last_modified is None:
+		return None, None
+	return get_object_etag(pk, last_modified, request), last_modified
+
+
+def get_list_validators(request, queryset, field, total=None, variant=None):
+	"""
+	ETag of a list, computed with one aggregate query over the filtered
+	queryset (no rows are loaded): the newest version, the number of objects
+	and the sum of their keys change on any create, update or delete. Pass a
+	sliced queryset to validate a single window, and the total count of a
+	paginated list as total. Representations other than the default one
+	pass a variant, see `get_query_digest`. Returns (etag, None), see
+	`get_stats_validators`
+	"""
+	if not queryset.query.is_sliced:
+		queryset = queryset.order_by()
+	stats = queryset.aggregate(last_modified=Max(field), count=Count('pk'),
+								pk_sum=Sum('pk'))
+	return get_stats_validators(request, queryset.model, stats, total, variant)
+
+
+def get_rows_validators(request, model, pks, versions, variant=None):
+	"""
+	The validators `get_list_validators` computes for objects with pks and
+	versions (values of its field), from rows read already
+	"""
+	pks = list(pks)
+	stats = {'last_modified': max(versions, default=None), 'count': len(pks),
+				'pk_sum': sum(pks) if pks else None}
+	return get_stats_validators(request, model, stats, variant=variant)
+
+
+def get_stats_validators(request, model, stats, total=None, variant=None):
+	"""
+	Lists have no last modification time: deletes don't change the newest
+	version of what is left, so If-Modified-Since would keep a list with
+	deleted objects fresh. Only the ETag, which counts them, validates lists
+	"""
+	last_modified = stats['last_modified']
+	version = last_modified.isoformat() if last_modified else ''
+	raw = '|'.join(str(part) for part in (
+		model._meta.label_lower, stats['count'], stats['pk_sum'],
+		version, total, get_query_digest(request, variant)))
+	return '"%s"' % hashlib.sha1(raw.encode()).hexdigest(), None
+
+
+def get_not_modified_response(request, etag, last_modified):
+	"""
+	Returns a 304 response if the validators sent by the client still match
+	"""
+	if request.method not in ('GET', 'HEAD'):
+		return None
+	timestamp = int(last_modified.timestamp()) if last_modified else None
+	return get_conditional_response(request, etag=etag,
+									last_modified=timestamp)
+
+
+def get_cached_conditional_response(request, response):
+	"""
+	Returns a 304 version of a cached response if the validators it was
+	cached with still match, otherwise the response itself
+	"""
+	last_modified = parse_http_date_safe(response.get('Last-Modified', ''))
+	return get_conditional_response(request, etag=response.get('ETag', None),
+									last_modified=last_modified,
+									response=response)
+
+
+def set_validators(response, etag, last_modified):
+	if response.status_code != 200:
+		return response
+	if etag is not None:
+		response['ETag'] = etag
+	if last_modified is not None:
+		response['Last-Modified'] = http_date(last_modified.timestamp())
+	return response
@@ -0,0 +1,199 @@
+import hashlib
+import json
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.paginator import EmptyPage, Paginator
+from django.db import DatabaseError, connections, transaction
+from django.db.models import QuerySet
+from django.dispatch import receiver
+from django.utils.functional import cached_property
+
+from course_catalogue.settings import PURE_REST
+from views.cache import LRUCache
+from views.signals import objects_written
+
+COUNT_STRATEGIES = ('exact', 'cached', 'estimated')
+
+
+class CountCache:
+	"""
+	Caches counts keyed on the SQL of the counted queryset, i.e. on its
+	normalized filters. Keys embed a generation of the model bumped by
+	every write, so writes make the counts of the model unreachable
+	"""
+	def __init__(self, backend, timeout=None):
+		self.backend = backend
+		self.timeout = timeout
+
+	def get_generation(self, label):
+		key = 'count-cache-gen:' + label
+		generation = self.backend.get(key, None)
+		if generation is None:
+			generation = time.time_ns()
+			self.backend.set(key, generation, None)
+		return generation
+
+	def get_key(self, queryset):
+		label = queryset.model._meta.label_lower
+		sql, params = queryset.order_by().query.sql_with_params()
+		raw = '%s|%s|%s|%s|%r' % (label, self.get_generation(label),
+									queryset.db, sql, params)
+		return 'count-cache:' + hashlib.md5(raw.encode()).hexdigest()
+
+	def get(self, queryset):
+		return self.backend.get(self.get_key(queryset), None)
+
+	def set(self, queryset, count):
+		self.backend.set(self.get_key(queryset), count, self.timeout)
+
+	def invalidate(self, model):
+		self.backend.set('count-cache-gen:' + model._meta.label_lower,
+						time.time_ns(), None)
+
+
+_count_caches = {}
+
+
+def get_count_cache(config):
+	key = (config.get('CACHE', 'locmem'), config.get('TIMEOUT', 60),
+			config.get('MAX_ENTRIES', 1000))
+	if key not in _count_caches:
+		backend_name, timeout, max_entries = key
+		if backend_name == 'locmem':
+			backend = LRUCache(max_entries, timeout)
+		else:
+			# Any cache alias from settings.CACHES (file, database, ...)
+			backend = caches[backend_name]
+		_count_caches[key] = CountCache(backend, timeout)
+	return _count_caches[key]
+
+
+def get_count_configs():
+	"""
+	The count configurations of both APIs, PURE_REST['COUNT'] and
+	REST_FRAMEWORK['COUNT']
+	"""
+	return [PURE_REST['COUNT'], settings.REST_FRAMEWORK['COUNT']]
+
+
+@receiver(objects_written)
+def invalidate_count_caches(sender, **kwargs):
+	# The configured caches are resolved even if this process hasn't
+	# counted yet, shared backends are read by other processes
+	for config in get_count_configs():
+		if config.get('STRATEGY', 'exact') == 'cached':
+			get_count_cache(config)
+	caches_to_invalidate = list(_count_caches.values())
+	for cache in caches_to_invalidate:
+		cache.invalidate(sender)
+	# Once more after commit, so readers can't cache the counts they could
+	# still see before it
+	transaction.on_commit(lambda: [cache.invalidate(sender)
+									for cache in caches_to_invalidate])
+
+
+def get_planner_estimate(queryset):
+	"""
+	Number of rows of queryset estimated by the database from its
+	statistics, without running it, or None if there's no estimate: on
+	SQLite only unfiltered querysets are estimated (from `ANALYZE` results)
+	"""
+	connection = connections[queryset.db]
+	query = queryset.order_by().query
+	try:
+		with connection.cursor() as cursor:
+			if connection.vendor == 'postgresql':
+				sql, params = query.sql_with_params()
+				cursor.execute('EXPLAIN (FORMAT JSON) ' + sql, params)
+				plan = cursor.fetchone()[0]
+				if isinstance(plan, str):
+					plan = json.loads(plan)
+				return int(plan[0]['Plan']['Plan Rows'])
+			filtered = bool(query.where) or bool(query.extra_tables)
+			if connection.vendor == 'sqlite' and not filtered:
+				cursor.execute('SELECT stat FROM sqlite_stat1 WHERE tbl = %s',
+								[queryset.model._meta.db_table])
+				# Every row starts with the number of rows in the table
+				counts = [int(row[0].split()[0]) for row in cursor.fetchall()]
+				return max(counts) if counts else None
+	except DatabaseError:
+		# No statistics were gathered yet
+		return None
+	return None
+
+
+def count_objects(object_list, config):
+	"""
+	Counts object_list with the strategy of config, returns (count,
+	strategy) where strategy is the one that produced the count:
+		exact - `COUNT(*)`.
+
+		cached - a count cached for the same filters, `exact` on misses.
+
+		estimated - exact up to `LIMIT` objects, above that the planner's
+		estimate or `LIMIT` itself as a lower bound.
+	"""
+	strategy = config.get('STRATEGY', 'exact')
+	if strategy not in COUNT_STRATEGIES:
+		raise ValueError('Unknown count strategy %r' % strategy)
+	if not isinstance(object_list, QuerySet):
+		return len(object_list), 'exact'
+
+	if strategy == 'cached':
+		cache = get_count_cache(config)
+		count = cache.get(object_list)
+		if count is not None:
+			return count, 'cached'
+		count = object_list.count()
+		cache.set(object_list, count)
+		return count, 'exact'
+
+	if strategy == 'estimated':
+		limit = config.get('LIMIT', 10000)
+		# Counting a subquery stops after limit + 1 rows
+		count = object_list.order_by()[:limit + 1].count()
+		if count <= limit:
+			return count, 'exact'
+		return max(get_planner_estimate(object_list) or 0, limit), 'estimated'
+
+	return object_list.count(), 'exact'
+
+
+class CountingPaginator(Paginator):
+	"""
+	Paginator counting objects with the strategy of PURE_REST['COUNT'],
+	`count_strategy` tells which one produced `count`. Estimated counts may
+	be too low, so pages past them aren't rejected
+	"""
+	def get_count_settings(self):
+		return PURE_REST['COUNT']
+
+	@cached_property
+	def counted(self):
+		return count_objects(self.object_list, self.get_count_settings())
+
+	@property
+	def count(self):
+		return self.counted[0]
+
+	@property
+	def count_strategy(self):
+		return self.counted[1]
+
+	def validate_number(self, number):
+		try:
+			return super().validate_number(number)
+		except EmptyPage:
+			if self.count_strategy == 'estimated' and int(number) > 1:
+				return int(number)
+			raise
+
+	def page(self, number):
+		if self.count_strategy != 'estimated':
+			return super().page(number)
+		number = self.validate_number(number)
+		bottom = (number - 1) * self.per_page
+		return self._get_page(self.object_list[bottom:bottom + self.per_page],
+								number, self)
@@ -0,0 +1,83 @@
+import csv
+import datetime
+
+from django.http import JsonResponse, StreamingHttpResponse
+from django.views import View
+from django.views.generic.list import MultipleObjectMixin
+
+from course_catalogue.settings import PURE_REST
+from views.json import RowEncoder, format_date, get_field_names
+from views.routing import ReplicaReadMixin
+
+
+class Echo:
+	"""
+	File-like object handing back whatever is written to it, lets
+	`csv.writer` produce strings for a generator
+	"""
+	def write(self, value):
+		return value
+
+
+def iter_ndjson(queryset, fields, chunk_size):
+	"""
+	Yields the rows of queryset as newline-delimited JSON, chunk by chunk
+	"""
+	encoder = RowEncoder(queryset.model, fields)
+	lines = []
+	for row in queryset.values_list(*fields).iterator(chunk_size=chunk_size):
+		lines.append(encoder.encode(row) + '\n')
+		if len(lines) >= chunk_size:
+			yield ''.join(lines)
+			lines = []
+	if lines:
+		yield ''.join(lines)
+
+
+def iter_csv(queryset, fields, chunk_size):
+	"""
+	Yields the rows of queryset as CSV with a header line, chunk by chunk
+	"""
+	writer = csv.writer(Echo())
+	yield writer.writerow(fields)
+	lines = []
+	for row in queryset.values_list(*fields).iterator(chunk_size=chunk_size):
+		lines.append(writer.writerow([
+			format_date(value) if isinstance(value, datetime.date) else value
+			for value in row]))
+		if len(lines) >= chunk_size:
+			yield ''.join(lines)
+			lines = []
+	if lines:
+		yield ''.join(lines)
+
+
+class ExportView(ReplicaReadMixin, MultipleObjectMixin, View):
+	"""
+	Streams the whole (filtered) queryset as NDJSON or CSV, chosen with
+	`?format=ndjson|csv`. Rows are read from the database and written to the
+	client in chunks, so memory use doesn't depend on the table size
+	"""
+	formats = {
+		'ndjson': (iter_ndjson, 'application/x-ndjson'),
+		'csv': (iter_csv, 'text/csv'),
+	}
+	default_format = 'ndjson'
+	chunk_size = PURE_REST['EXPORT_CHUNK_SIZE']
+
+	def get(self, request, *args, **kwargs):
+		export_format = request.GET.get('format', self.default_format)
+		if export_format not in self.formats:
+			message = 'Unknown format, expected one of: ' + ', '.join(self.formats)
+			return JsonResponse({'detail': message}, status=400)
+		generator, content_type = self.formats[export_format]
+		queryset = self.get_queryset()
+		# Rows are read while the response is sent, after `read_replica`
+		queryset = queryset.using(queryset.db)
+		fields = get_field_names(queryset.model)
+		response = StreamingHttpResponse(
+			generator(queryset, fields, self.chunk_size),
+			content_type=content_type)
+		response['Content-Disposition'] = 'attachment; filename="%s.%s"' % (
+			queryset.model._meta.verbose_name_plural, export_format)
+		return response
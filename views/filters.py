@@ -1,11 +1,20 @@
+import functools
+
+from django import forms
 from django.core.exceptions import ValidationError
+from django.http import JsonResponse
 from django.views.generic.list import MultipleObjectMixin
 
+from views.search import search
+
+FILTER_LOOKUPS = ('gte', 'lte', 'exact', 'gt', 'lt')
+
 
 class SearchFilter(MultipleObjectMixin):
 	"""
-	A simple and naive search filter. Checking if query appears in search_fields
-	using `icontains` lookup
+	A search filter backed by the full-text index (see `views.search`).
+	Matches every word of the query as a prefix in search_fields and orders
+	results by relevance
 	"""
 	search_fields = []
 
@@ -13,29 +22,231 @@ class SearchFilter(MultipleObjectMixin):
 		query = self.request.GET.get('search', None)
 
 		if self.search_fields and query:
-			filter_dict = {field + '__icontains': query for field in self.search_fields}
-			return super().get_queryset().filter(**filter_dict)
+			return search(super().get_queryset(), self.search_fields, query)
 		else:
 			return super().get_queryset()
 
 
+@functools.lru_cache(maxsize=None)
+def get_filter_spec(model, filter_fields, lookups=FILTER_LOOKUPS):
+	"""
+	Compiles the query parameters of filter_fields once: maps every
+	`<field>__<lookup>` name (and the bare field name for `exact`) to the
+	field name, the lookup and the form field parsing its values, which
+	accepts the same `DATE_INPUT_FORMATS` as the DRF filters
+	"""
+	spec = {}
+	for name in filter_fields:
+		form_field = model._meta.get_field(name).formfield(required=False)
+		spec[name] = (name, 'exact', form_field)
+		for lookup in lookups:
+			spec[name + '__' + lookup] = (name, lookup, form_field)
+	return spec
+
+
+def merge_bounds(name, conditions):
+	"""
+	Merges (lookup, value) conditions on one field into the tightest bounds,
+	a single `exact` or `range` lookup where possible. Returns None when no
+	value can satisfy all of them
+	"""
+	# Bounds are (value, inclusive), exact bounds both sides inclusively
+	lowers = [(value, lookup != 'gt') for lookup, value in conditions
+				if lookup in ('exact', 'gt', 'gte')]
+	uppers = [(value, lookup != 'lt') for lookup, value in conditions
+				if lookup in ('exact', 'lt', 'lte')]
+	# Of equal values the exclusive bound is the tighter one
+	lower = max(lowers, key=lambda bound: (bound[0], not bound[1]),
+				default=None)
+	upper = min(uppers, default=None)
+
+	if lower is not None and upper is not None:
+		if lower[0] > upper[0]:
+			return None
+		if lower[0] == upper[0]:
+			return {name: lower[0]} if lower[1] and upper[1] else None
+		if lower[1] and upper[1]:
+			return {name + '__range': (lower[0], upper[0])}
+	lookups = {}
+	if lower is not None:
+		lookups[name + ('__gte' if lower[1] else '__gt')] = lower[0]
+	if upper is not None:
+		lookups[name + ('__lte' if upper[1] else '__lt')] = upper[0]
+	return lookups
+
+
 class FieldsFilter(MultipleObjectMixin):
 	"""
-	A simple and naive fields filter working with basic lookups:
-	`gte, lte, exact, gt, lt`
+	Fields filter with basic lookups: `gte, lte, exact, gt, lt`.
+	Values are parsed up front by the field's form field, invalid ones are
+	answered with 400 Bad Request. Bounds on one field are merged into a
+	single range
 	"""
 	filter_fields = []
 
+	def get_field_filters(self):
+		"""
+		Lookups of the requested filters, None if no object can match them.
+		Raises ValidationError on invalid values
+		"""
+		model = self.model if self.model is not None else \
+			super().get_queryset().model
+		spec = get_filter_spec(model, tuple(self.filter_fields))
+		conditions = {}
+		for param, values in self.request.GET.lists():
+			if param not in spec:
+				continue
+			name, lookup, form_field = spec[param]
+			for value in filter(None, values):
+				try:
+					value = form_field.clean(value)
+				except ValidationError as e:
+					raise ValidationError('Invalid %s: %s' % (
+						param, ' '.join(e.messages)))
+				conditions.setdefault(name, []).append((lookup, value))
+
+		filters = {}
+		for name, field_conditions in conditions.items():
+			lookups = merge_bounds(name, field_conditions)
+			if lookups is None:
+				return None
+			filters.update(lookups)
+		return filters
+
+	def get(self, request, *args, **kwargs):
+		try:
+			self.get_field_filters()
+		except ValidationError as e:
+			return JsonResponse({'detail': e.messages[0]}, status=400)
+		return super().get(request, *args, **kwargs)
+
+	def get_queryset(self):
+		filters = self.get_field_filters()
+		if filters is None:
+			return super().get_queryset().none()
+		return super().get_queryset().filter(**filters)
+
+
+def get_overlap_filter(start_field, end_field, start, end):
+	"""
+	Lookups selecting objects whose [start_field, end_field] interval
+	overlaps [start, end] (both ends inclusive). A single range over
+	start_field with end_field checked alongside, which an index on
+	(start_field, end_field) answers without touching the table
+	"""
+	return {start_field + '__lte': end, end_field + '__gte': start}
+
+
+class IntervalFilter(MultipleObjectMixin):
+	"""
+	Interval queries over a pair of date fields `interval_fields`:
+	`active_on=<date>` and `overlaps=<start>,<end>`
+	"""
+	interval_fields = None
+
+	def get_intervals(self):
+		"""
+		Requested intervals, raises ValidationError on invalid ones
+		"""
+		date_field = forms.DateField()
+		intervals = []
+		active_on = self.request.GET.get('active_on', None)
+		if active_on:
+			day = date_field.clean(active_on)
+			intervals.append((day, day))
+		overlaps = self.request.GET.get('overlaps', None)
+		if overlaps:
+			try:
+				start, end = overlaps.split(',')
+			except ValueError:
+				raise ValidationError('Invalid overlaps: expected '
+										'<start>,<end>')
+			intervals.append((date_field.clean(start), date_field.clean(end)))
+		return intervals
+
+	def get(self, request, *args, **kwargs):
+		if self.interval_fields:
+			try:
+				self.get_intervals()
+			except ValidationError as e:
+				return JsonResponse({'detail': e.messages[0]}, status=400)
+		return super().get(request, *args, **kwargs)
+
 	def get_queryset(self):
-		default_lookups = ['gte', 'lte', 'exact', 'gt', 'lt']
-		filter_names = [field + '__' + lookup for field in self.filter_fields
-						for lookup in default_lookups]
-		# Appending for filtering EXACT without __exact lookup in request
-		filter_names.extend(self.filter_fields)
-		filters = {name: self.request.GET[name] for name in filter_names
-					if self.request.GET.get(name, None)}
+		intervals = self.get_intervals() if self.interval_fields else []
+		if not intervals:
+			return super().get_queryset()
+
+		# Overlapping all of the intervals is overlapping the tightest bounds
+		start = max(interval[0] for interval in intervals)
+		end = min(interval[1] for interval in intervals)
+		return super().get_queryset().filter(
+			**get_overlap_filter(*self.interval_fields, start, end))
+
+
+@functools.lru_cache(maxsize=None)
+def get_indexed_fields(model):
+	"""
+	Names of the fields an index starts with: the primary key, indexed and
+	unique fields and the leading fields of `Meta.indexes`
+	"""
+	leading = {index.fields[0].lstrip('-') for index in model._meta.indexes}
+	for field in model._meta.concrete_fields:
+		if field.primary_key or field.db_index or field.unique:
+			leading.add(field.name)
+	return tuple(field.name for field in model._meta.concrete_fields
+				if field.name in leading)
+
 
+def parse_ordering(value, allowed):
+	"""
+	Parses a comma-separated `?ordering=` value (`-` prefixes descending
+	fields). Raises ValidationError on names not in allowed
+	"""
+	ordering = [name.strip() for name in value.split(',') if name.strip()]
+	unknown = [name for name in ordering if name.lstrip('-') not in allowed]
+	if unknown:
+		raise ValidationError('Unknown ordering fields: %s. Available fields: '
+								'%s' % (', '.join(unknown), ', '.join(allowed)))
+	return ordering
+
+
+class OrderingFilter(MultipleObjectMixin):
+	"""
+	`?ordering=-start_date,id` orders the list by the given fields, taking
+	precedence over the relevance order of searches. Only ordering_fields
+	are allowed, by default the indexed ones (see `get_indexed_fields`), so
+	pages are read from an index instead of sorting the table
+	"""
+	ordering_fields = None
+	ordering_query_param = 'ordering'
+
+	def get_ordering_fields(self):
+		if self.ordering_fields is not None:
+			return self.ordering_fields
+		model = self.model if self.model is not None else \
+			super().get_queryset().model
+		return get_indexed_fields(model)
+
+	def get_requested_ordering(self):
+		"""
+		Ordering given with the query parameter, None without it. Raises
+		ValidationError on fields not allowed
+		"""
+		value = self.request.GET.get(self.ordering_query_param, '')
+		if not value.strip():
+			return None
+		return parse_ordering(value, self.get_ordering_fields())
+
+	def get(self, request, *args, **kwargs):
 		try:
-			return super().get_queryset().filter(**filters)
-		except ValidationError:
+			self.get_requested_ordering()
+		except ValidationError as e:
+			return JsonResponse({'detail': e.messages[0]}, status=400)
+		return super().get(request, *args, **kwargs)
+
+	def get_queryset(self):
+		ordering = self.get_requested_ordering()
+		if ordering is None:
 			return super().get_queryset()
+		return super().get_queryset().order_by(*ordering)
@@ -0,0 +1,142 @@
+import datetime
+import json
+
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+
+try:
+	import orjson
+except ImportError:
+	orjson = None
+
+try:
+	import msgpack
+except ImportError:
+	msgpack = None
+
+JSON_MEDIA_TYPES = ('application/json', 'application/*', '*/*')
+
+
+def encode_value(value):
+	"""
+	Encodes values the encoders don't know natively: dates and times as
+	ISO 8601 strings, the rest like `DjangoJSONEncoder`
+	"""
+	if isinstance(value, (datetime.date, datetime.time)):
+		return value.isoformat()
+	return DjangoJSONEncoder().default(value)
+
+
+def to_columns(data, fields):
+	"""
+	Lays out a list response as columns: the `results` rows (tuples of the
+	values of fields, or None) become `columns` and `rows`, the other keys
+	are kept in their place. A bare list of rows gets the layout alone
+	"""
+	if not isinstance(data, dict):
+		return {'columns': list(fields), 'rows': data}
+	layout = {}
+	for key, value in data.items():
+		if key == 'results':
+			layout['columns'] = list(fields)
+			layout['rows'] = value
+		else:
+			layout[key] = value
+	return layout
+
+
+class ColumnarJsonFormat:
+	"""
+	Columnar JSON: `{"columns": [...], "rows": [[...], ...]}` with compact
+	separators, the same bytes with orjson (used if it's installed) and
+	with the standard library. Dates are formatted by format_date, the
+	date formatter of the JSON responses of the API, ISO 8601 without one
+	"""
+	name = 'columnar'
+	media_type = 'application/vnd.columnar+json'
+
+	def __init__(self, format_date=None):
+		self.format_date = format_date
+
+	def encode_value(self, value):
+		if self.format_date is not None and type(value) is datetime.date:
+			return self.format_date(value)
+		return encode_value(value)
+
+	def dumps(self, data):
+		if orjson is not None:
+			# Dates go through encode_value instead of orjson's ISO 8601
+			return orjson.dumps(data, default=self.encode_value,
+								option=orjson.OPT_PASSTHROUGH_DATETIME)
+		return json.dumps(data, default=self.encode_value, ensure_ascii=False,
+							separators=(',', ':')).encode()
+
+
+class MessagePackFormat(ColumnarJsonFormat):
+	"""
+	The columnar layout in MessagePack, available if msgpack is installed
+	"""
+	name = 'msgpack'
+	media_type = 'application/msgpack'
+
+	def dumps(self, data):
+		return msgpack.packb(data, default=self.encode_value,
+							use_bin_type=True)
+
+
+def get_response_formats(format_date=None):
+	"""
+	Compact list formats available besides JSON, by name, formatting dates
+	with format_date
+	"""
+	formats = [ColumnarJsonFormat(format_date)]
+	if msgpack is not None:
+		formats.append(MessagePackFormat(format_date))
+	return {response_format.name: response_format
+			for response_format in formats}
+
+
+def parse_accept(value):
+	"""
+	Media types of an Accept header, most preferred first
+	"""
+	ranges = []
+	for index, part in enumerate(value.split(',')):
+		media_type, *params = [item.strip() for item in part.split(';')]
+		quality = 1.0
+		for param in params:
+			name, _, number = param.partition('=')
+			if name.strip() == 'q':
+				try:
+					quality = float(number)
+				except ValueError:
+					quality = 0.0
+		if media_type and quality > 0:
+			ranges.append((-quality, index, media_type.lower()))
+	return [media_type for _, _, media_type in sorted(ranges)]
+
+
+def negotiate_format(request, formats, query_param='format'):
+	"""
+	Picks the format of a list response from `?format=` (a name of formats
+	or `json`) or else the Accept header. Returns None for JSON, which is
+	also the answer to headers asking for nothing known. Raises
+	ValidationError on unknown `?format=` names
+	"""
+	name = request.GET.get(query_param, None)
+	if name is not None:
+		if name == 'json':
+			return None
+		if name not in formats:
+			raise ValidationError('Unknown format: %s. Available formats: %s'
+									% (name, ', '.join(['json', *formats])))
+		return formats[name]
+
+	by_media_type = {response_format.media_type: response_format
+						for response_format in formats.values()}
+	for media_type in parse_accept(request.META.get('HTTP_ACCEPT', '')):
+		if media_type in JSON_MEDIA_TYPES:
+			return None
+		if media_type in by_media_type:
+			return by_media_type[media_type]
+	return None
@@ -0,0 +1,275 @@
+import contextlib
+import hmac
+import json
+import logging
+import threading
+import time
+from collections import deque
+
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.http import JsonResponse
+
+from course_catalogue.settings import PURE_REST
+from views.cache import get_response_cache
+
+logger = logging.getLogger('views.instrumentation')
+
+_null_context = contextlib.nullcontext()
+
+
+class NullMetrics:
+	"""
+	Stands for the metrics of requests that aren't instrumented
+	"""
+	def time(self, name):
+		return _null_context
+
+
+NULL_METRICS = NullMetrics()
+
+
+def get_metrics(request):
+	"""
+	Metrics of the request, hooks time their phases with
+	`get_metrics(request).time(name)`. A no-op unless instrumentation is on
+	"""
+	return getattr(request, 'metrics', NULL_METRICS)
+
+
+@contextlib.contextmanager
+def instrument_connections(request):
+	"""
+	Counts the queries of the database connections of the current thread
+	(they are per thread) in the metrics of request, if it has any
+	"""
+	metrics = getattr(request, 'metrics', None)
+	with contextlib.ExitStack() as stack:
+		if metrics is not None:
+			for connection in connections.all():
+				stack.enter_context(connection.execute_wrapper(metrics))
+		yield
+
+
+class RequestMetrics:
+	"""
+	Timings of a request: SQL queries (counted by a database execute wrapper)
+	and named phases. Phases are exclusive, SQL run and phases nested in them
+	don't count to their time
+	"""
+	def __init__(self):
+		self.started = time.perf_counter()
+		self.finished = None
+		self.queries = 0
+		self.sql_time = 0.0
+		self.phases = {}
+		self._stack = []
+
+	def __call__(self, execute, sql, params, many, context):
+		started = time.perf_counter()
+		try:
+			return execute(sql, params, many, context)
+		finally:
+			self.queries += 1
+			self.sql_time += time.perf_counter() - started
+
+	@contextlib.contextmanager
+	def time(self, name):
+		# [start, SQL time at start, time of nested phases]
+		frame = [time.perf_counter(), self.sql_time, 0.0]
+		self._stack.append(frame)
+		try:
+			yield
+		finally:
+			self._stack.pop()
+			elapsed = time.perf_counter() - frame[0]
+			own = elapsed - (self.sql_time - frame[1]) - frame[2]
+			self.phases[name] = self.phases.get(name, 0.0) + own
+			if self._stack:
+				self._stack[-1][2] += own
+
+	def add(self, name, seconds):
+		self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+	@property
+	def total(self):
+		return (self.finished or time.perf_counter()) - self.started
+
+	def get_server_timing(self):
+		entries = ['%s;dur=%.3f' % (name, seconds * 1000)
+					for name, seconds in self.phases.items()]
+		entries.append('db;dur=%.3f;desc="%d queries"' % (self.sql_time * 1000,
+														self.queries))
+		entries.append('total;dur=%.3f' % (self.total * 1000))
+		return ', '.join(entries)
+
+	def as_dict(self):
+		return {'duration_ms': round(self.total * 1000, 3),
+				'queries': self.queries,
+				'sql_ms': round(self.sql_time * 1000, 3),
+				'phases_ms': {name: round(seconds * 1000, 3)
+							for name, seconds in self.phases.items()}}
+
+
+def percentile(ordered, fraction):
+	"""
+	Nearest-rank percentile of a sorted non-empty list
+	"""
+	rank = int(round(fraction * len(ordered)))
+	return ordered[max(0, min(len(ordered), rank) - 1)]
+
+
+class MetricsAggregator:
+	"""
+	Keeps the durations of the last `max_samples` requests per route and
+	reports their percentiles
+	"""
+	def __init__(self, max_samples=1000):
+		self.max_samples = max_samples
+		self._samples = {}
+		self._counts = {}
+		self._lock = threading.Lock()
+
+	def add(self, route, metrics):
+		with self._lock:
+			if route not in self._samples:
+				self._samples[route] = deque(maxlen=self.max_samples)
+				self._counts[route] = 0
+			self._samples[route].append((metrics.total * 1000,
+										metrics.sql_time * 1000))
+			self._counts[route] += 1
+
+	def get_stats(self):
+		with self._lock:
+			samples = {route: list(values)
+						for route, values in self._samples.items()}
+			counts = dict(self._counts)
+		stats = {}
+		for route, values in sorted(samples.items()):
+			durations = sorted(duration for duration, _ in values)
+			sql = sorted(sql_time for _, sql_time in values)
+			stats[route] = {'count': counts[route], 'samples': len(values)}
+			for name, ordered in (('duration_ms', durations), ('sql_ms', sql)):
+				stats[route][name] = {
+					'p50': round(percentile(ordered, 0.50), 3),
+					'p95': round(percentile(ordered, 0.95), 3),
+					'p99': round(percentile(ordered, 0.99), 3)}
+		return stats
+
+	def clear(self):
+		with self._lock:
+			self._samples.clear()
+			self._counts.clear()
+
+
+_aggregators = {}
+
+
+def get_aggregator():
+	"""
+	Returns the aggregator of request metrics or None if it's disabled by
+	PURE_REST['INSTRUMENTATION']
+	"""
+	config = PURE_REST['INSTRUMENTATION']
+	if not config['ENABLED'] or not config['METRICS']:
+		return None
+	max_samples = config.get('METRICS_SAMPLES', 1000)
+	if max_samples not in _aggregators:
+		_aggregators[max_samples] = MetricsAggregator(max_samples)
+	return _aggregators[max_samples]
+
+
+def get_route(request):
+	"""
+	Method and URL pattern of the request, anchors of regex patterns (the DRF
+	router uses them) left out
+	"""
+	match = getattr(request, 'resolver_match', None)
+	if match is None or not match.route:
+		return '%s (unresolved)' % request.method
+	route = match.route.replace('/^', '/').lstrip('^').rstrip('$')
+	return '%s /%s' % (request.method, route)
+
+
+class InstrumentationMiddleware:
+	"""
+	Records the query count, SQL time, phase timings and response size of
+	every request and reports them in the `Server-Timing` header, as JSON log
+	lines and to the aggregator behind `/metrics`, as configured by
+	PURE_REST['INSTRUMENTATION']. Unless it's enabled there, the middleware
+	removes itself from the stack at startup.
+
+	Place it last in MIDDLEWARE: the time until the view is called is then
+	URL resolution (the `route` phase)
+	"""
+	def __init__(self, get_response):
+		self.config = PURE_REST['INSTRUMENTATION']
+		if not self.config['ENABLED']:
+			raise MiddlewareNotUsed
+		self.get_response = get_response
+
+	def __call__(self, request):
+		request.metrics = metrics = RequestMetrics()
+		with instrument_connections(request):
+			response = self.get_response(request)
+		metrics.finished = time.perf_counter()
+		self.report(request, response, metrics)
+		return response
+
+	def process_view(self, request, view_func, view_args, view_kwargs):
+		metrics = request.metrics
+		metrics.add('route', time.perf_counter() - metrics.started)
+
+	def process_template_response(self, request, response):
+		# DRF responses are rendered after the view
+		started = time.perf_counter()
+		response.add_post_render_callback(lambda response: request.metrics.add(
+			'render', time.perf_counter() - started))
+		return response
+
+	def report(self, request, response, metrics):
+		if self.config.get('SERVER_TIMING', True):
+			response['Server-Timing'] = metrics.get_server_timing()
+		route = get_route(request)
+		if self.config.get('LOG', True) and logger.isEnabledFor(logging.INFO):
+			size = None if response.streaming else len(response.content)
+			logger.info(json.dumps(dict(
+				metrics.as_dict(), route=route, path=request.path,
+				status=response.status_code, size=size)))
+		aggregator = get_aggregator()
+		if aggregator is not None:
+			aggregator.add(route, metrics)
+
+
+def is_metrics_client(request):
+	"""
+	Whether request has the `METRICS_TOKEN` bearer token or comes from one
+	of `METRICS_ALLOWED_IPS`. REMOTE_ADDR is the proxy's address behind one,
+	so list addresses only when clients connect directly
+	"""
+	config = PURE_REST['INSTRUMENTATION']
+	token = config.get('METRICS_TOKEN')
+	if token:
+		authorization = request.META.get('HTTP_AUTHORIZATION', '')
+		if hmac.compare_digest(authorization.encode(),
+								('Bearer %s' % token).encode()):
+			return True
+	allowed = config.get('METRICS_ALLOWED_IPS', ())
+	return request.META.get('REMOTE_ADDR') in allowed
+
+
+def metrics_view(request):
+	"""
+	p50/p95/p99 of request and SQL durations per route, and the hits and
+	misses of the response cache if it's enabled, for allowed clients
+	"""
+	aggregator = get_aggregator()
+	if aggregator is None:
+		return JsonResponse({'detail': 'Not found'}, status=404)
+	if not is_metrics_client(request):
+		return JsonResponse({'detail': 'Forbidden'}, status=403)
+	stats = aggregator.get_stats()
+	cache = get_response_cache()
+	if cache is not None:
+		stats['response_cache'] = cache.get_stats()
+	return JsonResponse(stats)
@@ -1,9 +1,13 @@
 import datetime
+import functools
 import json
+from json.encoder import encode_basestring_ascii
 
+from django.core.exceptions import NON_FIELD_ERRORS, ValidationError
 from django.core.serializers.json import DjangoJSONEncoder
-from django.forms.models import model_to_dict
-from django.http import JsonResponse
+from django.db import models, transaction
+from django.http import Http404, HttpResponse, JsonResponse
+from django.utils.cache import patch_vary_headers
 from django.views import View
 from django.views.generic.detail import BaseDetailView
 from django.views.generic.edit import (BaseCreateView,
@@ -12,7 +16,37 @@ from django.views.generic.edit import (BaseCreateView,
 from django.views.generic.list import BaseListView
 
 from course_catalogue.settings import PURE_REST
-from views.filters import SearchFilter, FieldsFilter
+from views.archive import ArchiveDetailMixin, ArchiveListMixin
+from views.bulk import create_objects, delete_objects, update_objects
+from views.cache import get_response_cache
+from views.conditional import (get_cached_conditional_response,
+								get_if_match_versions, get_list_validators,
+								get_not_modified_response, get_object_etag,
+								get_object_validators, get_rows_validators,
+								get_version, get_version_timestamp,
+								set_validators)
+from views.counting import CountingPaginator
+from views.filters import (FieldsFilter, IntervalFilter, OrderingFilter,
+							SearchFilter)
+from views.formats import get_response_formats, negotiate_format, to_columns
+from views.instrumentation import get_metrics
+from views.pagination import InvalidCursor, KeysetPage, KeysetPaginator
+from views.routing import ReplicaReadMixin, get_read_alias
+from views.signals import objects_written
+
+try:
+	import orjson
+except ImportError:
+	orjson = None
+
+
+@functools.lru_cache(maxsize=4096)
+def format_date(value):
+	"""
+	Formats a date with PURE_REST['DATE_FORMAT'], pages repeat the same
+	dates a lot, so the results are cached
+	"""
+	return format(value, PURE_REST['DATE_FORMAT'])
 
 
 class DateDjangoJSONEncoder(DjangoJSONEncoder):
@@ -21,18 +55,191 @@ class DateDjangoJSONEncoder(DjangoJSONEncoder):
 	"""
 	def default(self, o):
 		if isinstance(o, datetime.date):
-			return format(o, PURE_REST['DATE_FORMAT'])
+			return format_date(o)
 		else:
 			return super().default(o)
 
 
+class RawJSON(str):
+	"""
+	JSON text encoded beforehand, `JsonBackend.dumps` inserts it as it is
+	"""
+
+
+def nullable(encode):
+	return lambda value: 'null' if value is None else encode(value)
+
+
+@functools.lru_cache(maxsize=4096)
+def encode_date(value):
+	return encode_basestring_ascii(format_date(value))
+
+
+def get_value_encoder(field):
+	"""
+	Returns a function encoding values of field to JSON text exactly like
+	`DateDjangoJSONEncoder` does, picked once per field instead of per value
+	"""
+	if isinstance(field, models.BooleanField):
+		return nullable(lambda value: 'true' if value else 'false')
+	if isinstance(field, (models.AutoField, models.IntegerField)):
+		return nullable(int.__repr__)
+	if isinstance(field, models.DateField):
+		return nullable(encode_date)
+	if isinstance(field, (models.CharField, models.TextField)):
+		return nullable(encode_basestring_ascii)
+	return functools.partial(json.dumps, cls=DateDjangoJSONEncoder)
+
+
+class RowEncoder:
+	"""
+	Encodes rows of a model, given as `values_list` tuples of fields, with
+	a JSON template precompiled from the field list: per row only the values
+	are encoded, each by a function chosen for its field. Values past the
+	fields are ignored
+	"""
+	def __init__(self, model, fields):
+		self.fields = list(fields)
+		model_fields = [model._meta.get_field(name) for name in self.fields]
+		self.attnames = [field.attname for field in model_fields]
+		self.encoders = [get_value_encoder(field) for field in model_fields]
+		self.template = '{%s}' % ', '.join('%s: %%s' % json.dumps(name)
+											for name in self.fields)
+
+	def get_row(self, obj):
+		return [getattr(obj, attname) for attname in self.attnames]
+
+	def encode(self, row):
+		return self.template % tuple([encode(value) for encode, value
+										in zip(self.encoders, row)])
+
+	def encode_row(self, row):
+		"""
+		Returns row as a JSON object to be passed to the backend's `dumps`
+		"""
+		return RawJSON(self.encode(row))
+
+	def encode_rows(self, rows):
+		"""
+		Returns rows as a JSON array to be passed to the backend's `dumps`,
+		None rows become nulls
+		"""
+		return RawJSON('[%s]' % ', '.join([
+			self.encode(row) if row is not None else 'null' for row in rows]))
+
+
+class JsonBackend:
+	"""
+	Encodes responses with the standard `json` module, byte for byte like
+	`JsonResponse` with `DateDjangoJSONEncoder` would
+	"""
+	row_encoder_class = RowEncoder
+
+	def dumps(self, data):
+		if isinstance(data, RawJSON):
+			return data.encode()
+		if isinstance(data, dict) and any(isinstance(value, RawJSON)
+											for value in data.values()):
+			items = ('%s: %s' % (encode_basestring_ascii(key), self.dumps_value(
+				value)) for key, value in data.items())
+			return ('{%s}' % ', '.join(items)).encode()
+		return self.dumps_value(data).encode()
+
+	def dumps_value(self, value):
+		if isinstance(value, RawJSON):
+			return value
+		return json.dumps(value, cls=DateDjangoJSONEncoder)
+
+
+class OrjsonRowEncoder(RowEncoder):
+	"""
+	Row encoder of `OrjsonBackend`: rows become dicts with formatted dates
+	and are encoded together with the rest of the response
+	"""
+	def __init__(self, model, fields):
+		super().__init__(model, fields)
+		self.converters = [
+			nullable(format_date)
+			if isinstance(model._meta.get_field(name), models.DateField)
+			else None for name in self.fields]
+
+	def encode_row(self, row):
+		return dict(zip(self.fields, [
+			convert(value) if convert is not None else value
+			for convert, value in zip(self.converters, row)]))
+
+	def encode_rows(self, rows):
+		return [self.encode_row(row) if row is not None else None
+				for row in rows]
+
+
+class OrjsonBackend(JsonBackend):
+	"""
+	Encodes responses with orjson: same data, compact separators and
+	non-ASCII characters left unescaped
+	"""
+	row_encoder_class = OrjsonRowEncoder
+	encoder = DateDjangoJSONEncoder()
+
+	def dumps(self, data):
+		return orjson.dumps(data, default=self.encoder.default,
+							option=orjson.OPT_PASSTHROUGH_DATETIME)
+
+
+JSON_BACKENDS = {'json': JsonBackend, 'orjson': OrjsonBackend}
+_json_backends = {}
+
+
+def get_json_backend():
+	"""
+	Returns the backend set by PURE_REST['JSON_BACKEND']: 'json', 'orjson'
+	or 'auto' (orjson if it's installed)
+	"""
+	name = PURE_REST['JSON_BACKEND']
+	if name == 'auto':
+		name = 'orjson' if orjson is not None else 'json'
+	if name not in _json_backends:
+		_json_backends[name] = JSON_BACKENDS[name]()
+	return _json_backends[name]
+
+
+@functools.lru_cache(maxsize=None)
+def _get_row_encoder(backend, model, fields):
+	return backend.row_encoder_class(model, fields)
+
+
+def get_row_encoder(model, fields):
+	"""
+	Returns the row encoder of the current backend for model and fields,
+	compiled once
+	"""
+	return _get_row_encoder(get_json_backend(), model, tuple(fields))
+
+
+def render_json(data, **response_kwargs):
+	return HttpResponse(get_json_backend().dumps(data),
+						content_type='application/json', **response_kwargs)
+
+
 class JsonResponseMixin:
 	"""
 	Mixin for returning JSON response (with pagination, if possible)
 	"""
+	# Compact format of list responses instead of JSON, see JsonFormatMixin
+	response_format = None
+
+	def get_variant(self):
+		"""
+		Name of the response format, None for JSON
+		"""
+		if self.response_format is None:
+			return None
+		return self.response_format.name
+
 	def render_to_response(self, context, **response_kwargs):
-		return JsonResponse(self.get_paginated_data(context), **response_kwargs,
-							safe=False, encoder=DateDjangoJSONEncoder)
+		with get_metrics(self.request).time('encode'):
+			return render_json(self.get_paginated_data(context),
+								**response_kwargs)
 
 	def get_data(self, context):
 		return context
@@ -42,12 +249,79 @@ class JsonResponseMixin:
 		if context.get('paginator', None):
 			paginator = context['paginator']
 			return {'count': paginator.count,
+					'count_strategy': getattr(paginator, 'count_strategy',
+												'exact'),
 					'total_pages': paginator.num_pages,
 					'results': self.get_data(context)}
 		else:
 			return self.get_data(context)
 
 
+class JsonConditionalMixin:
+	"""
+	Mixin for conditional GET requests. Sends a strong ETag (and for objects
+	Last-Modified) derived from `last_modified_field` and answers 304 Not
+	Modified without building the response while the client's copy is
+	fresh. Disabled unless `last_modified_field` is set
+	"""
+	last_modified_field = None
+
+	def get_validators(self):
+		"""
+		Validators of the object with the pk of the URL, or of the whole
+		queryset without one. Lists with pages override it
+		"""
+		pk = self.kwargs.get(getattr(self, 'pk_url_kwarg', 'pk'), None)
+		if pk is not None:
+			return get_object_validators(self.request, self.get_queryset(), pk,
+										self.last_modified_field)
+		return get_list_validators(self.request, self.get_queryset(),
+									self.last_modified_field)
+
+	def get(self, request, *args, **kwargs):
+		if self.last_modified_field is None:
+			return super().get(request, *args, **kwargs)
+		etag, last_modified = self.get_validators()
+		if etag is not None:
+			response = get_not_modified_response(request, etag, last_modified)
+			if response is not None:
+				return response
+		response = super().get(request, *args, **kwargs)
+		return set_validators(response, etag, last_modified)
+
+
+class JsonCacheMixin:
+	"""
+	Mixin serving GET requests from the response cache configured by
+	PURE_REST['RESPONSE_CACHE'], adds the `X-Cache: HIT/MISS` header.
+	Cached responses keep their validators, so conditional requests are
+	answered from the cache as well
+	"""
+	def get(self, request, *args, **kwargs):
+		cache = get_response_cache()
+		if cache is None:
+			return super().get(request, *args, **kwargs)
+
+		key = cache.get_key(request, self.model,
+							self.kwargs.get(self.pk_url_kwarg, None),
+							self.get_variant(), get_read_alias(request))
+		response = cache.get(key)
+		if response is None:
+			response = super().get(request, *args, **kwargs)
+			if response.status_code == 200:
+				if getattr(response, 'is_rendered', True):
+					cache.set(key, response)
+				else:
+					# Deferred responses have no content until rendered
+					response.add_post_render_callback(
+						lambda response: cache.set(key, response))
+			response['X-Cache'] = 'MISS'
+		else:
+			response['X-Cache'] = 'HIT'
+			response = get_cached_conditional_response(request, response)
+		return response
+
+
 class JsonFormMixin(ModelFormMixin):
 	"""
 	That mixin allows to use default Django Form Processing API
@@ -66,10 +340,17 @@ class JsonFormMixin(ModelFormMixin):
 			return form_class()
 
 	def form_valid(self, form):
-		self.object = form.save()
-		# Primitive and naive serialization (w/o writing own Serializer)
-		return JsonResponse(model_to_dict(self.object),
-							safe=False, encoder=DateDjangoJSONEncoder)
+		action = 'create' if form.instance.pk is None else 'update'
+		# Receivers write in the transaction of the change (see signals)
+		with transaction.atomic(savepoint=False):
+			self.object = form.save()
+			objects_written.send(sender=self.object.__class__, action=action,
+								pks=[self.object.pk])
+		return self.render_object(self.object)
+
+	def render_object(self, obj):
+		encoder = get_row_encoder(obj.__class__, get_field_names(obj.__class__))
+		return render_json(encoder.encode_row(encoder.get_row(obj)))
 
 
 class JsonFormProcessor(JsonFormMixin, View):
@@ -92,22 +373,280 @@ class JsonFormProcessor(JsonFormMixin, View):
 								encoder=DateDjangoJSONEncoder)
 
 
-class JsonListView(JsonResponseMixin, BaseListView):
+def get_field_names(model):
+	"""
+	Names of the fields the JSON views expose: the same ones `model_to_dict`
+	returns, i.e. without non-editable fields like auto timestamps
+	"""
+	return [field.name for field in model._meta.concrete_fields
+			if field.editable]
+
+
+def parse_fields(value, allowed):
+	"""
+	Parses a comma-separated `?fields=` value, returns the names in the order
+	of allowed (all of them for an empty value). Raises ValidationError on
+	unknown names
+	"""
+	names = {name.strip() for name in value.split(',') if name.strip()}
+	unknown = names.difference(allowed)
+	if unknown:
+		raise ValidationError('Unknown fields: %s. Available fields: %s' % (
+			', '.join(sorted(unknown)), ', '.join(allowed)))
+	return [name for name in allowed if name in names] or list(allowed)
+
+
+def parse_ids(value, pk_field, max_ids):
+	"""
+	Parses a comma-separated `?ids=` value into primary keys, in the given
+	order. Raises ValidationError on invalid keys or more than max_ids
+	"""
+	parts = [part.strip() for part in value.split(',') if part.strip()]
+	if len(parts) > max_ids:
+		raise ValidationError('Too many ids, the limit is %d' % max_ids)
+	ids = []
+	for part in parts:
+		try:
+			ids.append(pk_field.to_python(part))
+		except ValidationError:
+			raise ValidationError('Invalid id: %s' % part)
+	return ids
+
+
+class JsonIdsMixin:
+	"""
+	Mixin for multi-gets: `?ids=1,2,3` returns the objects with those keys,
+	in the given order with null in place of the missing ones (listed in
+	`not_found` as well), read with a single `IN` query. At most `max_ids`
+	ids are accepted, errors are answered with 400 Bad Request
+	"""
+	ids_query_param = 'ids'
+	max_ids = PURE_REST['MULTI_GET_MAX_IDS']
+	ids = None
+
+	def get(self, request, *args, **kwargs):
+		if self.ids_query_param in request.GET:
+			model = self.model if self.model is not None else \
+				self.get_queryset().model
+			try:
+				self.ids = parse_ids(request.GET[self.ids_query_param],
+										model._meta.pk, self.max_ids)
+			except ValidationError as e:
+				return JsonResponse({'detail': e.messages[0]}, status=400,
+									encoder=DateDjangoJSONEncoder)
+		return super().get(request, *args, **kwargs)
+
+	def get_paginate_by(self, queryset):
+		# The ids are the page
+		if self.ids is not None:
+			return None
+		return super().get_paginate_by(queryset)
+
+
+class JsonFieldsMixin:
 	"""
-	Default Django List View with JSON response
+	Mixin for sparse fieldsets: `?fields=id,name` limits the fields of GET
+	responses, and the columns read from the database, to the given ones.
+	Unknown fields are answered with 400 Bad Request
+	"""
+	fields_query_param = 'fields'
+
+	def get_response_fields(self):
+		"""
+		Exposed fields the response consists of
+		"""
+		return self.response_fields
+
+	def get(self, request, *args, **kwargs):
+		model = self.model if self.model is not None else \
+			self.get_queryset().model
+		allowed = get_field_names(model)
+		try:
+			self.response_fields = parse_fields(
+				request.GET.get(self.fields_query_param, ''), allowed)
+		except ValidationError as e:
+			return JsonResponse({'detail': e.messages[0]}, status=400,
+								encoder=DateDjangoJSONEncoder)
+		return super().get(request, *args, **kwargs)
+
+
+class JsonFormatMixin:
+	"""
+	Mixin for compact list responses: `?format=` or the Accept header pick
+	columnar JSON or MessagePack (see `views.formats`) instead of JSON.
+	Unknown formats are answered with 400 Bad Request
+	"""
+	format_query_param = 'format'
+
+	def get(self, request, *args, **kwargs):
+		try:
+			self.response_format = negotiate_format(
+				request, get_response_formats(format_date),
+				self.format_query_param)
+		except ValidationError as e:
+			response = JsonResponse({'detail': e.messages[0]}, status=400,
+									encoder=DateDjangoJSONEncoder)
+		else:
+			response = super().get(request, *args, **kwargs)
+		patch_vary_headers(response, ['Accept'])
+		return response
+
+
+class JsonListView(ReplicaReadMixin, JsonFieldsMixin, JsonIdsMixin,
+					JsonFormatMixin, JsonCacheMixin, JsonConditionalMixin,
+					JsonResponseMixin, BaseListView):
+	"""
+	Default Django List View with JSON response.
+	Passing `?cursor=` switches from page numbers to keyset pagination,
+	`?ids=` fetches the given objects instead, `?format=` the format
 	"""
 	paginate_by = PURE_REST['PAGE_SIZE']  # Default pages count
+	paginator_class = CountingPaginator
+	page_paginator = None
+	id_rows = None
+	cursor_query_param = 'cursor'
 
-	def get_data(self, context):
-		return list(context['object_list'].values().iterator())
+	def get_data(self, context, rows=None):
+		"""
+		Encodes the rows of the page, read as `values_list` tuples of the
+		exposed fields unless given. Compact formats take the tuples as they
+		are
+		"""
+		model = context['object_list'].model
+		fields = self.get_response_fields()
+		if rows is None:
+			rows = context['object_list'].values_list(*fields).iterator()
+		if self.response_format is not None:
+			# Without the columns read for keys and validators
+			width = len(fields)
+			return [row if row is None else row[:width] for row in rows]
+		return get_row_encoder(model, fields).encode_rows(rows)
+
+	def get_columnar_data(self, context):
+		return to_columns(self.get_paginated_data(context),
+							self.get_response_fields())
+
+	def render_to_response(self, context, **response_kwargs):
+		if self.response_format is None:
+			return super().render_to_response(context, **response_kwargs)
+		with get_metrics(self.request).time('encode'):
+			data = self.get_columnar_data(context)
+			content = self.response_format.dumps(data)
+		return HttpResponse(content,
+							content_type=self.response_format.media_type,
+							**response_kwargs)
+
+	def get_id_rows(self, queryset):
+		"""
+		Rows of the objects with the requested ids, by primary key: the
+		exposed fields followed by the key and the version
+		"""
+		if self.id_rows is None:
+			pk_name = queryset.model._meta.pk.attname
+			columns = self.get_response_fields() + [
+				pk_name, self.last_modified_field or pk_name]
+			rows = queryset.filter(pk__in=set(self.ids)).order_by() \
+				.values_list(*columns)
+			self.id_rows = {row[-2]: row for row in rows}
+		return self.id_rows
+
+	def get_validators(self):
+		queryset = self.get_queryset()
+		if self.ids is not None:
+			# Made from the rows, which the response reuses
+			rows = self.get_id_rows(queryset)
+			versions = [row[-1] for row in rows.values()]
+			return get_rows_validators(self.request, queryset.model, rows,
+										versions, self.get_variant())
+		if self.cursor_query_param in self.request.GET:
+			# Only the rows of the page matter, the table may be huge
+			paginator = KeysetPaginator(queryset,
+										self.get_paginate_by(queryset))
+			try:
+				queryset = paginator.page(
+					self.request.GET[self.cursor_query_param]).object_list
+			except InvalidCursor:
+				return None, None
+			return get_list_validators(self.request, queryset,
+										self.last_modified_field,
+										variant=self.get_variant())
 
+		page_size = self.get_paginate_by(queryset)
+		if not page_size:
+			return get_list_validators(self.request, queryset,
+										self.last_modified_field,
+										variant=self.get_variant())
+		# The rows of the page and the total count, which the page shows
+		try:
+			paginator, _, queryset, _ = self.paginate_queryset(queryset,
+																page_size)
+		except Http404:
+			return None, None
+		return get_list_validators(self.request, queryset,
+									self.last_modified_field, paginator.count,
+									self.get_variant())
+
+	def get_paginator(self, queryset, per_page, **kwargs):
+		# Shared by the validators and the page, so objects are counted once
+		if self.page_paginator is None:
+			self.page_paginator = super().get_paginator(queryset, per_page,
+														**kwargs)
+		return self.page_paginator
+
+	def paginate_queryset(self, queryset, page_size):
+		if self.cursor_query_param not in self.request.GET:
+			return super().paginate_queryset(queryset, page_size)
+		paginator = KeysetPaginator(queryset, page_size)
+		try:
+			page = paginator.page(self.request.GET[self.cursor_query_param])
+		except InvalidCursor as e:
+			raise Http404(e)
+		return None, page, page.object_list, True
+
+	def get_paginated_data(self, context):
+		if self.ids is not None:
+			rows = self.get_id_rows(context['object_list'])
+			results = self.get_data(context, [rows.get(pk) for pk in self.ids])
+			not_found = [pk for pk in dict.fromkeys(self.ids) if pk not in rows]
+			return {'count': len(rows), 'results': results,
+					'not_found': not_found}
+		page = context.get('page_obj', None)
+		if isinstance(page, KeysetPage):
+			# The ordering key of the boundary rows makes the cursors
+			fields = self.get_response_fields()
+			columns = fields + [name for name, _ in page.paginator.ordering
+								if name not in fields]
+			rows = page.paginate(
+				context['object_list'].values_list(*columns), columns)
+			results = self.get_data(context, rows)
+			return {'next': self.get_cursor_link(page.next_cursor),
+					'previous': self.get_cursor_link(page.previous_cursor),
+					'results': results}
+		return super().get_paginated_data(context)
 
-class JsonDetailView(JsonResponseMixin, BaseDetailView):
+	def get_cursor_link(self, cursor):
+		if cursor is None:
+			return None
+		query = self.request.GET.copy()
+		query[self.cursor_query_param] = cursor
+		return self.request.build_absolute_uri('?' + query.urlencode())
+
+
+class JsonDetailView(ReplicaReadMixin, JsonFieldsMixin, JsonCacheMixin,
+					JsonConditionalMixin, JsonResponseMixin, BaseDetailView):
 	"""
 	Default Django Detail View with JSON response
 	"""
+	def get_object(self, queryset=None):
+		if queryset is None and self.request.method in ('GET', 'HEAD'):
+			# Other fields aren't read from the database at all
+			queryset = self.get_queryset().only(*self.get_response_fields())
+		return super().get_object(queryset)
+
 	def get_data(self, context):
-		return model_to_dict(context['object'])
+		encoder = get_row_encoder(context['object'].__class__,
+									self.get_response_fields())
+		return encoder.encode_row(encoder.get_row(context['object']))
 
 
 class JsonCreateView(BaseCreateView, JsonFormProcessor):
@@ -130,30 +669,363 @@ class JsonDeleteView(JsonFormProcessor):
 	JSON-encoded response
 	"""
 	def delete(self, request, *args, **kwargs):
-		self.object = self.get_object()
-		self.object.delete()
+		# A single DELETE unless the collector has cascades or signals to
+		# handle, its row count tells whether the object was there
+		pk = self.kwargs[self.pk_url_kwarg]
+		queryset = self.get_queryset().filter(pk=pk)
+		with transaction.atomic(savepoint=False):
+			deleted = queryset.delete()[1].get(queryset.model._meta.label, 0)
+			if deleted:
+				objects_written.send(sender=queryset.model, action='delete',
+									pks=[pk])
+		if not deleted:
+			raise Http404('No object found matching the query')
 		return JsonResponse({'detail': 'Object deleted'},
 							encoder=DateDjangoJSONEncoder)
 
 
-class JsonModelView(JsonDetailView, JsonUpdateView, JsonDeleteView):
+def get_error_dict(error):
+	"""
+	Errors of a ValidationError by field, like `form.errors`
+	"""
+	if hasattr(error, 'error_dict'):
+		return error.message_dict
+	return {NON_FIELD_ERRORS: error.messages}
+
+
+class JsonPatchMixin:
+	"""
+	Mixin for partial updates: PATCH with a JSON object of some of the
+	fields validates and writes only those, with a single conditional
+	`UPDATE` and no read before it. `If-Match` with ETags of the object
+	makes the update conditional on its version as well, a stale version is
+	answered with 412 Precondition Failed. Responds with the primary key,
+	the changed fields and the new validators
+	"""
+	def get_update_condition(self, changes):
+		"""
+		Returns a Q the stored row has to match for changes to be valid (or
+		None), for rules across fields of which changes may have some.
+		Raises ValidationError if changes break them by themselves
+		"""
+		return None
+
+	def get_changes(self):
+		"""
+		Returns the values of the fields in the request body by name, cleaned
+		by their form and model fields. Raises ValidationError by field
+		"""
+		try:
+			data = json.loads(self.request.body)
+		except json.JSONDecodeError:
+			data = None
+		if not isinstance(data, dict) or not data:
+			raise ValidationError('Expected a JSON object of the fields to '
+									'change')
+		form_fields = self.get_form_class().base_fields
+		instance = self.model()
+		changes, errors = {}, {}
+		for name, value in data.items():
+			if name not in form_fields:
+				errors[name] = ['Unknown field']
+				continue
+			try:
+				value = form_fields[name].clean(value)
+				changes[name] = self.model._meta.get_field(name).clean(
+					value, instance)
+			except ValidationError as e:
+				errors[name] = e.messages
+		if errors:
+			raise ValidationError(errors)
+		return changes
+
+	def patch(self, request, *args, **kwargs):
+		pk = self.kwargs[self.pk_url_kwarg]
+		try:
+			changes = self.get_changes()
+			condition = self.get_update_condition(changes)
+		except ValidationError as e:
+			return JsonResponse(get_error_dict(e), status=400,
+								encoder=DateDjangoJSONEncoder)
+		versions = get_if_match_versions(request, pk)
+		if versions is not None and self.last_modified_field is None:
+			return self.get_precondition_failed_response()
+
+		queryset = self.get_queryset().filter(pk=pk)
+		guarded = queryset
+		if versions is not None:
+			guarded = guarded.filter(**{
+				self.last_modified_field + '__in': [
+					get_version_timestamp(version) for version in versions]})
+		if condition is not None:
+			guarded = guarded.filter(condition)
+		values = dict(changes)
+		for field in self.model._meta.concrete_fields:
+			# Skipped by UPDATE statements
+			if getattr(field, 'auto_now', False):
+				values[field.attname] = field.pre_save(self.model(), False)
+		# Receivers write in the transaction of the change (see signals)
+		with transaction.atomic(savepoint=False):
+			updated = guarded.update(**values)
+			if updated:
+				objects_written.send(sender=self.model, action='update',
+									pks=[pk])
+		if not updated:
+			return self.get_patch_failed_response(queryset, versions, changes)
+		return self.render_changes(pk, values)
+
+	def get_patch_failed_response(self, queryset, versions, changes):
+		"""
+		Tells why nothing was updated, reading the object only now: it's
+		gone, its version is stale or changes break a rule across fields
+		"""
+		obj = queryset.first()
+		if obj is None:
+			raise Http404('No object found matching the query')
+		if versions is not None:
+			version = get_version(getattr(obj, self.last_modified_field))
+			if version not in versions:
+				return self.get_precondition_failed_response()
+		for name, value in changes.items():
+			setattr(obj, name, value)
+		try:
+			obj.full_clean()
+		except ValidationError as e:
+			return JsonResponse(get_error_dict(e), status=400,
+								encoder=DateDjangoJSONEncoder)
+		# The object was changed meanwhile to meet the condition
+		return JsonResponse({'detail': 'The object was changed concurrently, '
+										'try again'}, status=409)
+
+	def get_precondition_failed_response(self):
+		return JsonResponse({'detail': 'The object was changed, get its '
+										'current version'}, status=412)
+
+	def render_changes(self, pk, values):
+		pk_name = self.model._meta.pk.name
+		fields = [name for name in get_field_names(self.model)
+					if name == pk_name or name in values]
+		encoder = get_row_encoder(self.model, fields)
+		response = render_json(encoder.encode_row([
+			pk if name == pk_name else values[name] for name in fields]))
+		last_modified = values.get(self.last_modified_field, None)
+		if last_modified is None:
+			return response
+		return set_validators(response, get_object_etag(pk, last_modified),
+								last_modified)
+
+
+class JsonModelView(ArchiveDetailMixin, JsonDetailView, JsonPatchMixin,
+					JsonUpdateView, JsonDeleteView):
 	"""
 	Provides multiple views for model:
-		GET - Detail JSON view.
+		GET - Detail JSON view, archived objects included if `union_model`
+		is set.
 
 		POST - Update JSON view.
 
+		PATCH - Partial update JSON view.
+
 		DELETE - Delete JSON view.
 	"""
 
 
-class JsonListCreateView(FieldsFilter, SearchFilter,
+class JsonFilteredDeleteMixin:
+	"""
+	Mixin deleting every object the filters of the request match, e.g.
+	`DELETE ?end_date__lt=2020-01-01&confirm=true`. Requires at least one
+	filter and the confirmation, refuses to delete more than `max_rows`
+	objects and deletes in chunks of `batch_size`, a transaction each, so
+	locks are held briefly
+	"""
+	confirm_query_param = 'confirm'
+	batch_size = PURE_REST['BULK_BATCH_SIZE']
+	max_rows = PURE_REST['BULK_MAX_ITEMS']
+
+	def delete(self, request, *args, **kwargs):
+		detail = None
+		try:
+			queryset = self.get_queryset().order_by()
+		except ValidationError as e:
+			detail = e.messages[0]
+		else:
+			confirm = request.GET.get(self.confirm_query_param, '')
+			if not queryset.query.has_filters():
+				detail = 'Deleting needs at least one filter'
+			elif confirm not in ('1', 'true'):
+				detail = 'Deleting every matching object needs %s=true' % \
+					self.confirm_query_param
+			elif queryset[:self.max_rows + 1].count() > self.max_rows:
+				detail = 'More than %d objects match, narrow the filters' % \
+					self.max_rows
+		if detail is not None:
+			return JsonResponse({'detail': detail}, status=400,
+								encoder=DateDjangoJSONEncoder)
+
+		deleted = 0
+		while deleted < self.max_rows:
+			size = min(self.batch_size, self.max_rows - deleted)
+			with transaction.atomic():
+				pks = list(queryset.values_list('pk', flat=True)[:size])
+				if pks:
+					deleted += delete_objects(queryset.model, pks, size)
+			if len(pks) < size:
+				break
+		return JsonResponse({'deleted': deleted}, encoder=DateDjangoJSONEncoder)
+
+
+class JsonListCreateView(OrderingFilter, FieldsFilter, IntervalFilter,
+						SearchFilter, ArchiveListMixin, JsonFilteredDeleteMixin,
 						JsonListView, JsonCreateView):
 	"""
-	Uses FieldsFilter and SearchFilter.
+	Uses OrderingFilter, FieldsFilter, IntervalFilter and SearchFilter.
 	Provides multiple list views for model:
-		GET - List JSON view.
+		GET - List JSON view, `?include_archived=1` adds archived objects if
+		`union_model` is set.
 
 		POST - Create JSON view.
+
+		DELETE - Delete the objects matching the filters.
 	"""
 	object = None
+
+	def get_queryset(self):
+		with get_metrics(self.request).time('filter'):
+			return super().get_queryset()
+
+
+class JsonBulkView(ModelFormMixin, View):
+	"""
+	Processes JSON arrays of objects with the same form validation as the
+	single-object views:
+		POST - Create objects.
+
+		PUT - Update objects, every item has to contain its primary key.
+
+		DELETE - Delete objects, the body is an array of primary keys.
+
+	Every item is validated before anything is written. Valid batches are
+	written in one transaction, in chunks of `batch_size` rows per
+	statement. Otherwise nothing is written and per-item errors are returned
+	"""
+	batch_size = PURE_REST['BULK_BATCH_SIZE']
+	max_items = PURE_REST['BULK_MAX_ITEMS']
+
+	def get_items(self):
+		"""
+		Returns the decoded array from the request body, raises ValidationError
+		"""
+		try:
+			items = json.loads(self.request.body)
+		except json.JSONDecodeError:
+			raise ValidationError('Expected a JSON array')
+		if not isinstance(items, list):
+			raise ValidationError('Expected a JSON array')
+		if len(items) > self.max_items:
+			raise ValidationError('Too many objects, the limit is %d'
+									% self.max_items)
+		return items
+
+	def get_pks(self, items, key=None):
+		"""
+		Returns primary keys of items (or of item[key]), missing or invalid
+		ones as None
+		"""
+		pk_field = self.model._meta.pk
+		pks = []
+		for item in items:
+			try:
+				value = item[key] if key is not None else item
+				pks.append(pk_field.to_python(value) if value is not None
+							else None)
+			except (ValidationError, KeyError, TypeError):
+				pks.append(None)
+		return pks
+
+	def get_errors_response(self, errors):
+		return JsonResponse({'errors': [{'index': index, 'errors': error}
+										for index, error in errors]},
+							status=400, encoder=DateDjangoJSONEncoder)
+
+	def dispatch(self, request, *args, **kwargs):
+		try:
+			return super().dispatch(request, *args, **kwargs)
+		except ValidationError as e:
+			return JsonResponse({'detail': e.messages[0]}, status=400,
+								encoder=DateDjangoJSONEncoder)
+
+	def get(self, request, *args, **kwargs):
+		return JsonResponse({'detail': 'Method not allowed'},
+							status=405, encoder=DateDjangoJSONEncoder)
+
+	def validate(self, items, instances=None):
+		"""
+		Returns (forms, errors) where errors is a list of (index, errors)
+		"""
+		form_class = self.get_form_class()
+		forms, errors = [], []
+		for index, item in enumerate(items):
+			if not isinstance(item, dict):
+				errors.append((index, {'__all__': ['Expected a JSON object']}))
+				continue
+			kwargs = {'data': item}
+			if instances is not None:
+				kwargs['instance'] = instances[index]
+			form = form_class(**kwargs)
+			if form.is_valid():
+				forms.append(form)
+			else:
+				errors.append((index, form.errors))
+		return forms, errors
+
+	def render_objects(self, objs):
+		encoder = get_row_encoder(self.model, get_field_names(self.model))
+		return render_json(encoder.encode_rows(
+			[encoder.get_row(obj) for obj in objs]))
+
+	def post(self, request, *args, **kwargs):
+		forms, errors = self.validate(self.get_items())
+		if errors:
+			return self.get_errors_response(errors)
+		with transaction.atomic():
+			objs = create_objects(self.model, [form.instance for form in forms],
+									self.batch_size)
+		return self.render_objects(objs)
+
+	def put(self, request, *args, **kwargs):
+		items = self.get_items()
+		pk_name = self.model._meta.pk.name
+		pks = self.get_pks([item if isinstance(item, dict) else {}
+							for item in items], pk_name)
+		with transaction.atomic():
+			objects = self.model._default_manager.select_for_update().in_bulk(
+				[pk for pk in pks if pk is not None])
+			errors, seen = [], set()
+			for index, pk in enumerate(pks):
+				if pk not in objects or pk in seen:
+					message = 'Not found' if pk not in objects else 'Duplicate'
+					errors.append((index, {pk_name: [message]}))
+				seen.add(pk)
+			if errors:
+				return self.get_errors_response(errors)
+
+			forms, errors = self.validate(items, [objects[pk] for pk in pks])
+			if errors:
+				return self.get_errors_response(errors)
+			fields = list(self.get_form_class().base_fields)
+			objs = update_objects(self.model, [form.instance for form in forms],
+									fields, self.batch_size)
+		return self.render_objects(objs)
+
+	def delete(self, request, *args, **kwargs):
+		pks = self.get_pks(self.get_items())
+		with transaction.atomic():
+			existing = set(self.model._default_manager.filter(
+				pk__in=[pk for pk in pks if pk is not None]
+			).values_list('pk', flat=True))
+			errors = [(index, {'__all__': ['Not found']})
+						for index, pk in enumerate(pks) if pk not in existing]
+			if errors:
+				return self.get_errors_response(errors)
+			deleted = delete_objects(self.model, existing, self.batch_size)
+		return JsonResponse({'deleted': deleted}, encoder=DateDjangoJSONEncoder)
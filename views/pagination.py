@@ -0,0 +1,171 @@
+import base64
+import binascii
+import json
+
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+
+
+class InvalidCursor(ValueError):
+	"""
+	Raised when a cursor can't be decoded or doesn't match the ordering
+	"""
+
+
+def encode_cursor(position, reverse=False):
+	"""
+	Packs the ordering key of a boundary row into an opaque URL-safe token
+	"""
+	payload = json.dumps({'p': position, 'r': int(reverse)},
+						cls=DjangoJSONEncoder, separators=(',', ':'))
+	return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token):
+	"""
+	Unpacks a token made by `encode_cursor`, returns (position, reverse)
+	"""
+	try:
+		padded = token + '=' * (-len(token) % 4)
+		payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+		return list(payload['p']), bool(payload['r'])
+	except (binascii.Error, ValueError, TypeError, KeyError):
+		raise InvalidCursor('Invalid cursor')
+
+
+def get_keyset_ordering(queryset):
+	"""
+	Returns the ordering of queryset as a list of (field_name, descending)
+	pairs ending with the primary key, so every row has a unique position.
+	Expressions (e.g. search rank) and unknown names fall back to the
+	model's default ordering.
+	"""
+	opts = queryset.model._meta
+	names = {field.name: field.attname for field in opts.concrete_fields}
+	pk_name = opts.pk.attname
+
+	def parse(terms):
+		ordering = []
+		for term in terms:
+			if not isinstance(term, str):
+				return None
+			descending = term.startswith('-')
+			name = term.lstrip('-')
+			name = pk_name if name == 'pk' else names.get(name)
+			if name is None:
+				return None
+			ordering.append((name, descending))
+		return ordering
+
+	ordering = parse(queryset.query.order_by) or parse(opts.ordering) or []
+	if pk_name not in [name for name, _ in ordering]:
+		ordering.append((pk_name, False))
+	return ordering
+
+
+class KeysetPaginator:
+	"""
+	Paginates a queryset by its ordering key instead of page numbers.
+	A page is a single `WHERE key > position ORDER BY key LIMIT n` query,
+	so there is no COUNT and no OFFSET and deep pages cost the same as
+	the first one.
+	"""
+	def __init__(self, queryset, per_page):
+		self.ordering = get_keyset_ordering(queryset)
+		self.queryset = queryset
+		self.per_page = int(per_page)
+
+	def get_order_by(self, reverse):
+		return ['-' + name if descending != reverse else name
+				for name, descending in self.ordering]
+
+	def get_filter(self, position, reverse):
+		# Row-value comparison (a, b) > (x, y) spelled with basic lookups:
+		# a > x OR (a = x AND b > y)
+		condition = Q()
+		for index, (name, descending) in enumerate(self.ordering):
+			lookup = 'lt' if descending != reverse else 'gt'
+			clause = Q(**{name + '__' + lookup: position[index]})
+			for prev_index, (prev_name, _) in enumerate(self.ordering[:index]):
+				clause &= Q(**{prev_name: position[prev_index]})
+			condition |= clause
+		return condition
+
+	def get_position(self, values):
+		"""
+		Converts the values of a decoded cursor to the types of the ordering
+		fields, cursors are client input
+		"""
+		if len(values) != len(self.ordering):
+			raise InvalidCursor('Invalid cursor')
+		fields = {field.attname: field
+					for field in self.queryset.model._meta.concrete_fields}
+		position = []
+		for value, (name, _) in zip(values, self.ordering):
+			try:
+				value = fields[name].to_python(value)
+			except (ValidationError, ValueError, TypeError):
+				raise InvalidCursor('Invalid cursor')
+			if value is None:
+				raise InvalidCursor('Invalid cursor')
+			position.append(value)
+		return position
+
+	def page(self, cursor):
+		"""
+		Returns the page after (or before, for reversed cursors) the position
+		encoded in cursor. An empty cursor means the first page.
+		"""
+		position, reverse = decode_cursor(cursor) if cursor else (None, False)
+		queryset = self.queryset.order_by(*self.get_order_by(reverse))
+		if position is not None:
+			position = self.get_position(position)
+			queryset = queryset.filter(self.get_filter(position, reverse))
+		# One extra row tells whether there is anything beyond this page
+		return KeysetPage(queryset[:self.per_page + 1], self, position, reverse)
+
+
+class KeysetPage:
+	"""
+	A page of `KeysetPaginator`. The rows fetched from `object_list` have to
+	be passed through `paginate` which trims them and builds the cursors.
+	"""
+	def __init__(self, object_list, paginator, position, reverse):
+		self.object_list = object_list
+		self.paginator = paginator
+		self.position = position
+		self.reverse = reverse
+		self.next_cursor = None
+		self.previous_cursor = None
+
+	def get_position(self, row, columns=None):
+		if columns is not None:
+			return [row[columns.index(name)]
+					for name, _ in self.paginator.ordering]
+		if isinstance(row, dict):
+			return [row[name] for name, _ in self.paginator.ordering]
+		return [getattr(row, name) for name, _ in self.paginator.ordering]
+
+	def paginate(self, rows, columns=None):
+		"""
+		Trims and orders rows, setting the cursors. Rows are dicts, objects or,
+		with columns naming their values, tuples
+		"""
+		rows = list(rows)
+		has_more = len(rows) > self.paginator.per_page
+		rows = rows[:self.paginator.per_page]
+		if self.reverse:
+			rows.reverse()
+
+		first = self.get_position(rows[0], columns) if rows else self.position
+		last = self.get_position(rows[-1], columns) if rows else self.position
+		# Going forward we know there is a previous page only because we
+		# came from one, going backward the same holds for the next page
+		has_next = has_more if not self.reverse else self.position is not None
+		has_previous = has_more if self.reverse else self.position is not None
+		if has_next and last is not None:
+			self.next_cursor = encode_cursor(last)
+		if has_previous and first is not None:
+			self.previous_cursor = encode_cursor(first, reverse=True)
+		return rows
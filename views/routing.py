@@ -0,0 +1,111 @@
+import contextlib
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.dispatch import receiver
+
+from views.signals import objects_written
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+# Alias the reads of the current `read_replica` block go to
+_read_alias = ContextVar('read_alias', default=None)
+
+
+def get_replica():
+	"""
+	Alias of the replica configured by settings.DATABASE_ROUTING, None if
+	reads aren't routed
+	"""
+	return settings.DATABASE_ROUTING.get('REPLICA', None) or None
+
+
+def is_pinned(request):
+	"""
+	Whether the client wrote recently, so it reads from the primary to see
+	its writes while the replica may still be behind
+	"""
+	return settings.DATABASE_ROUTING['COOKIE'] in request.COOKIES
+
+
+def get_read_alias(request):
+	"""
+	Alias request reads from: the replica in safe requests of clients that
+	aren't pinned to the primary, None (the default database) otherwise
+	"""
+	if request.method not in SAFE_METHODS or is_pinned(request):
+		return None
+	return get_replica()
+
+
+@contextlib.contextmanager
+def read_replica(request):
+	"""
+	Routes the reads of the block to the alias of `get_read_alias`
+	"""
+	alias = get_read_alias(request)
+	if alias is None:
+		yield
+		return
+	token = _read_alias.set(alias)
+	try:
+		yield
+	finally:
+		_read_alias.reset(token)
+
+
+@receiver(objects_written)
+def read_primary_after_write(sender, **kwargs):
+	"""
+	Sends the rest of the reads of the current `read_replica` block to the
+	primary after a write, so they see it
+	"""
+	_read_alias.set(None)
+
+
+class ReplicaRouter:
+	"""
+	Sends the reads of `read_replica` blocks to the replica and everything
+	else to the default database
+	"""
+	def db_for_read(self, model, **hints):
+		return _read_alias.get()
+
+	def db_for_write(self, model, **hints):
+		return None
+
+	def allow_relation(self, obj1, obj2, **hints):
+		# The replica holds the same data
+		return True
+
+
+class ReplicaReadMixin:
+	"""
+	View mixin reading from the replica in safe requests, see `read_replica`.
+	Works for Django and DRF views
+	"""
+	def dispatch(self, request, *args, **kwargs):
+		with read_replica(request):
+			return super().dispatch(request, *args, **kwargs)
+
+
+class ReplicaStickinessMiddleware:
+	"""
+	Pins clients to the primary for DATABASE_ROUTING['STICKY_SECONDS'] after
+	every successful write with a cookie, so they read their own writes.
+	Removes itself from the stack unless a replica is configured
+	"""
+	def __init__(self, get_response):
+		if get_replica() is None:
+			raise MiddlewareNotUsed
+		self.get_response = get_response
+
+	def __call__(self, request):
+		response = self.get_response(request)
+		if request.method not in SAFE_METHODS and response.status_code < 400:
+			config = settings.DATABASE_ROUTING
+			response.set_cookie(config['COOKIE'], '1',
+								max_age=config['STICKY_SECONDS'],
+								httponly=True, samesite='Lax')
+		return response
@@ -0,0 +1,208 @@
+import re
+
+from django.db import connections
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+
+def get_index_name(model):
+	"""
+	Name of the full-text index (FTS5 table on SQLite, GIN index on
+	PostgreSQL) of the model
+	"""
+	return model._meta.db_table + '_fts'
+
+
+def get_terms(query):
+	return re.findall(r'\w+', query)
+
+
+def install_search_index(connection, model, fields, rebuild=True):
+	"""
+	Creates the full-text index of model over fields if the database supports
+	one. On SQLite that's an external content FTS5 table kept in sync by
+	triggers, so every write (including bulk ones and raw SQL) updates it.
+	Safe to call repeatedly: it only creates what's missing and rebuilds the
+	index contents if asked.
+	"""
+	table = model._meta.db_table
+	columns = [model._meta.get_field(field).column for field in fields]
+	index = get_index_name(model)
+	pk = model._meta.pk.column
+	qn = connection.ops.quote_name
+
+	if connection.vendor == 'sqlite':
+		names = ', '.join(qn(column) for column in columns)
+		new = ', '.join('new.' + qn(column) for column in columns)
+		old = ', '.join('old.' + qn(column) for column in columns)
+		insert = 'INSERT INTO {index}(rowid, {names}) VALUES (new.{pk}, {new});'
+		delete = ('INSERT INTO {index}({index}, rowid, {names}) '
+					"VALUES ('delete', old.{pk}, {old});")
+		statements = [
+			'CREATE VIRTUAL TABLE IF NOT EXISTS {index} USING fts5('
+			"{names}, content='{table_raw}', content_rowid='{pk_raw}', "
+			"prefix='2 3')",
+			'CREATE TRIGGER IF NOT EXISTS {index_raw}_ai AFTER INSERT ON {table} '
+			'BEGIN ' + insert + ' END',
+			'CREATE TRIGGER IF NOT EXISTS {index_raw}_ad AFTER DELETE ON {table} '
+			'BEGIN ' + delete + ' END',
+			'CREATE TRIGGER IF NOT EXISTS {index_raw}_au AFTER UPDATE OF {names} '
+			'ON {table} BEGIN ' + delete + ' ' + insert + ' END',
+		]
+		if rebuild:
+			statements.append("INSERT INTO {index}({index}) VALUES ('rebuild')")
+		params = {'index': qn(index), 'index_raw': index,
+					'table': qn(table), 'table_raw': table,
+					'names': names, 'new': new, 'old': old,
+					'pk': qn(pk), 'pk_raw': pk}
+	elif connection.vendor == 'postgresql':
+		statements = ['CREATE INDEX IF NOT EXISTS {index} ON {table} '
+						'USING gin (({vector}))']
+		params = {'index': qn(index), 'table': qn(table),
+					'vector': get_postgresql_vector(connection, columns)}
+	else:
+		return
+
+	_index_exists.pop(get_index_key(connection, model), None)
+	with connection.cursor() as cursor:
+		for statement in statements:
+			cursor.execute(statement.format(**params))
+
+
+def uninstall_search_index(connection, model):
+	index = get_index_name(model)
+	qn = connection.ops.quote_name
+	if connection.vendor == 'sqlite':
+		statements = ['DROP TRIGGER IF EXISTS %s_%s' % (index, suffix)
+						for suffix in ('ai', 'ad', 'au')]
+		statements.append('DROP TABLE IF EXISTS %s' % qn(index))
+	elif connection.vendor == 'postgresql':
+		statements = ['DROP INDEX IF EXISTS %s' % qn(index)]
+	else:
+		return
+	_index_exists.pop(get_index_key(connection, model), None)
+	with connection.cursor() as cursor:
+		for statement in statements:
+			cursor.execute(statement)
+
+
+def get_postgresql_vector(connection, columns, table=None):
+	qn = connection.ops.quote_name
+	prefix = qn(table) + '.' if table else ''
+	document = " || ' ' || ".join("coalesce(%s%s, '')" % (prefix, qn(column))
+									for column in columns)
+	return "to_tsvector('simple'::regconfig, %s)" % document
+
+
+_index_exists = {}
+
+
+def get_index_key(connection, model):
+	return (connection.alias, connection.settings_dict['NAME'], model)
+
+
+def has_search_index(connection, model):
+	"""
+	Checks whether the FTS5 table of model exists. Only found tables are
+	remembered (until `install_search_index` or `uninstall_search_index`
+	runs), a missing one may be built any time
+	"""
+	key = get_index_key(connection, model)
+	if key not in _index_exists:
+		with connection.cursor() as cursor:
+			tables = connection.introspection.table_names(cursor)
+		if get_index_name(model) not in tables:
+			return False
+		_index_exists[key] = True
+	return _index_exists[key]
+
+
+def get_fts_match(terms):
+	# Phrases can't contain anything but \w here, so no escaping needed
+	return ' '.join('"%s"*' % term for term in terms)
+
+
+def get_tsquery(terms):
+	return ' & '.join(term + ':*' for term in terms)
+
+
+def get_contains_condition(fields, terms):
+	condition = Q()
+	for term in terms:
+		term_condition = Q()
+		for field in fields:
+			term_condition |= Q(**{field + '__icontains': term})
+		condition &= term_condition
+	return condition
+
+
+def get_matching_pks_sql(model, connection, fields, terms):
+	"""
+	SQL and params selecting the primary keys of the objects of model
+	matching terms from its full-text index alone, None without an index
+	"""
+	qn = connection.ops.quote_name
+	if connection.vendor == 'sqlite' and has_search_index(connection, model):
+		index = qn(get_index_name(model))
+		return ('SELECT rowid FROM %s WHERE %s MATCH %%s' % (index, index),
+				[get_fts_match(terms)])
+	if connection.vendor == 'postgresql':
+		columns = [model._meta.get_field(field).column for field in fields]
+		sql = "SELECT %s FROM %s WHERE %s @@ to_tsquery('simple'::regconfig, %%s)"
+		return (sql % (qn(model._meta.pk.column), qn(model._meta.db_table),
+						get_postgresql_vector(connection, columns)),
+				[get_tsquery(terms)])
+	return None
+
+
+def search(queryset, fields, query):
+	"""
+	Filters queryset by query over fields and orders it by relevance.
+	Every word of the query is matched as a prefix. Uses the full-text index
+	built by `install_search_index` where possible and falls back to
+	`icontains` lookups on other databases. Models of database views over
+	the union of tables (`union_of`) are searched in the index of every
+	table, in primary key order, as ranks of different indexes don't compare.
+	"""
+	terms = get_terms(query)
+	if not terms:
+		return queryset
+
+	model = queryset.model
+	connection = connections[queryset.db]
+	parts = getattr(model, 'union_of', None)
+	if parts:
+		subqueries = [get_matching_pks_sql(part, connection, fields, terms)
+						for part in parts]
+		if None in subqueries:
+			return queryset.filter(get_contains_condition(fields, terms))
+		# A single IN, looked up by primary key in every table of the union
+		sql = ' UNION ALL '.join(sql for sql, _ in subqueries)
+		params = [param for _, part_params in subqueries
+					for param in part_params]
+		return queryset.filter(pk__in=RawSQL(sql, params))
+
+	table = model._meta.db_table
+	qn = connection.ops.quote_name
+	pk = '%s.%s' % (qn(table), qn(model._meta.pk.column))
+	pk_name = model._meta.pk.name
+
+	if connection.vendor == 'sqlite' and has_search_index(connection, model):
+		index = qn(get_index_name(model))
+		return queryset.extra(
+			tables=[get_index_name(model)],
+			where=['%s.rowid = %s' % (index, pk), '%s MATCH %%s' % index],
+			params=[get_fts_match(terms)],
+		).order_by(RawSQL('%s.rank' % index, ()), pk_name)
+
+	if connection.vendor == 'postgresql':
+		columns = [model._meta.get_field(field).column for field in fields]
+		vector = get_postgresql_vector(connection, columns, table)
+		tsquery = get_tsquery(terms)
+		rank = "ts_rank(%s, to_tsquery('simple'::regconfig, %%s))" % vector
+		return queryset.extra(
+			where=["%s @@ to_tsquery('simple'::regconfig, %%s)" % vector],
+			params=[tsquery],
+		).order_by(RawSQL(rank, (tsquery,)).desc(), pk_name)
+
+	return queryset.filter(get_contains_condition(fields, terms))
@@ -0,0 +1,9 @@
+from django.dispatch import Signal
+
+# Sent right after objects are created, updated or deleted through the APIs
+# or the admin, inside the transaction of the write, so receivers writing to
+# the database (like the change log) commit together with it. Arguments:
+#   sender - the model class
+#   action - 'create', 'update' or 'delete'
+#   pks - list of primary keys of the written objects
+objects_written = Signal()
@@ -0,0 +1,202 @@
+from django.core.exceptions import ImproperlyConfigured, ValidationError
+from django.db import connections, router, transaction
+from django.http import JsonResponse
+from django.views import View
+
+from views.routing import ReplicaReadMixin
+
+
+def get_trigger_name(summary, source, suffix):
+	return '%s_%s_%s' % (summary._meta.db_table, source._meta.db_table, suffix)
+
+
+def get_summary_statement(connection, summary, row, key, measures, sign):
+	"""
+	SQL adding (sign '+') or subtracting (sign '-') the measures of row (a
+	table name, NEW or OLD) to the sums of its key
+	"""
+	qn = connection.ops.quote_name
+	table = qn(summary._meta.db_table)
+	key_column = qn(summary._meta.pk.column)
+	columns = [qn(column) for column in measures]
+	values = [expression.format(row=row) for expression in measures.values()]
+	if sign == '+':
+		sums = ', '.join('%s = %s.%s + excluded.%s' % (column, table, column,
+														column)
+							for column in columns)
+		return 'INSERT INTO %s (%s, %s) VALUES (%s, %s) ON CONFLICT(%s) ' \
+			'DO UPDATE SET %s;' % (table, key_column, ', '.join(columns),
+									key.format(row=row), ', '.join(values),
+									key_column, sums)
+	sums = ', '.join('%s = %s - (%s)' % (column, column, value)
+						for column, value in zip(columns, values))
+	return 'UPDATE %s SET %s WHERE %s = %s;' % (table, sums, key_column,
+												key.format(row=row))
+
+
+def is_summary_supported(connection):
+	"""
+	Whether summary tables can be kept in sync on the database of connection
+	"""
+	return connection.vendor in ('sqlite', 'postgresql')
+
+
+def check_summary_support(connection):
+	"""
+	Raises ImproperlyConfigured unless summary tables can be kept in sync on
+	the database of connection: their sums would silently go stale
+	"""
+	if not is_summary_supported(connection):
+		raise ImproperlyConfigured(
+			'Summary tables are kept by triggers on SQLite and PostgreSQL only, '
+			'database %r is %s' % (connection.alias, connection.vendor))
+
+
+def install_summary_triggers(connection, summary, sources, key, measures):
+	"""
+	Keeps summary, a table of sums by key, in sync with the tables of
+	sources with triggers (SQLite and PostgreSQL): every inserted row adds
+	its measures to the sums of its key, every deleted row subtracts them
+	and updates do both, in the statement of the write and so in its
+	transaction, whichever code runs it. key and measures (by summary
+	column) are SQL expressions of the database over a source row, `{row}`
+	stands for its table. Safe to call repeatedly
+	"""
+	check_summary_support(connection)
+	qn = connection.ops.quote_name
+	statements = []
+	for source in sources:
+		add = get_summary_statement(connection, summary, 'new', key, measures,
+									'+')
+		subtract = get_summary_statement(connection, summary, 'old', key,
+											measures, '-')
+		table = qn(source._meta.db_table)
+		if connection.vendor == 'sqlite':
+			for suffix, event, body in (('ai', 'INSERT', add),
+										('ad', 'DELETE', subtract),
+										('au', 'UPDATE', subtract + ' ' + add)):
+				statements.append('CREATE TRIGGER IF NOT EXISTS %s AFTER %s ON %s '
+									'BEGIN %s END' % (
+										get_trigger_name(summary, source, suffix),
+										event, table, body))
+			continue
+		name = get_trigger_name(summary, source, 'sync')
+		statements += [
+			'CREATE OR REPLACE FUNCTION %s() RETURNS trigger AS $$ BEGIN '
+			"IF TG_OP <> 'INSERT' THEN %s END IF; "
+			"IF TG_OP <> 'DELETE' THEN %s END IF; "
+			'RETURN NULL; END $$ LANGUAGE plpgsql' % (name, subtract, add),
+			'DROP TRIGGER IF EXISTS %s ON %s' % (name, table),
+			'CREATE TRIGGER %s AFTER INSERT OR UPDATE OR DELETE ON %s '
+			'FOR EACH ROW EXECUTE PROCEDURE %s()' % (name, table, name),
+		]
+	with connection.cursor() as cursor:
+		for statement in statements:
+			cursor.execute(statement)
+
+
+def uninstall_summary_triggers(connection, summary, sources):
+	statements = []
+	for source in sources:
+		if connection.vendor == 'sqlite':
+			statements += ['DROP TRIGGER IF EXISTS %s' % get_trigger_name(
+				summary, source, suffix) for suffix in ('ai', 'ad', 'au')]
+		elif connection.vendor == 'postgresql':
+			name = get_trigger_name(summary, source, 'sync')
+			statements += ['DROP TRIGGER IF EXISTS %s ON %s' % (
+				name, connection.ops.quote_name(source._meta.db_table)),
+				'DROP FUNCTION IF EXISTS %s()' % name]
+	with connection.cursor() as cursor:
+		for statement in statements:
+			cursor.execute(statement)
+
+
+def rebuild_summary(summary, sources, key, measures, using=None):
+	"""
+	Recomputes summary from the tables of sources with the expressions of
+	its triggers, in one transaction, to repair drift (e.g. writes made
+	while the triggers were missing). Returns the number of summary rows
+	"""
+	using = using or router.db_for_write(summary)
+	connection = connections[using]
+	check_summary_support(connection)
+	qn = connection.ops.quote_name
+	columns = [qn(column) for column in measures]
+	selects = []
+	for source in sources:
+		table = qn(source._meta.db_table)
+		values = ['%s AS %s' % (expression.format(row=table), column)
+					for column, expression in zip(columns, measures.values())]
+		selects.append('SELECT %s AS summary_key, %s FROM %s' % (
+			key.format(row=table), ', '.join(values), table))
+	sql = 'INSERT INTO %s (%s, %s) SELECT summary_key, %s FROM (%s) ' \
+		'AS summary_rows GROUP BY summary_key' % (
+			qn(summary._meta.db_table), qn(summary._meta.pk.column),
+			', '.join(columns), ', '.join('SUM(%s)' % column for column in columns),
+			' UNION ALL '.join(selects))
+	with transaction.atomic(using=using):
+		summary._base_manager.using(using).all().delete()
+		with connection.cursor() as cursor:
+			cursor.execute(sql)
+		return summary._base_manager.using(using).count()
+
+
+class SummaryView(ReplicaReadMixin, View):
+	"""
+	Serves the sums of a summary table (see `install_summary_triggers`),
+	reading the summary rows only, however many objects they sum up: the
+	totals, and by group with `?group_by=<name of groups>`. `get_values`
+	turns sums into the values of the response. Answers 501 on databases
+	the summary can't be kept on
+	"""
+	summary_model = None
+	# Functions giving the group label of a summary key, by name
+	groups = {}
+	group_by_query_param = 'group_by'
+
+	def get_values(self, sums):
+		return sums
+
+	def get_group_by(self):
+		name = self.request.GET.get(self.group_by_query_param, None)
+		if name is not None and name not in self.groups:
+			raise ValidationError('Unknown %s: %s. Available: %s' % (
+				self.group_by_query_param, name, ', '.join(self.groups)))
+		return name
+
+	def get(self, request, *args, **kwargs):
+		manager = self.summary_model._base_manager
+		if not is_summary_supported(connections[manager.db]):
+			return JsonResponse({'detail': 'Not implemented on this database'},
+								status=501)
+		try:
+			group_by = self.get_group_by()
+		except ValidationError as e:
+			return JsonResponse({'detail': e.messages[0]}, status=400)
+
+		key = self.summary_model._meta.pk.attname
+		measures = [field.attname for field in
+					self.summary_model._meta.concrete_fields
+					if not field.primary_key]
+		rows = manager.order_by(key).values_list(key, *measures)
+		total = dict.fromkeys(measures, 0)
+		grouped = {}
+		for key_value, *values in rows:
+			if not any(values):
+				# Everything it summed up was deleted
+				continue
+			targets = [total]
+			if group_by is not None:
+				label = self.groups[group_by](key_value)
+				targets.append(grouped.setdefault(label,
+													dict.fromkeys(measures, 0)))
+			for sums in targets:
+				for name, value in zip(measures, values):
+					sums[name] += value
+
+		data = {'total': self.get_values(total)}
+		if group_by is not None:
+			data['group_by'] = group_by
+			data['results'] = [dict({group_by: label}, **self.get_values(sums))
+								for label, sums in grouped.items()]
+		return JsonResponse(data)